@@ -1,632 +1,2941 @@
+import time
+_INICIO_SCRIPT = time.perf_counter()  # Para el reporte de arranque (importaciones y primer render)
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime
 import warnings
-from PIL import Image
 import re
-warnings.filterwarnings('ignore')
+import os
+import hashlib
+import threading
+import json
+import glob
+import io
+import gzip
+import tempfile
+import functools
+import queue
+import sqlite3
+from contextlib import contextmanager
+from collections import OrderedDict
+from streamlit.logger import get_logger
+import lector_excel
+_FIN_IMPORTACIONES = time.perf_counter()
 
-# Configuración de la página
-st.set_page_config(
-    page_title="Indicadores - Plan Contingencia Fiebre Amarilla",
-    page_icon="🦟",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# openpyxl avisa que descarta las validaciones de datos de la ficha; no afectan los valores leídos
+warnings.filterwarnings('ignore', message='Data Validation extension is not supported',
+                        category=UserWarning, module='openpyxl')
 
-# Título principal (sin logo aquí)
-st.title("🦟 Plan de Contingencia para Alertas y Emergencia por Fiebre Amarilla")
-st.markdown("### 📊 **Seguimiento de Indicadores**")
-st.markdown("**Secretaría de Salud del Tolima**")
+# Logger del módulo; escribe en el log del servidor con el nivel de Streamlit (logger.level)
+logger = get_logger(__name__)
 
-@st.cache_data
-def load_and_process_data():
+# Fuentes de datos: un archivo, un directorio o un patrón glob con un libro por municipio
+FUENTES_DATOS = os.environ.get("INDICADORES_FUENTES", "indicadores.xlsx")
+HOJA_DATOS = "Ficha_indicadores"
+MAX_PROCESOS = int(os.environ.get("INDICADORES_MAX_PROCESOS", str(os.cpu_count() or 1)))
+# Lector de la hoja: "proyectado" (streaming, solo las columnas usadas) o "completo" (pd.read_excel)
+LECTOR_EXCEL = os.environ.get("INDICADORES_LECTOR", "proyectado").lower()
+
+# Columnas de identificación y de valores de cada período en la tabla normalizada
+COLUMNAS_IDENTIFICACION = ['numero', 'linea', 'linea_numero', 'nombre', 'tipo', 'definicion', 'calculo', 'meta']
+COLUMNAS_PERIODO = ['numerador', 'denominador', 'ile']
+COLUMNAS_DERIVADAS = ['ile_valor', 'ile_si_no', 'pendiente', 'ile_mostrar']
+
+# Abreviaturas de los meses usadas como etiqueta de período
+MESES = {
+    'enero': 'Ene', 'febrero': 'Feb', 'marzo': 'Mar', 'abril': 'Abr',
+    'mayo': 'May', 'junio': 'Jun', 'julio': 'Jul', 'agosto': 'Ago',
+    'septiembre': 'Sep', 'setiembre': 'Sep', 'octubre': 'Oct',
+    'noviembre': 'Nov', 'diciembre': 'Dic'
+}
+ORDEN_MESES = list(dict.fromkeys(MESES.values()))
+# Números con punto o coma decimal ("12", "0,75", "1.5e-3")
+PATRON_NUMERO = r'[+-]?(?:\d+(?:[.,]\d*)?|[.,]\d+)(?:[eE][+-]?\d+)?'
+PATRON_PERIODO = r'(?i)(' + '|'.join(MESES) + r')\s+(?:de\s+|del\s+)?(\d{4})'
+# Columna opcional con la meta de cada indicador, entre la identificación y el primer período
+PATRON_META = r'(?i)^\s*metas?\b'
+# Cálculo declarado en la columna F ("SI/NO", "Valoración cualitativa: SI / NO") de los indicadores cualitativos
+PATRON_CALCULO_SI_NO = r'(?i)\bSI\s*/\s*NO\b'
+
+def _texto_celdas(bloque, quitar_espacios=False):
+    """
+    Convierte un bloque de celdas a texto ('' para celdas vacías)
+    """
+    texto = bloque.astype(str)
+    if quitar_espacios:
+        texto = texto.apply(lambda columna: columna.str.strip())
+    return texto.where(bloque.notna().to_numpy(), "")
+
+def descubrir_periodos(df, header_row=1, subheader_row=3):
+    """
+    Encuentra la tripla de columnas (numerador, denominador, ILE) de cada período en los encabezados
+    """
+    # Texto de encabezado de cada columna (filas entre el encabezado y el subencabezado)
+    celdas = df.iloc[header_row:subheader_row].to_numpy(dtype=object)
+    encabezados = pd.Series([" ".join("" if pd.isna(celda) else str(celda) for celda in columna)
+                             for columna in celdas.T], index=df.columns, dtype=object)
+    
+    # Cada período empieza en la columna cuyo encabezado nombra un mes y un año ("corte 6: Marzo 2025")
+    coincidencias = encabezados.str.extract(PATRON_PERIODO).dropna()
+    
+    periodos = []
+    etiquetas_vistas = {}
+    for col, (mes, anio) in coincidencias.iterrows():
+        cols = [col, col + 1, col + 2]
+        if cols[-1] >= len(df.columns):
+            continue
+        
+        etiqueta = f"{MESES[mes.lower()]} {anio}"
+        # Cortes repetidos del mismo mes se distinguen por su orden de aparición
+        etiquetas_vistas[etiqueta] = etiquetas_vistas.get(etiqueta, 0) + 1
+        if etiquetas_vistas[etiqueta] > 1:
+            etiqueta = f"{etiqueta} ({etiquetas_vistas[etiqueta]})"
+        
+        periodos.append((etiqueta, cols))
+    
+    return periodos
+
+def _columna_meta(df, header_row=1, subheader_row=3, primera_columna=6):
+    """
+    Columna de metas: la primera antes del primer período cuyo encabezado empieza por "Meta" (None si no hay)
+    """
+    celdas = df.iloc[header_row:subheader_row + 1, primera_columna:].to_numpy(dtype=object)
+    for posicion, columna in enumerate(celdas.T, start=primera_columna):
+        # Mismas filas que descubrir_periodos para reconocer el primer período
+        if re.search(PATRON_PERIODO, " ".join(str(celda) for celda in columna[:-1] if not pd.isna(celda))):
+            return None
+        if re.search(PATRON_META, " ".join(str(celda) for celda in columna if not pd.isna(celda))):
+            return posicion
+    return None
+
+def _a_meta(texto):
+    """
+    Convierte las metas a porcentaje (NaN si no hay): "80%", "80" y 0.8 son 80; SI es 100
+    """
+    texto = texto.str.strip()
+    en_porcentaje = texto.str.endswith('%')
+    numero = _a_numero(texto.str.rstrip('%').str.strip())
+    # Las celdas con formato de porcentaje llegan del Excel como fracción (0.8 = 80%)
+    numero = numero.where(en_porcentaje | ~numero.between(0, 1), numero * 100)
+    return numero.where(texto.str.upper() != 'SI', 100.0)
+
+def _identificacion_hoja(df, data_start_row=4):
+    """
+    Filas de indicadores de la hoja: bloque crudo, orden por línea y número, e identificación ordenada
+    """
+    bloque = df.iloc[data_start_row:]
+    
+    # Solo se conservan filas con un número de indicador válido
+    numeros = pd.to_numeric(bloque.iloc[:, 0], errors='coerce')
+    validas = np.isfinite(numeros.to_numpy(dtype=float))
+    bloque = bloque[validas]
+    
+    # Línea, nombre, tipo, definición y cálculo (columna F, vacía si la hoja no la tiene)
+    identificacion = _texto_celdas(bloque.reindex(columns=range(1, 6)))
+    identificacion.columns = ['linea', 'nombre', 'tipo', 'definicion', 'calculo']
+    identificacion.insert(0, 'numero', numeros[validas].astype(int).to_numpy())
+    columna_meta = _columna_meta(df)
+    identificacion['meta'] = (np.nan if columna_meta is None else
+                              _a_meta(_texto_celdas(bloque.iloc[:, [columna_meta]]).iloc[:, 0]).to_numpy())
+    
+    # Número de línea estratégica para ordenamiento (999 si no se puede extraer)
+    prefijo = identificacion['linea'].str.split('.').str[0].str.strip()
+    prefijo = prefijo.where(prefijo.str.fullmatch(r'[+-]?\d+'), None)
+    linea_numero = pd.to_numeric(prefijo, errors='coerce').fillna(999).astype(int)
+    identificacion.insert(2, 'linea_numero', linea_numero.to_numpy())
+    
+    # Ordenar por línea estratégica y luego por número de indicador
+    orden = np.lexsort((identificacion['numero'].to_numpy(), identificacion['linea_numero'].to_numpy()))
+    identificacion = identificacion.iloc[orden].reset_index(drop=True)
+    return bloque, orden, identificacion
+
+def _periodos_en_hoja(df, periodos):
+    """
+    Solo los períodos cuyas tres columnas existen en la hoja
+    """
+    return [(nombre, cols) for nombre, cols in periodos
+            if len(cols) >= 3 and all(col < len(df.columns) for col in cols[:3])]
+
+def construir_tabla_indicadores(df, periodos, data_start_row=4):
+    """
+    Construye la tabla larga (indicador × período) a partir de la hoja leída sin encabezados
+    """
+    bloque, orden, identificacion = _identificacion_hoja(df, data_start_row)
+    periodos = _periodos_en_hoja(df, periodos)
+    etiquetas = [nombre for nombre, _ in periodos]
+    columnas = [col for _, cols in periodos for col in cols[:3]]
+    
+    # Bloque de triplas (numerador, denominador, ILE) aplanado a una fila por indicador y período
+    valores = bloque.iloc[orden, columnas].to_numpy(dtype=object).reshape(-1, len(COLUMNAS_PERIODO))
+    valores = _texto_celdas(pd.DataFrame(valores, columns=COLUMNAS_PERIODO), quitar_espacios=True)
+    
+    return _tabla_larga(identificacion, etiquetas, valores)
+
+def _tabla_larga(identificacion, etiquetas, valores, derivados=None):
+    """
+    Repite la identificación de cada indicador por período y agrega los valores y derivados
+    
+    Con `derivados` (columnas por celda ya calculadas) solo se recalcula el
+    resumen de cada indicador.
+    """
+    tabla = identificacion.loc[identificacion.index.repeat(len(etiquetas))].reset_index(drop=True)
+    tabla['periodo'] = pd.Categorical(np.tile(etiquetas, len(identificacion)),
+                                      categories=etiquetas, ordered=True)
+    valores = pd.DataFrame(valores, columns=COLUMNAS_PERIODO).astype(str)
+    tabla = pd.concat([tabla, valores], axis=1)
+    if derivados is None:
+        return agregar_columnas_derivadas(tabla)
+    for col in COLUMNAS_DERIVADAS:
+        tabla[col] = derivados[col]
+    return agregar_resumen_indicador(tabla)
+
+def _clave_periodo(etiqueta):
+    """
+    Clave de orden cronológico de una etiqueta "Mes Año" (las no reconocidas van al final)
+    """
+    partes = etiqueta.split()
+    if len(partes) >= 2 and partes[0] in ORDEN_MESES and partes[1].isdigit():
+        return (int(partes[1]), ORDEN_MESES.index(partes[0]), etiqueta)
+    return (9999, 99, etiqueta)
+
+def alinear_periodos(tabla, periodos):
+    """
+    Reindexa la tabla a otra lista de períodos; los que no tiene quedan como pendientes
+    """
+    actuales = get_periodos(tabla)
+    if actuales == periodos:
+        return tabla
+    if not actuales:
+        return tabla.assign(periodo=pd.Categorical([], categories=periodos, ordered=True))
+    
+    identificacion = tabla.iloc[::len(actuales)][COLUMNAS_IDENTIFICACION].reset_index(drop=True)
+    posiciones = [periodos.index(periodo) for periodo in actuales]
+    
+    valores = np.full((len(identificacion), len(periodos), len(COLUMNAS_PERIODO)), "", dtype=object)
+    valores[:, posiciones, :] = tabla[COLUMNAS_PERIODO].to_numpy(dtype=object).reshape(
+        len(identificacion), len(actuales), len(COLUMNAS_PERIODO))
+    
+    return _tabla_larga(identificacion, periodos, valores.reshape(-1, len(COLUMNAS_PERIODO)))
+
+def unir_tablas(tablas_por_fuente):
+    """
+    Une las tablas de varias fuentes (municipios) en una sola con la unión de sus períodos
+    """
+    todos = {periodo for _, tabla in tablas_por_fuente for periodo in get_periodos(tabla)}
+    periodos = sorted(todos, key=_clave_periodo)
+    
+    tabla = pd.concat(
+        [alinear_periodos(tabla, periodos).assign(fuente=fuente) for fuente, tabla in tablas_por_fuente],
+        ignore_index=True
+    )
+    tabla['periodo'] = pd.Categorical(tabla['periodo'].astype(str), categories=periodos, ordered=True)
+    if len(tablas_por_fuente) == 1 or not periodos:
+        return tabla
+    
+    # Ordenar los bloques de cada indicador por línea, número y municipio
+    n_periodos = len(periodos)
+    primeras = tabla.iloc[::n_periodos]
+    orden = np.lexsort((primeras['fuente'].to_numpy(), primeras['numero'].to_numpy(),
+                        primeras['linea_numero'].to_numpy()))
+    filas = (orden[:, None] * n_periodos + np.arange(n_periodos)).ravel()
+    return tabla.iloc[filas].reset_index(drop=True)
+
+def _a_numero(texto):
+    """
+    Convierte una serie de texto a float (NaN si no es un número), aceptando coma decimal
+    """
+    es_numero = texto.str.fullmatch(PATRON_NUMERO).fillna(False).to_numpy(dtype=bool)
+    numero = np.full(len(texto), np.nan)
+    # astype(float) conserva todos los dígitos del valor guardado en el Excel
+    numero[es_numero] = texto[es_numero].str.replace(',', '.', regex=False).astype(float).to_numpy()
+    return pd.Series(numero, index=texto.index)
+
+def derivados_ile(ile):
+    """
+    Calcula los valores derivados de cada celda de ILE (serie de textos) como arreglos por columna
+    """
+    ile_mayusculas = ile.str.upper()
+    
+    pendiente = (ile == "").to_numpy()
+    si_no = ile_mayusculas.isin(['SI', 'NO']).to_numpy()
+    
+    # Los decimales entre 0 y 1 vienen del Excel como fracción y se llevan a porcentaje
+    numero = _a_numero(ile)
+    numero = numero.where(~numero.between(0, 1), numero * 100)
+    es_numero = (numero.notna().to_numpy() & ~si_no & ~pendiente)
+    
+    # Texto a mostrar en tablas y gráficos
+    ile_mostrar = ile.to_numpy(dtype=object).copy()
+    ile_mostrar[es_numero] = [f"{valor:.1f}" for valor in numero.to_numpy()[es_numero]]
+    ile_mostrar[pendiente] = 'Pendiente'
+    
+    return {
+        # ILE numérico: porcentaje corregido, 1 para SI y 0 para NO (NaN si no es interpretable)
+        'ile_valor': np.where(si_no, (ile_mayusculas == 'SI').to_numpy(dtype=float), numero.to_numpy(dtype=float)),
+        'ile_si_no': si_no,
+        'pendiente': pendiente,
+        'ile_mostrar': ile_mostrar
+    }
+
+def agregar_resumen_indicador(tabla):
+    """
+    Agrega el tipo detectado y el seguimiento de cada indicador sobre todo el histórico
+    """
+    pendiente = tabla['pendiente'].to_numpy()
+    si_no = tabla['ile_si_no'].to_numpy()
+    n_periodos = len(tabla['periodo'].cat.categories)
+    if n_periodos:
+        reportados = (~pendiente).reshape(-1, n_periodos).sum(axis=1)
+        con_numeros = (~pendiente & ~si_no).reshape(-1, n_periodos).any(axis=1)
+        tipo_detectado = np.where(reportados == 0, "sin_datos",
+                                  np.where(con_numeros, "cuantitativo", "cualitativo"))
+        tabla['tipo_detectado'] = np.repeat(tipo_detectado, n_periodos)
+        tabla['seguimiento'] = np.repeat(reportados / n_periodos * 100, n_periodos)
+    else:
+        tabla['tipo_detectado'] = pd.Series(dtype=str)
+        tabla['seguimiento'] = pd.Series(dtype=float)
+    
+    return tabla
+
+def agregar_columnas_derivadas(tabla):
+    """
+    Calcula una sola vez los valores derivados del ILE que usan las pestañas y los gráficos
+    """
+    for col, valores in derivados_ile(tabla['ile']).items():
+        tabla[col] = valores
+    return agregar_resumen_indicador(tabla)
+
+class FichaIndicador:
+    """
+    Identificación de un indicador y su resumen sobre todo el histórico
+    """
+    __slots__ = ('posicion', 'fuente', 'numero', 'linea', 'linea_numero', 'linea_nombre',
+                 'nombre', 'tipo', 'definicion', 'meta', 'tipo_detectado', 'seguimiento',
+                 'nombre_limpio', 'nombre_corto', 'definicion_limpia', 'definicion_corta')
+    
+    def __init__(self, **campos):
+        for campo in self.__slots__:
+            setattr(self, campo, campos[campo])
+
+class SerieIndicador:
+    """
+    Valores de un indicador en una lista de períodos (solo los que existen en los datos)
+    """
+    __slots__ = ('periodos', 'ile', 'reportado', 'si_no', 'mostrar', 'numerador', 'denominador')
+    
+    def __init__(self, **campos):
+        for campo in self.__slots__:
+            setattr(self, campo, campos[campo])
+
+# Columnas de la identificación que se guardan como categorías (textos repetidos entre períodos y municipios)
+COLUMNAS_CATEGORICAS = ['fuente', 'linea', 'linea_nombre', 'nombre', 'tipo', 'definicion', 'tipo_detectado']
+
+class AlmacenIndicadores:
+    """
+    Representación compacta de la tabla normalizada para las pestañas y la caché
+    
+    Los valores por período son matrices indicador × período: el ILE en
+    float32, las máscaras de reportado y SI/NO, y los textos (numerador,
+    denominador e ILE a mostrar) como códigos int32 sobre un solo tipo
+    categórico de textos únicos. La identificación tiene una fila por indicador con los
+    textos como categorías, más el nombre y la definición ya limpios y
+    recortados para mostrar. Una sola instancia por versión de los datos se
+    comparte entre todas las sesiones, así que ocupa mucho menos que una lista
+    de diccionarios por celda y no debe modificarse.
+    """
+    def __init__(self, tabla):
+        self.periodos = get_periodos(tabla)
+        n_periodos = max(len(self.periodos), 1)
+        forma = (len(tabla) // n_periodos, len(self.periodos))
+        
+        identificacion = tabla.iloc[::n_periodos].reset_index(drop=True)
+        self.identificacion = pd.DataFrame({
+            columna: (identificacion[columna].astype('category') if columna in COLUMNAS_CATEGORICAS
+                      else identificacion[columna].to_numpy())
+            for columna in ['fuente', 'numero', 'linea', 'linea_numero', 'linea_nombre', 'nombre', 'tipo',
+                            'definicion', 'meta', 'tipo_detectado', 'seguimiento']
+        })
+        agregar_textos_presentacion(self.identificacion)
+        
+        self.ile = tabla['ile_valor'].to_numpy(dtype=np.float32).reshape(forma)
+        self.reportado = ~tabla['pendiente'].to_numpy(dtype=bool).reshape(forma)
+        self.si_no = tabla['ile_si_no'].to_numpy(dtype=bool).reshape(forma)
+        
+        textos = np.concatenate([tabla[columna].to_numpy(dtype=object)
+                                 for columna in ['numerador', 'denominador', 'ile_mostrar']])
+        codigos, unicos = pd.factorize(textos)
+        self.textos = pd.CategoricalDtype(pd.Index(unicos, dtype=str))
+        codigos = codigos.astype(np.int32).reshape((3,) + forma)
+        self.numerador, self.denominador, self.mostrar = codigos
+    
+    def __len__(self):
+        return len(self.identificacion)
+    
+    def fichas(self, posiciones=None):
+        """
+        Fichas de los indicadores en las posiciones dadas (todos si no se indican)
+        """
+        if posiciones is None:
+            posiciones = np.arange(len(self))
+        columnas = {columna: self.identificacion[columna].to_numpy(dtype=object)[posiciones].tolist()
+                    for columna in self.identificacion.columns}
+        return [FichaIndicador(posicion=int(posicion), **{columna: valores[i] for columna, valores in columnas.items()})
+                for i, posicion in enumerate(posiciones)]
+    
+    def columnas_periodo(self, periodos):
+        """
+        Posiciones de los períodos pedidos que existen en los datos, en el orden pedido
+        """
+        columnas = pd.Index(self.periodos).get_indexer(list(periodos))
+        return columnas[columnas >= 0]
+    
+    def serie(self, posicion, periodos):
+        """
+        Valores de un indicador en los períodos pedidos
+        """
+        columnas = self.columnas_periodo(periodos)
+        textos = self.textos.categories
+        return SerieIndicador(
+            periodos=[self.periodos[j] for j in columnas],
+            ile=self.ile[posicion, columnas],
+            reportado=self.reportado[posicion, columnas],
+            si_no=self.si_no[posicion, columnas],
+            mostrar=textos[self.mostrar[posicion, columnas]].to_numpy(dtype=object),
+            numerador=textos[self.numerador[posicion, columnas]].to_numpy(dtype=object),
+            denominador=textos[self.denominador[posicion, columnas]].to_numpy(dtype=object)
+        )
+    
+    def tabla_larga(self, posiciones, periodos):
+        """
+        Tabla larga (indicador × período) de los indicadores y períodos pedidos, en orden cronológico
+        """
+        columnas = np.sort(self.columnas_periodo(periodos))
+        filas = np.repeat(posiciones, len(columnas))
+        columnas = np.tile(columnas, len(posiciones))
+        
+        tabla = self.identificacion.iloc[filas].reset_index(drop=True)
+        tabla['periodo'] = pd.Categorical.from_codes(columnas, categories=self.periodos, ordered=True)
+        for columna, codigos in [('numerador', self.numerador), ('denominador', self.denominador),
+                                 ('ile_mostrar', self.mostrar)]:
+            tabla[columna] = pd.Categorical.from_codes(codigos[filas, columnas], dtype=self.textos)
+        tabla['ile_valor'] = self.ile[filas, columnas]
+        tabla['ile_si_no'] = self.si_no[filas, columnas]
+        tabla['pendiente'] = ~self.reportado[filas, columnas]
+        return tabla
+
+def procesar_hoja(df):
+    """
+    Convierte la hoja Ficha_indicadores leída sin encabezados en la tabla larga (indicador × período)
+    """
+    # Identificar las filas de encabezados
+    header_row = 1  # Fila 2 (índice 1)
+    subheader_row = 3  # Fila 4 (índice 3)
+    data_start_row = 4  # Datos empiezan en fila 5 (índice 4)
+    
+    # Todos los cortes presentes en la hoja (Octubre 2024, ..., último mes agregado)
+    periodos = descubrir_periodos(df, header_row, subheader_row)
+    
+    return construir_tabla_indicadores(df, periodos, data_start_row)
+
+def huellas_celdas(crudos, n_periodos):
+    """
+    Huella de contenido de cada celda indicador × período a partir de sus tres valores crudos
+    """
+    huellas = pd.util.hash_array(crudos.ravel()).reshape(len(crudos), n_periodos, 3)
+    return (huellas[..., 0] * np.uint64(0x9E3779B97F4A7C15)) ^ (huellas[..., 1] * np.uint64(0xC2B2AE3D27D4EB4F)) ^ huellas[..., 2]
+
+def procesar_hoja_incremental(df, anterior=None, snapshot=None):
+    """
+    Convierte la hoja en la tabla larga recalculando solo las celdas nuevas o modificadas
+    
+    `anterior` es el estado devuelto al procesar la versión previa del mismo
+    libro (None la procesa completa): solo las huellas de cada celda, los
+    números de indicador y las etiquetas de período, más la ruta de su
+    snapshot. Las celdas se emparejan por número de indicador y etiqueta de
+    período; las que conservan su huella toman valores y derivados del
+    snapshot anterior, leído solo para esta reconstrucción. Si ese snapshot ya
+    no se puede leer, la hoja se procesa completa. `snapshot` es la ruta donde
+    se guardará la tabla de esta versión. Devuelve la tabla, el nuevo estado y
+    el número de celdas recalculadas.
+    """
+    periodos = _periodos_en_hoja(df, descubrir_periodos(df))
+    bloque, orden, identificacion = _identificacion_hoja(df)
+    etiquetas = [nombre for nombre, _ in periodos]
+    columnas = [col for _, cols in periodos for col in cols[:3]]
+    crudos = bloque.iloc[orden, columnas].to_numpy(dtype=object)
+    huellas = huellas_celdas(crudos, len(periodos))
+    n_filas, n_periodos = huellas.shape
+    
+    reutilizables = np.zeros((n_filas, n_periodos), dtype=bool)
+    if (anterior is not None and identificacion['numero'].is_unique
+            and len(anterior['numeros']) and len(anterior['etiquetas'])):
+        fila_anterior = pd.Index(anterior['numeros']).get_indexer(identificacion['numero'])
+        periodo_anterior = pd.Index(anterior['etiquetas']).get_indexer(etiquetas)
+        reutilizables = ((fila_anterior >= 0)[:, None] & (periodo_anterior >= 0)[None, :]
+                         & (anterior['huellas'][fila_anterior[:, None], periodo_anterior[None, :]] == huellas))
+    
+    tabla_anterior = None
+    if reutilizables.any():
+        tabla_anterior = leer_snapshot(anterior['snapshot'], COLUMNAS_PERIODO + COLUMNAS_DERIVADAS)
+        if tabla_anterior is None or len(tabla_anterior) != anterior['huellas'].size:
+            reutilizables[:] = False
+    
+    if not reutilizables.any():
+        tabla = construir_tabla_indicadores(df, periodos)
+    else:
+        # Posición en la tabla anterior de cada celda reutilizada
+        posicion_anterior = (fila_anterior[:, None] * len(anterior['etiquetas']) + periodo_anterior[None, :])
+        reutilizar = reutilizables.ravel()
+        desde = posicion_anterior.ravel()[reutilizar]
+        
+        # Solo las celdas que cambiaron se convierten a texto y se recalculan
+        crudos = crudos.reshape(-1, len(COLUMNAS_PERIODO))
+        nuevos = _texto_celdas(pd.DataFrame(crudos[~reutilizar], columns=COLUMNAS_PERIODO), quitar_espacios=True)
+        valores = np.empty(crudos.shape, dtype=object)
+        valores[reutilizar] = tabla_anterior[COLUMNAS_PERIODO].to_numpy(dtype=object)[desde]
+        valores[~reutilizar] = nuevos.to_numpy(dtype=object)
+        
+        derivados_nuevos = derivados_ile(nuevos['ile'].astype(str))
+        derivados = {}
+        for col in COLUMNAS_DERIVADAS:
+            previos = tabla_anterior[col].to_numpy()
+            derivados[col] = np.empty(len(reutilizar), dtype=previos.dtype)
+            derivados[col][reutilizar] = previos[desde]
+            derivados[col][~reutilizar] = derivados_nuevos[col]
+        tabla = _tabla_larga(identificacion, etiquetas, valores, derivados)
+    
+    estado = {
+        'numeros': identificacion['numero'].to_numpy(),
+        'etiquetas': etiquetas,
+        'huellas': huellas,
+        'snapshot': snapshot
+    }
+    return tabla, estado, int((~reutilizables).sum())
+
+def leer_hoja(ruta, hoja=HOJA_DATOS):
+    """
+    Lee la hoja de indicadores sin encabezados con el lector configurado (INDICADORES_LECTOR)
+    """
+    return lector_excel.leer_hoja(ruta, hoja, PATRON_PERIODO, LECTOR_EXCEL != "completo", PATRON_META)
+
+def resolver_fuentes(fuentes):
+    """
+    Lista los libros a cargar a partir de un archivo, un directorio o un patrón glob
+    """
+    if os.path.isdir(fuentes):
+        rutas = glob.glob(os.path.join(fuentes, '*.xlsx'))
+    elif glob.has_magic(fuentes):
+        rutas = glob.glob(fuentes)
+    else:
+        rutas = [fuentes]
+    
+    # Excluir los archivos de bloqueo que crea Excel mientras un libro está abierto (~$...)
+    return sorted(ruta for ruta in rutas if not os.path.basename(ruta).startswith('~$'))
+
+def nombre_fuente(ruta):
+    """
+    Nombre del municipio a partir del nombre del archivo (indicadores_Ibague.xlsx -> Ibague)
+    """
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    nombre = re.sub(r'^indicadores[\s_-]*', '', base, flags=re.IGNORECASE)
+    return (nombre or base).replace('_', ' ')
+
+def get_periodos(tabla):
+    """
+    Devuelve las etiquetas de período de la tabla en orden cronológico de la hoja
+    """
+    return list(tabla['periodo'].cat.categories)
+
+# Paginación de la pestaña de progreso temporal
+OPCIONES_TAMANO_PAGINA = [5, 10, 20, 50]
+TAMANO_PAGINA = int(os.environ.get("INDICADORES_TAMANO_PAGINA", "10"))
+
+# Perfilado por etapas: INDICADORES_PERFIL=1 o ?perfil=1 en la URL; INDICADORES_PERFIL_LOG agrega cada rerun como JSON
+PERFIL_ACTIVO = os.environ.get("INDICADORES_PERFIL", "0").lower() not in ("", "0", "false", "no")
+ARCHIVO_PERFIL = os.environ.get("INDICADORES_PERFIL_LOG")
+
+class PerfilEjecucion:
+    """
+    Acumula la duración y el número de llamadas de cada etapa durante un rerun
+    """
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}  # etapa -> [segundos, llamadas]
+        self.estadisticas_iniciales = (obtener_estadisticas_cache(), get_cache_figuras().estadisticas())
+    
+    def registrar(self, etapa, segundos):
+        """
+        Suma una llamada de `segundos` a la etapa
+        """
+        acumulado = self.etapas.setdefault(etapa, [0.0, 0])
+        acumulado[0] += segundos
+        acumulado[1] += 1
+    
+    def resumen(self):
+        """
+        Devuelve las etapas, las tasas de acierto de las cachés en este rerun y la duración total
+        """
+        datos_antes, figuras_antes = self.estadisticas_iniciales
+        datos_despues, figuras_despues = obtener_estadisticas_cache(), get_cache_figuras().estadisticas()
+        consultas_datos = datos_despues['consultas'] - datos_antes['consultas']
+        cargas_datos = datos_despues['cargas'] - datos_antes['cargas']
+        aciertos_figuras = figuras_despues['aciertos'] - figuras_antes['aciertos']
+        consultas_figuras = aciertos_figuras + figuras_despues['fallos'] - figuras_antes['fallos']
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'total_ms': (time.perf_counter() - self.inicio) * 1000,
+            'etapas': {etapa: {'ms': segundos * 1000, 'llamadas': llamadas}
+                       for etapa, (segundos, llamadas) in self.etapas.items()},
+            'caches': {
+                'datos': {'consultas': consultas_datos, 'aciertos': consultas_datos - cargas_datos},
+                'figuras': {'consultas': consultas_figuras, 'aciertos': aciertos_figuras}
+            }
+        }
+
+_perfil = None  # PerfilEjecucion del rerun en curso; None con el perfilado desactivado
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mide el bloque como una llamada de la etapa (no hace nada si el perfilado está desactivado)
+    """
+    perfil = _perfil
+    if perfil is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.registrar(etapa, time.perf_counter() - inicio)
+
+def perfilado(etapa):
+    """
+    Decorador que registra cada llamada de la función como una llamada de la etapa
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            perfil = _perfil
+            if perfil is None:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                perfil.registrar(etapa, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+def fragmento_perfilado(etapa):
+    """
+    Decorador equivalente a st.fragment que también perfila los reruns del fragmento
+    
+    Un rerun de fragmento no pasa por main, así que no tendría perfil. Si el
+    perfilado está activo y no hay un rerun completo en curso, el fragmento
+    abre su propio PerfilEjecucion, mide su ejecución como `etapa` y muestra
+    el panel al pie del fragmento (un fragmento no puede escribir en el
+    sidebar); con INDICADORES_PERFIL_LOG el rerun se agrega con la clave
+    "fragmento". Dentro de un rerun completo lo mide el perfil de main.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            global _perfil
+            if _perfil is not None or not perfilado_solicitado():
+                return funcion(*args, **kwargs)
+            _perfil = PerfilEjecucion()
+            try:
+                with medir_etapa(etapa):
+                    return funcion(*args, **kwargs)
+            finally:
+                resumen = dict(_perfil.resumen(), fragmento=etapa)
+                _perfil = None
+                mostrar_panel_perfil(resumen, registrar_arranque(), st.container(), "⏱️ Rendimiento del fragmento")
+                escribir_perfil(resumen)
+        return st.fragment(envoltura)
+    return decorador
+
+@st.cache_resource
+def _estado_arranque():
+    """
+    Reporte de arranque del proceso, compartido entre sesiones (se llena en el primer rerun)
+    """
+    return {'lock': threading.Lock(), 'reporte': None}
+
+def registrar_arranque():
+    """
+    Registra una sola vez por proceso cuánto tardaron las importaciones y el primer render
+    
+    El reporte se escribe en el log del servidor con el logger del módulo y, con INDICADORES_PERFIL_LOG,
+    se agrega al archivo de perfil como una línea JSON con la clave "arranque".
+    Devuelve el reporte del primer rerun.
+    """
+    estado = _estado_arranque()
+    with estado['lock']:
+        if estado['reporte'] is not None:
+            return estado['reporte']
+        reporte = estado['reporte'] = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'importaciones_ms': (_FIN_IMPORTACIONES - _INICIO_SCRIPT) * 1000,
+            'primer_render_ms': (time.perf_counter() - _INICIO_SCRIPT) * 1000
+        }
+    
+    logger.info("Arranque: importaciones %.0f ms, primer render %.0f ms",
+                reporte['importaciones_ms'], reporte['primer_render_ms'])
+    if ARCHIVO_PERFIL:
+        try:
+            with open(ARCHIVO_PERFIL, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'arranque': reporte}, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+    return reporte
+
+# Caché de la tabla normalizada: snapshot columnar (Feather) junto al archivo Excel
+DIRECTORIO_SNAPSHOTS = os.environ.get("INDICADORES_CACHE_DIR", ".cache_indicadores")
+VERSION_SNAPSHOT = 4  # Incrementar cuando cambie el esquema de la tabla normalizada
+
+@st.cache_resource
+def _estado_cache_datos():
+    """
+    Estado de la caché de datos compartido entre sesiones (el script se re-ejecuta en cada rerun)
+    """
+    return {
+        'lock': threading.Lock(),
+        'huellas': {},  # (ruta, mtime_ns, tamaño) -> sha256 del contenido (solo la última de cada ruta)
+        'incremental': {},  # (ruta, hoja) -> huellas de procesar_hoja_incremental de la última versión leída
+        'estadisticas': {
+            'consultas': 0,
+            'cargas': 0,
+            'aciertos_snapshot': 0,
+            'fallos': 0,
+            'celdas_recalculadas': 0,
+            'celdas_leidas': 0,
+            'ultima_fuente': None,
+            'ultima_carga_ms': None,
+            'version': None
+        }
+    }
+
+def _registrar_carga(estado, aciertos_snapshot, fallos, inicio):
+    """
+    Actualiza los contadores de la caché después de cargar una versión de los datos
+    """
+    with estado['lock']:
+        estado['estadisticas']['cargas'] += 1
+        estado['estadisticas']['aciertos_snapshot'] += aciertos_snapshot
+        estado['estadisticas']['fallos'] += fallos
+        estado['estadisticas']['ultima_fuente'] = 'excel' if fallos else 'snapshot'
+        estado['estadisticas']['ultima_carga_ms'] = (time.perf_counter() - inicio) * 1000
+
+def obtener_estadisticas_cache():
+    """
+    Devuelve una copia de los contadores de aciertos y fallos de la caché de datos
+    """
+    estado = _estado_cache_datos()
+    with estado['lock']:
+        estadisticas = dict(estado['estadisticas'])
+    # Las consultas que no llegaron a cargar los libros se sirvieron desde memoria
+    estadisticas['aciertos_memoria'] = estadisticas['consultas'] - estadisticas['cargas']
+    return estadisticas
+
+def huella_archivo(ruta, estado):
+    """
+    Devuelve (mtime_ns, sha256) del archivo; el hash solo se recalcula si cambia mtime o tamaño
+    
+    `estado` es el de _estado_cache_datos, que guarda los hashes ya calculados.
+    """
+    info = os.stat(ruta)
+    clave = (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+    
+    huellas = estado['huellas']
+    sha256 = huellas.get(clave)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b''):
+                digest.update(bloque)
+        sha256 = digest.hexdigest()
+        # Solo se conserva la huella de la versión actual de cada archivo
+        with estado['lock']:
+            for anterior in [c for c in huellas if c[0] == clave[0]]:
+                del huellas[anterior]
+            huellas[clave] = sha256
+    
+    return info.st_mtime_ns, sha256
+
+def ruta_snapshot(ruta, hoja, sha256):
+    """
+    Ruta del snapshot Feather para una versión (contenido + hoja + esquema) del archivo
+    """
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    directorio = os.path.join(os.path.dirname(os.path.abspath(ruta)), DIRECTORIO_SNAPSHOTS)
+    return os.path.join(directorio, f"{base}_{hoja}_v{VERSION_SNAPSHOT}_{sha256[:20]}.feather")
+
+def leer_snapshot(ruta_feather, columnas=None):
+    """
+    Lee un snapshot Feather (o solo algunas columnas) mapeándolo en memoria; None si no existe o no es legible
+    """
+    if not ruta_feather or not os.path.exists(ruta_feather):
+        return None
+    try:
+        import pyarrow.feather as feather
+        return feather.read_table(ruta_feather, columns=columnas, memory_map=True).to_pandas()
+    except Exception:
+        return None
+
+def escribir_snapshot(tabla, ruta_feather):
+    """
+    Escribe el snapshot sin compresión (para poder mapearlo) y elimina versiones anteriores
+    """
+    try:
+        import pyarrow.feather as feather
+        directorio = os.path.dirname(ruta_feather)
+        os.makedirs(directorio, exist_ok=True)
+        
+        # Escritura atómica: otras réplicas nunca ven un archivo a medio escribir
+        temporal = f"{ruta_feather}.{os.getpid()}.tmp"
+        feather.write_feather(tabla, temporal, compression='uncompressed')
+        os.replace(temporal, ruta_feather)
+        
+        # Snapshots de versiones anteriores del archivo o del esquema
+        prefijo = os.path.basename(ruta_feather).rsplit('_v', 1)[0] + '_v'
+        for nombre in os.listdir(directorio):
+            if nombre.startswith(prefijo) and nombre.endswith('.feather') and nombre != os.path.basename(ruta_feather):
+                os.remove(os.path.join(directorio, nombre))
+    except Exception:
+        # El snapshot es solo una optimización; un disco de solo lectura no debe impedir la carga
+        pass
+
+def _leer_hojas(pendientes, hoja):
+    """
+    Lee las hojas de varios libros en paralelo; produce (ruta, sha256, DataFrame o excepción)
+    """
+    if len(pendientes) <= 1 or MAX_PROCESOS <= 1:
+        for ruta, sha256 in pendientes:
+            try:
+                yield ruta, sha256, leer_hoja(ruta, hoja)
+            except Exception as e:
+                yield ruta, sha256, e
+        return
+    
+    # Solo la lectura con openpyxl (lo costoso) va a los procesos; la normalización es vectorizada
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    proyectada = LECTOR_EXCEL != "completo"
+    # Nunca fork: el servidor de Streamlit tiene varios hilos y esta lectura puede venir del hilo de refresco
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=min(len(pendientes), MAX_PROCESOS),
+                             mp_context=multiprocessing.get_context(metodo)) as pool:
+        futuros = {pool.submit(lector_excel.leer_hoja, ruta, hoja, PATRON_PERIODO, proyectada, PATRON_META):
+                   (ruta, sha256)
+                   for ruta, sha256 in pendientes}
+        for futuro in as_completed(futuros):
+            ruta, sha256 = futuros[futuro]
+            try:
+                yield ruta, sha256, futuro.result()
+            except Exception as e:
+                yield ruta, sha256, e
+
+def ingerir_libros(huellas, hoja, estado):
+    """
+    Carga uno o varios libros (uno por municipio) en una sola tabla normalizada
+    
+    Cada libro se toma de su snapshot si existe; los demás se leen en paralelo.
+    `estado` (el de _estado_cache_datos) guarda los contadores y lo necesario
+    para la lectura incremental. Devuelve la tabla (None si ningún libro se
+    pudo cargar) y la lista de errores por archivo como tuplas (fuente, mensaje).
+    """
+    inicio = time.perf_counter()
+    tablas = {}
+    errores = []
+    pendientes = []
+    
+    for ruta, _, sha256 in huellas:
+        tabla = leer_snapshot(ruta_snapshot(ruta, hoja, sha256))
+        if tabla is not None:
+            tablas[ruta] = tabla
+        else:
+            pendientes.append((ruta, sha256))
+    aciertos = len(tablas)
+    
+    for ruta, sha256, resultado in _leer_hojas(pendientes, hoja):
+        try:
+            if isinstance(resultado, Exception):
+                raise resultado
+            # Si ya se procesó una versión anterior del libro, solo se recalculan las celdas que cambiaron
+            with estado['lock']:
+                anterior = estado['incremental'].get((ruta, hoja))
+            snapshot = ruta_snapshot(ruta, hoja, sha256)
+            tabla, incremental, recalculadas = procesar_hoja_incremental(resultado, anterior, snapshot)
+        except Exception as e:
+            errores.append((nombre_fuente(ruta), str(e)))
+            continue
+        with estado['lock']:
+            estado['incremental'][(ruta, hoja)] = incremental
+            estado['estadisticas']['celdas_recalculadas'] += recalculadas
+            estado['estadisticas']['celdas_leidas'] += incremental['huellas'].size
+        escribir_snapshot(tabla, snapshot)
+        tablas[ruta] = tabla
+    
+    _registrar_carga(estado, aciertos, len(pendientes), inicio)
+    
+    tablas_por_fuente = [(nombre_fuente(ruta), tablas[ruta]) for ruta, _, _ in huellas if ruta in tablas]
+    if not tablas_por_fuente:
+        return None, errores
+    return unir_tablas(tablas_por_fuente), errores
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _cargar_version(huellas, hoja):
+    """
+    Carga una versión concreta de los libros; la clave de caché incluye mtime y hash de cada uno
+    
+    Con st.cache_resource los datos se comparten sin serializarlos: el almacén
+    es una clase del script, que st.cache_data no puede copiar cuando otra
+    sesión re-ejecutó el script. Quien los recibe no debe modificarlos.
+    """
+    return cargar_version(huellas, hoja, _estado_cache_datos(), get_historico())
+
+def cargar_version(huellas, hoja, estado, historico):
+    """
+    Lee y normaliza una versión de los libros y arma los datos de las pestañas (sin caché en memoria)
+    
+    Recibe el estado de la caché de datos y el almacén histórico (o None) ya
+    resueltos, para poder llamarse desde el hilo de refresco, fuera de una
+    ejecución del script.
+    """
+    tabla, errores = ingerir_libros(huellas, hoja, estado)
+    version = hashlib.sha256(repr((hoja, [sha256 for _, _, sha256 in huellas])).encode()).hexdigest()
+    if tabla is None:
+        return _datos_vacios(errores)
+    tabla = agregar_columnas_filtro(tabla)
+    version = f"{hoja}:{version[:16]}"
+    
+    # Con el almacén histórico activo, cada versión nueva se agrega a su historial
+    try:
+        if historico is not None:
+            historico.guardar_tabla(tabla, version)
+    except Exception as e:
+        errores.append(("Histórico", f"No se pudo guardar en {ARCHIVO_HISTORICO}: {e}"))
+    return datos_desde_tabla(tabla, version, errores)
+
+# Validación de consistencia entre numerador, denominador e ILE
+TOLERANCIA_ILE = float(os.environ.get("INDICADORES_TOLERANCIA_ILE", "0.5"))  # Puntos porcentuales
+ILE_MAXIMO = float(os.environ.get("INDICADORES_ILE_MAXIMO", "100"))  # Porcentaje máximo esperado
+REGLAS_CONSISTENCIA = {
+    'ile_inconsistente': "ILE distinto de numerador / denominador",
+    'escala_ile': "ILE mal escalado por la corrección de decimales",
+    'denominador_cero': "Denominador en cero",
+    'fuera_de_rango': "Porcentaje fuera de rango",
+    'texto_cualitativo': "Texto distinto de SI/NO en indicador cualitativo",
+    'ile_sin_datos': "ILE numérico sin numerador o denominador"
+}
+
+@perfilado("Validación de consistencia")
+def validar_consistencia(tabla):
+    """
+    Revisa numerador, denominador e ILE de todas las celdas indicador × período y devuelve las anomalías
+    
+    Trabaja con arreglos de NumPy sobre todas las celdas a la vez. Recalcula
+    el porcentaje esperado (numerador / denominador × 100) y lo compara con el
+    ILE leído como porcentaje y como fracción, con una tolerancia de
+    TOLERANCIA_ILE puntos o 1% del esperado. Así distingue un ILE que no
+    corresponde a sus datos de uno bien calculado que derivados_ile
+    escaló mal (un porcentaje menor a 1 multiplicado por 100, o una fracción
+    mayor a 1 sin multiplicar). Un indicador es cualitativo si su cálculo
+    declarado (columna F) es SI/NO; si la hoja no lo declara, si la mayoría de
+    sus ILE reportados son SI/NO. El "0" que deja la fórmula del libro
+    (=numerador/denominador) cuando ambos están vacíos es un corte sin
+    reportar y se trata como pendiente; un ILE numérico al que le falta solo
+    uno de los dos, o distinto de 0 sin ninguno, sí se reporta. Devuelve una
+    fila por celda y regla incumplida, con la posición del indicador en el
+    almacén.
+    """
+    columnas = ['posicion', 'periodo', 'regla', 'numerador', 'denominador', 'ile', 'ile_valor', 'esperado']
+    n_periodos = len(tabla['periodo'].cat.categories)
+    if not len(tabla) or not n_periodos:
+        return pd.DataFrame(columns=columnas)
+    
+    numerador, denominador, ile = (_a_numero(tabla[columna]).to_numpy() for columna in COLUMNAS_PERIODO)
+    sin_numerador = (tabla['numerador'] == "").to_numpy()
+    sin_denominador = (tabla['denominador'] == "").to_numpy()
+    pendiente = tabla['pendiente'].to_numpy(dtype=bool) | (sin_numerador & sin_denominador & (ile == 0))
+    si_no = tabla['ile_si_no'].to_numpy(dtype=bool)
+    mostrado = tabla['ile_valor'].to_numpy(dtype=float)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        esperado = np.where(denominador != 0, numerador / denominador * 100, np.nan)
+        tolerancia = np.maximum(TOLERANCIA_ILE, np.abs(esperado) * 0.01)
+        como_porcentaje = np.abs(ile - esperado) <= tolerancia
+        como_fraccion = np.abs(ile * 100 - esperado) <= tolerancia
+        bien_mostrado = np.abs(mostrado - esperado) <= tolerancia
+    comparable = np.isfinite(esperado) & np.isfinite(ile) & ~si_no & ~pendiente
+    numerico = ~si_no & ~pendiente & np.isfinite(mostrado)
+    
+    reportados = (~pendiente).reshape(-1, n_periodos).sum(axis=1)
+    mayoria_si_no = (reportados > 0) & (2 * si_no.reshape(-1, n_periodos).sum(axis=1) >= reportados)
+    calculo = tabla['calculo'].iloc[::n_periodos]
+    declarado = calculo.str.strip().ne("").to_numpy(dtype=bool)
+    cualitativo = np.where(declarado, calculo.str.contains(PATRON_CALCULO_SI_NO).to_numpy(dtype=bool),
+                           mayoria_si_no)
+    
+    mascaras = {
+        'ile_inconsistente': comparable & ~como_porcentaje & ~como_fraccion,
+        'escala_ile': comparable & (como_porcentaje | como_fraccion) & ~bien_mostrado,
+        'denominador_cero': denominador == 0,
+        'fuera_de_rango': numerico & ((mostrado < 0) | (mostrado > ILE_MAXIMO)),
+        'texto_cualitativo': np.repeat(cualitativo, n_periodos) & ~pendiente & ~si_no,
+        'ile_sin_datos': numerico & (sin_numerador | sin_denominador)
+    }
+    filas = [np.flatnonzero(mascara) for mascara in mascaras.values()]
+    codigo_regla = np.repeat(np.arange(len(mascaras)), [len(f) for f in filas])
+    filas = np.concatenate(filas)
+    
+    return pd.DataFrame({
+        'posicion': filas // n_periodos,
+        'periodo': pd.Categorical.from_codes(tabla['periodo'].cat.codes.to_numpy()[filas],
+                                             dtype=tabla['periodo'].dtype),
+        'regla': pd.Categorical.from_codes(codigo_regla, categories=list(mascaras)),
+        'numerador': tabla['numerador'].take(filas).to_numpy(dtype=object),
+        'denominador': tabla['denominador'].take(filas).to_numpy(dtype=object),
+        'ile': tabla['ile'].take(filas).to_numpy(dtype=object),
+        'ile_valor': mostrado[filas],
+        'esperado': esperado[filas]
+    }, columns=columnas)
+
+def _datos_vacios(errores=None):
+    """
+    Datos sin indicadores (mismas claves que devuelve la carga)
+    """
+    return {'almacen': None, 'periodos': [], 'indices': None, 'anomalias': None, 'tendencias': None, 'version': None, 'fuentes': [],
+            'errores': errores or []}
+
+def datos_desde_tabla(tabla, version, errores):
+    """
+    Arma los datos de las pestañas (almacén, períodos, índices, anomalías y tendencias) a partir de la tabla normalizada
+    """
+    almacen = AlmacenIndicadores(tabla)
+    return {
+        'almacen': almacen,
+        'periodos': almacen.periodos,
+        'indices': construir_indices(almacen),
+        'anomalias': validar_consistencia(tabla),
+        'tendencias': calcular_tendencias(almacen),
+        'version': version,
+        'fuentes': sorted(tabla['fuente'].unique()),
+        'errores': errores
+    }
+
+@perfilado("Carga de datos")
+def load_and_process_data(fuentes=None, hoja=HOJA_DATOS):
+    """
+    Carga y procesa el archivo Excel de indicadores (o un libro por municipio)
+    
+    Devuelve un diccionario con el almacén compacto de los indicadores
+    (AlmacenIndicadores), los períodos, los índices de los filtros, la versión
+    de los datos, las fuentes cargadas y los errores de cada archivo que no se
+    pudo leer.
+    
+    El dashboard ya no pasa por aquí (usa obtener_datos_vigentes); la usan
+    generar_reporte.py y benchmarks/ejecutar_benchmark.py, que cargan una vez
+    por proceso. Por eso no suma consultas a las estadísticas de la caché: los
+    aciertos en memoria del sidebar son solo los de obtener_datos_vigentes.
+    """
+    huellas = []
+    errores = []
+    try:
+        estado = _estado_cache_datos()
+        rutas = resolver_fuentes(fuentes or FUENTES_DATOS)
+        for ruta in rutas:
+            try:
+                huellas.append((ruta, *huella_archivo(ruta, estado)))
+            except OSError as e:
+                errores.append((nombre_fuente(ruta), str(e)))
+        
+        datos = _cargar_version(tuple(huellas), hoja) if huellas else _datos_vacios()
+        # Copia superficial: los datos de la caché se comparten entre sesiones
+        return dict(datos, errores=errores + datos['errores'])
+    except Exception as e:
+        st.error(f"Error al cargar el archivo: {str(e)}")
+        return _datos_vacios(errores)
+
+# Refresco en segundo plano: las sesiones usan la última versión cargada mientras se procesa la siguiente
+INTERVALO_REFRESCO = float(os.environ.get("INDICADORES_REFRESCO_SEGUNDOS", "5"))
+
+class RefrescoDatos:
+    """
+    Vigila los libros desde un hilo y carga cada versión nueva fuera de las solicitudes
+    
+    Solo la primera carga es síncrona. Después las sesiones leen siempre la
+    versión vigente, que se reemplaza de una vez (una sola asignación bajo el
+    lock) cuando el hilo termina de procesar la siguiente. Con intervalo 0 no
+    hay hilo: cada solicitud revisa los libros y carga los cambios, como antes.
+    Los datos vigentes se comparten entre sesiones y no deben modificarse.
+    
+    El hilo no tiene contexto de ejecución de Streamlit, así que recibe el
+    estado de la caché de datos y el almacén histórico ya resueltos en lugar
+    de pedirlos a las funciones con caché.
+    """
+    
+    def __init__(self, fuentes, hoja, estado_datos, historico, intervalo=INTERVALO_REFRESCO):
+        self.fuentes = fuentes
+        self.hoja = hoja
+        self.estado_datos = estado_datos
+        self.historico = historico
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()  # Una sola carga a la vez (arranque o hilo)
+        self._detener = threading.Event()
+        self._hilo = None
+        self._vigente = None  # (huellas, datos, datos al, cargados el)
+        self._descartadas = None  # Huellas de una versión que no se pudo cargar
+        self.estado = {'actualizando': False, 'ultima_revision': None, 'ultimo_error': None, 'reemplazos': 0}
+    
+    def _huellas(self):
+        """
+        Huellas (ruta, mtime_ns, sha256) de los libros de las fuentes y errores de los que no se pueden leer
+        """
+        huellas = []
+        errores = []
+        for ruta in resolver_fuentes(self.fuentes):
+            try:
+                huellas.append((ruta, *huella_archivo(ruta, self.estado_datos)))
+            except OSError as e:
+                errores.append((nombre_fuente(ruta), str(e)))
+        return tuple(huellas), errores
+    
+    def revisar(self):
+        """
+        Carga los libros si cambiaron desde la versión vigente; devuelve True si se reemplazaron los datos
+        
+        Una versión que falla, o de la que no se pudo cargar ningún libro, no
+        reemplaza a la vigente; queda anotada en el estado y no se reintenta
+        hasta que los archivos vuelvan a cambiar.
+        """
+        with self._lock_carga:
+            huellas = None
+            try:
+                huellas, errores = self._huellas()
+                with self._lock:
+                    self.estado['ultima_revision'] = datetime.now()
+                    vigente = self._vigente
+                if (vigente is not None and huellas == vigente[0]) or huellas == self._descartadas:
+                    return False
+                
+                with self._lock:
+                    self.estado['actualizando'] = True
+                # Sin caché de Streamlit: cada versión se carga una sola vez y la guarda el refresco
+                datos = cargar_version(huellas, self.hoja, self.estado_datos, self.historico) if huellas else _datos_vacios()
+                datos['errores'] = errores + datos['errores']
+            except Exception as e:
+                with self._lock:
+                    self._descartadas = huellas
+                    self.estado['actualizando'] = False
+                    self.estado['ultimo_error'] = str(e)
+                    if self._vigente is None:
+                        self._vigente = ((), _datos_vacios([("Carga", str(e))]), None, datetime.now())
+                return False
+            
+            with self._lock:
+                self.estado['actualizando'] = False
+                if datos['almacen'] is None and vigente is not None and vigente[1]['almacen'] is not None:
+                    self._descartadas = huellas
+                    self.estado['ultimo_error'] = "; ".join(f"{fuente}: {mensaje}" for fuente, mensaje in datos['errores'])
+                    return False
+                
+                # Fecha de los datos: la última modificación entre los libros de la versión
+                datos_al = datetime.fromtimestamp(max(mtime for _, mtime, _ in huellas) / 1e9) if huellas else None
+                self._vigente = (huellas, datos, datos_al, datetime.now())
+                self._descartadas = None
+                self.estado['ultimo_error'] = None
+                self.estado['reemplazos'] += 1
+            return True
+    
+    def _ciclo(self):
+        """
+        Bucle del hilo: revisa los libros cada intervalo hasta que se llame a detener
+        """
+        while not self._detener.wait(self.intervalo):
+            self.revisar()
+    
+    def detener(self, espera=None):
+        """
+        Detiene el hilo de refresco; espera a que termine la revisión en curso (hasta `espera` segundos)
+        """
+        self._detener.set()
+        with self._lock:
+            hilo = self._hilo
+        if hilo is not None and hilo is not threading.current_thread():
+            hilo.join(espera)
+    
+    def obtener(self):
+        """
+        Devuelve (datos, datos al, cargados el) de la versión vigente; solo espera si aún no hay ninguna
+        """
+        if self._vigente is None or self.intervalo <= 0:
+            self.revisar()
+        if self.intervalo > 0 and self._hilo is None and not self._detener.is_set():
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._ciclo, name="refresco-indicadores", daemon=True)
+                    self._hilo.start()
+        with self._lock:
+            _, datos, datos_al, cargados = self._vigente
+        return datos, datos_al, cargados
+    
+    def resumen(self):
+        """
+        Copia del estado del refresco (revisiones, reemplazos y último error) para el sidebar
+        """
+        with self._lock:
+            return dict(self.estado, activo=self._hilo is not None and self._hilo.is_alive())
+
+@st.cache_resource(show_spinner=False, on_release=RefrescoDatos.detener)
+def get_refresco(fuentes, hoja=HOJA_DATOS):
+    """
+    Refresco de datos compartido por todas las sesiones para unas fuentes y hoja dadas
+    
+    Al salir de la caché (get_refresco.clear() o desalojo) se detiene su hilo.
+    """
+    return RefrescoDatos(fuentes, hoja, _estado_cache_datos(), get_historico())
+
+@perfilado("Carga de datos")
+def obtener_datos_vigentes(fuentes=None, hoja=HOJA_DATOS):
+    """
+    Datos del dashboard desde el refresco en segundo plano: (datos, datos al, cargados el)
+    
+    Solo la primera solicitud del proceso espera la lectura de los libros; las
+    siguientes reciben la versión vigente aunque haya otra procesándose.
+    """
+    try:
+        datos, datos_al, cargados = get_refresco(fuentes or FUENTES_DATOS, hoja).obtener()
+    except Exception as e:
+        st.error(f"Error al cargar el archivo: {str(e)}")
+        return _datos_vacios(), None, None
+    
+    estado = _estado_cache_datos()
+    with estado['lock']:
+        estado['estadisticas']['consultas'] += 1
+        estado['estadisticas']['version'] = datos['version']
+    return datos, datos_al, cargados
+
+# Almacén histórico opcional (SQLite): conserva los períodos ingeridos aunque salgan de la hoja
+ARCHIVO_HISTORICO = os.environ.get("INDICADORES_HISTORICO")
+CONEXIONES_HISTORICO = int(os.environ.get("INDICADORES_HISTORICO_CONEXIONES", "4"))
+
+ESQUEMA_HISTORICO = """
+CREATE TABLE IF NOT EXISTS indicadores (
+    fuente TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    linea TEXT NOT NULL,
+    linea_numero INTEGER NOT NULL,
+    linea_nombre TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    definicion TEXT NOT NULL,
+    meta REAL,
+    calculo TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (fuente, numero)
+);
+CREATE TABLE IF NOT EXISTS periodos (
+    periodo TEXT PRIMARY KEY,
+    orden INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mediciones (
+    fuente TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    periodo TEXT NOT NULL,
+    orden_periodo INTEGER NOT NULL,
+    numerador TEXT NOT NULL,
+    denominador TEXT NOT NULL,
+    ile TEXT NOT NULL,
+    version TEXT NOT NULL,
+    PRIMARY KEY (fuente, numero, periodo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versiones (
+    version TEXT PRIMARY KEY,
+    ingerida TEXT NOT NULL,
+    filas_modificadas INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mediciones_orden ON mediciones (orden_periodo, fuente, numero);
+CREATE INDEX IF NOT EXISTS idx_indicadores_linea ON indicadores (linea_nombre);
+CREATE INDEX IF NOT EXISTS idx_indicadores_tipo ON indicadores (tipo);
+"""
+
+# Una medición solo se reescribe si cambió su valor; `version` queda en la última que lo modificó
+SQL_GUARDAR_MEDICION = """
+INSERT INTO mediciones (fuente, numero, periodo, orden_periodo, numerador, denominador, ile, version)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (fuente, numero, periodo) DO UPDATE SET
+    numerador = excluded.numerador, denominador = excluded.denominador, ile = excluded.ile,
+    version = excluded.version
+WHERE numerador IS NOT excluded.numerador OR denominador IS NOT excluded.denominador OR ile IS NOT excluded.ile
+"""
+
+def _orden_periodo(etiqueta):
+    """
+    Clave entera AAAAMM del período para las consultas por rango de fechas
+    """
+    anio, mes, _ = _clave_periodo(etiqueta)
+    return anio * 100 + mes
+
+class AlmacenHistorico:
+    """
+    Historial de todas las mediciones ingeridas en SQLite, con un pool pequeño de conexiones
+    
+    La base usa WAL: varias sesiones leen mientras una ingesta escribe. Las
+    escrituras de este proceso se serializan con un lock y las de otras
+    réplicas esperan con `busy_timeout`.
+    """
+    def __init__(self, ruta, conexiones=4):
+        self.ruta = ruta
+        self.pool = queue.Queue()
+        self.lock_escritura = threading.Lock()
+        for _ in range(max(conexiones, 1)):
+            self.pool.put(None)  # Las conexiones se abren al usarse por primera vez
+        with self.conexion() as conexion:
+            conexion.executescript(ESQUEMA_HISTORICO)
+            # Bases creadas antes de que se leyeran las metas o el cálculo declarado
+            existentes = [fila[1] for fila in conexion.execute("PRAGMA table_info(indicadores)")]
+            for columna, tipo in [('meta', "REAL"), ('calculo', "TEXT NOT NULL DEFAULT ''")]:
+                if columna not in existentes:
+                    conexion.execute(f"ALTER TABLE indicadores ADD COLUMN {columna} {tipo}")
+    
+    def _abrir(self):
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        return conexion
+    
+    @contextmanager
+    def conexion(self):
+        """
+        Toma una conexión del pool (espera si todas están en uso) y la devuelve al terminar
+        """
+        conexion = self.pool.get()
+        try:
+            if conexion is None:
+                conexion = self._abrir()
+            yield conexion
+        finally:
+            self.pool.put(conexion)
+    
+    def guardar_tabla(self, tabla, version):
+        """
+        Agrega una versión de la tabla normalizada; devuelve las mediciones nuevas o modificadas
+        
+        Una versión ya guardada no vuelve a escribir sus mediciones, pero sí la
+        identificación de los indicadores, para completar las columnas que se
+        agregaron al esquema después de ingerirla. Los períodos que ya no
+        están en la hoja conservan sus mediciones anteriores.
+        """
+        etiquetas = get_periodos(tabla)
+        if not etiquetas:
+            return 0
+        
+        identificacion = tabla.iloc[::len(etiquetas)]
+        columnas = ['fuente', 'numero', 'linea', 'linea_numero', 'linea_nombre', 'nombre', 'tipo',
+                    'definicion', 'calculo', 'meta']
+        sql_identificacion = (f"INSERT OR REPLACE INTO indicadores ({', '.join(columnas)}) "
+                              f"VALUES ({', '.join('?' * len(columnas))})")
+        filas_identificacion = list(zip(*(identificacion[col].tolist() for col in columnas)))  # NaN se guarda como NULL
+        
+        with self.lock_escritura, self.conexion() as conexion:
+            guardada = conexion.execute("SELECT 1 FROM versiones WHERE version = ?", (version,)).fetchone()
+            
+            ordenes = {etiqueta: _orden_periodo(etiqueta) for etiqueta in etiquetas}
+            periodo = tabla['periodo'].astype(str)
+            mediciones = zip(
+                tabla['fuente'].tolist(), tabla['numero'].tolist(), periodo.tolist(),
+                periodo.map(ordenes).tolist(), tabla['numerador'].tolist(),
+                tabla['denominador'].tolist(), tabla['ile'].tolist(), [version] * len(tabla)
+            )
+            
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                conexion.executemany(sql_identificacion, filas_identificacion)
+                modificadas = 0
+                if not guardada:
+                    conexion.executemany("INSERT OR IGNORE INTO periodos VALUES (?, ?)", ordenes.items())
+                    cambios_previos = conexion.total_changes
+                    conexion.executemany(SQL_GUARDAR_MEDICION, mediciones)
+                    modificadas = conexion.total_changes - cambios_previos
+                    conexion.execute("INSERT INTO versiones VALUES (?, ?, ?)",
+                                     (version, datetime.now().isoformat(timespec='seconds'), modificadas))
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+        return modificadas
+    
+    def marca(self):
+        """
+        Identifica el estado del historial (versiones guardadas y última ingesta) para las cachés
+        """
+        with self.conexion() as conexion:
+            return conexion.execute("SELECT COUNT(*), COALESCE(MAX(ingerida), '') FROM versiones").fetchone()
+    
+    def periodos(self):
+        """
+        Todos los períodos guardados, en orden cronológico
+        """
+        with self.conexion() as conexion:
+            etiquetas = [fila[0] for fila in conexion.execute("SELECT periodo FROM periodos")]
+        return sorted(etiquetas, key=_clave_periodo)
+    
+    def opciones(self):
+        """
+        Valores de los filtros del sidebar presentes en el historial
+        """
+        with self.conexion() as conexion:
+            return {
+                dimension: [fila[0] for fila in conexion.execute(
+                    f"SELECT DISTINCT {dimension} FROM indicadores ORDER BY {dimension}")]
+                for dimension in ['fuente', 'linea_nombre', 'tipo']
+            }
+    
+    def consultar(self, periodos, fuentes=(), lineas=(), tipos=()):
+        """
+        Mediciones de los períodos indicados filtradas por municipio, línea y tipo (sin filtro si vacío)
+        
+        El rango de fechas y los filtros se resuelven en SQLite con los índices;
+        a memoria solo llegan las filas pedidas.
+        """
+        ordenes = [_orden_periodo(periodo) for periodo in periodos]
+        condiciones = ["m.orden_periodo BETWEEN ? AND ?"]
+        parametros = [min(ordenes), max(ordenes)]
+        for columna, valores in [('i.fuente', fuentes), ('i.linea_nombre', lineas), ('i.tipo', tipos)]:
+            if valores:
+                condiciones.append(f"{columna} IN ({', '.join('?' * len(valores))})")
+                parametros += list(valores)
+        
+        consulta = f"""
+            SELECT i.fuente, i.numero, i.linea, i.linea_numero, i.nombre, i.tipo, i.definicion, i.calculo, i.meta,
+                   m.periodo, m.numerador, m.denominador, m.ile
+            FROM mediciones m JOIN indicadores i ON i.fuente = m.fuente AND i.numero = m.numero
+            WHERE {' AND '.join(condiciones)}
+        """
+        with self.conexion() as conexion:
+            # Sin dtype, una meta que es NULL en todas las filas llegaría como None en vez de NaN
+            filas = pd.read_sql_query(consulta, conexion, params=parametros, dtype={'meta': float})
+        # Etiquetas no reconocidas comparten la clave de orden; se descartan las que no se pidieron
+        return filas[filas['periodo'].isin(periodos)]
+
+@st.cache_resource
+def get_historico():
+    """
+    Almacén histórico compartido entre sesiones (None si INDICADORES_HISTORICO no está definido)
+    """
+    if not ARCHIVO_HISTORICO:
+        return None
+    return AlmacenHistorico(ARCHIVO_HISTORICO, CONEXIONES_HISTORICO)
+
+def tabla_desde_historico(filas, periodos):
+    """
+    Arma la tabla normalizada (indicador × período) con las mediciones leídas del histórico
+    
+    Los períodos sin medición de un indicador quedan como pendientes.
+    """
+    tablas_por_fuente = []
+    for fuente, grupo in filas.groupby('fuente', sort=True):
+        identificacion = grupo.drop_duplicates('numero')[COLUMNAS_IDENTIFICACION]
+        orden = np.lexsort((identificacion['numero'].to_numpy(), identificacion['linea_numero'].to_numpy()))
+        identificacion = identificacion.iloc[orden].reset_index(drop=True)
+        
+        valores = np.full((len(identificacion), len(periodos), len(COLUMNAS_PERIODO)), "", dtype=object)
+        fila = pd.Index(identificacion['numero']).get_indexer(grupo['numero'])
+        columna = pd.Index(periodos).get_indexer(grupo['periodo'])
+        valores[fila, columna] = grupo[COLUMNAS_PERIODO].to_numpy(dtype=object)
+        tablas_por_fuente.append(
+            (fuente, _tabla_larga(identificacion, periodos, valores.reshape(-1, len(COLUMNAS_PERIODO)))))
+    return unir_tablas(tablas_por_fuente)
+
+@perfilado("Consulta del histórico")  # Fuera de la caché: también mide los aciertos
+@st.cache_resource(max_entries=16, show_spinner=False)
+def consultar_historico(marca, periodos, fuentes, lineas, tipos):
+    """
+    Datos de las pestañas leídos del almacén histórico para un rango de períodos y filtros
+    
+    `marca` (estado del historial) invalida la caché cuando se ingiere una
+    versión nueva. Devuelve None si no hay mediciones. Como en
+    _cargar_version, el resultado se comparte entre sesiones sin copiarlo y
+    no debe modificarse.
+    """
+    filas = get_historico().consultar(list(periodos), fuentes, lineas, tipos)
+    if filas.empty:
+        return None
+    tabla = agregar_columnas_filtro(tabla_desde_historico(filas, list(periodos)))
+    version = hashlib.sha256(repr((marca, periodos, fuentes, lineas, tipos)).encode()).hexdigest()
+    return datos_desde_tabla(tabla, f"historico:{version[:16]}", [])
+
+# Etiquetas de los tipos detectados por detect_indicator_type
+ETIQUETAS_TIPO_DETECTADO = {
+    "cualitativo": "📊 Cualitativo",
+    "cuantitativo": "📈 Cuantitativo",
+    "sin_datos": "⚪ Sin datos"
+}
+
+def detect_indicator_type(serie):
+    """
+    Detecta si un indicador es cualitativo (SI/NO) o cuantitativo (numérico) en los períodos de la serie
+    """
+    if not serie.reportado.any():
+        return "sin_datos"
+    
+    # Verificar si todos los valores reportados son SI/NO
+    if serie.si_no[serie.reportado].all():
+        return "cualitativo"
+    else:
+        return "cuantitativo"
+
+def calcular_seguimiento(serie, periodos):
+    """
+    Porcentaje de períodos con ILE reportado
+    """
+    if not periodos:
+        return 0.0
+    return float(serie.reportado.sum()) / len(periodos) * 100
+
+def traza_progreso(serie):
+    """
+    Construye la traza del gráfico de progreso de una serie y devuelve (traza, tipo detectado)
+    
+    Barras SI/NO para los indicadores cualitativos y línea para los
+    cuantitativos; (None, None) si no hay ningún valor reportado.
+    """
+    valores = []
+    etiquetas = []
+    valores_originales = []
+    valores_display = []
+    
+    for j, periodo in enumerate(serie.periodos):
+        etiquetas.append(periodo)
+        
+        if not serie.reportado[j]:
+            valores.append(None)
+            valores_originales.append('Pendiente')
+            valores_display.append(None)
+        elif serie.si_no[j]:
+            # El ILE es 1 para SI y 0 para NO
+            es_si = serie.ile[j] == 1
+            valores.append(1 if es_si else 0)
+            valores_originales.append('SI' if es_si else 'NO')
+            valores_display.append(1)
+        else:
+            # Porcentaje ya corregido al cargar; el texto no numérico se muestra tal cual
+            numero = float(serie.ile[j]) if not np.isnan(serie.ile[j]) else serie.mostrar[j]
+            valores.append(numero)
+            valores_originales.append(serie.mostrar[j])
+            valores_display.append(numero)
+    
+    if not valores or all(v is None for v in valores):
+        return None, None
+    
+    # Detectar tipo de indicador
+    tipo_indicador = detect_indicator_type(serie)
+    
+    if tipo_indicador == "cualitativo":
+        # Gráfico de barras para indicadores SI/NO
+        colores = []
+        textos = []
+        valores_barras = []
+        
+        for i, val in enumerate(valores):
+            if val == 1 and valores_originales[i] == 'SI':
+                colores.append('#28a745')  # Verde para SI
+                textos.append('SI')
+                valores_barras.append(1)
+            elif val == 0 and valores_originales[i] == 'NO':
+                colores.append('#dc3545')  # Rojo para NO
+                textos.append('NO')
+                valores_barras.append(1)
+            else:
+                colores.append('#6c757d')  # Gris para pendiente
+                textos.append('Pendiente')
+                valores_barras.append(0.5)
+        
+        return go.Bar(
+            x=etiquetas,
+            y=valores_barras,
+            marker_color=colores,
+            text=textos,
+            textposition='inside',
+            textfont=dict(color='white', size=14)
+        ), tipo_indicador
+    
+    # Gráfico de línea para indicadores cuantitativos
+    return go.Scatter(
+        x=etiquetas,
+        y=valores_display,
+        mode='lines+markers+text',
+        line=dict(color='#007bff', width=3),
+        marker=dict(size=10, color='#007bff'),
+        text=valores_originales,
+        textposition='top center',
+        connectgaps=False
+    ), tipo_indicador
+
+# Eje del gráfico SI/NO: las barras miden 1 (SI o NO) o 0.5 (pendiente)
+EJE_CUALITATIVO = dict(tickvals=[0, 0.5, 1], ticktext=['', 'Pendiente', 'Cumplido'])
+
+@perfilado("Gráfico de progreso")
+def create_progress_chart(indicador, serie):
+    """
+    Crea gráfico de progreso para un indicador específico
+    """
+    traza, tipo_indicador = traza_progreso(serie)
+    if traza is None:
+        return None
+    
+    # Crear gráfico
+    fig = go.Figure()
+    fig.add_trace(traza)
+    
+    if tipo_indicador == "cualitativo":
+        fig.update_layout(yaxis=EJE_CUALITATIVO, height=350)
+    else:
+        fig.update_layout(height=350)
+    
+    fig.update_layout(
+        title=f"Indicador {indicador.numero}: {indicador.nombre_corto}...",
+        xaxis_title="Período",
+        showlegend=False,
+        template="plotly_white",
+        font=dict(size=12),
+        margin=dict(l=20, r=20, t=60, b=20)
+    )
+    
+    return fig
+
+# Vista por línea estratégica: una figura con un subgráfico por indicador
+VISTAS_PROGRESO = ["Por indicador", "Por línea estratégica"]
+COLUMNAS_FACETAS = int(os.environ.get("INDICADORES_COLUMNAS_FACETAS", "2"))
+ALTO_FACETA = 220  # Alto de cada fila de subgráficos (px)
+
+@perfilado("Gráfico por línea")
+def crear_grafico_linea(indicadores, series, multiples_fuentes=False):
+    """
+    Crea una figura con un subgráfico por indicador que comparten el eje de períodos
+    
+    Cada subgráfico usa la misma traza que create_progress_chart (barras SI/NO
+    o línea); los indicadores sin valores reportados quedan marcados "Sin datos".
+    """
+    from plotly.subplots import make_subplots
+    
+    columnas = max(1, min(COLUMNAS_FACETAS, len(indicadores)))
+    filas = -(-len(indicadores) // columnas)
+    titulos = []
+    for indicador in indicadores:
+        titulo = f"{indicador.numero}. {indicador.nombre_corto[:45]}"
+        if multiples_fuentes:
+            titulo += f" — {indicador.fuente}"
+        titulos.append(titulo)
+    
+    fig = make_subplots(
+        rows=filas, cols=columnas, shared_xaxes='all', subplot_titles=titulos,
+        vertical_spacing=60 / (filas * ALTO_FACETA), horizontal_spacing=0.06
+    )
+    periodos = series[0].periodos if series else []
+    for k, serie in enumerate(series):
+        fila, columna = divmod(k, columnas)
+        traza, tipo_indicador = traza_progreso(serie)
+        if traza is None:
+            eje = "" if k == 0 else str(k + 1)
+            fig.add_annotation(text="Sin datos", xref=f"x{eje} domain", yref=f"y{eje} domain", x=0.5, y=0.5,
+                               showarrow=False, font=dict(color='#6c757d'))
+            continue
+        # Textos y marcadores más pequeños para que quepan en el subgráfico
+        traza.update(textfont_size=10)
+        if tipo_indicador != "cualitativo":
+            traza.update(marker_size=6)
+        fig.add_trace(traza, row=fila + 1, col=columna + 1)
+        if tipo_indicador == "cualitativo":
+            fig.update_yaxes(row=fila + 1, col=columna + 1, **EJE_CUALITATIVO)
+        # Períodos visibles en el último subgráfico de cada columna
+        if k + columnas >= len(series):
+            fig.update_xaxes(showticklabels=True, row=fila + 1, col=columna + 1)
+    
+    fig.update_xaxes(categoryorder='array', categoryarray=periodos)
+    fig.update_annotations(font_size=12)
+    fig.update_layout(
+        height=filas * ALTO_FACETA + 60,
+        showlegend=False,
+        template="plotly_white",
+        font=dict(size=11),
+        margin=dict(l=20, r=20, t=40, b=20)
+    )
+    return fig
+
+# Caché de figuras de progreso compartida entre sesiones
+MAX_FIGURAS_CACHE = int(os.environ.get("INDICADORES_MAX_FIGURAS", "256"))
+MAX_BYTES_FIGURAS_CACHE = int(os.environ.get("INDICADORES_MAX_MB_FIGURAS", "32")) * 1024 * 1024
+
+class CacheFiguras:
+    """
+    Caché LRU de figuras de Plotly acotada por número de entradas y por bytes
+    
+    Las claves son hashes del contenido de cada gráfico, así que una figura de
+    una versión anterior de los datos nunca se sirve por error: si nadie la
+    vuelve a pedir, el LRU la desaloja, y la de un indicador que no cambió se
+    sigue reutilizando con la versión nueva.
+    """
+    def __init__(self, max_entradas, max_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._figuras = OrderedDict()  # clave -> (figura, tamaño en bytes)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.bytes_residentes = 0
+    
+    def obtener(self, clave, construir):
+        """
+        Devuelve la figura de la clave, construyéndola y guardándola si no está en caché
+        """
+        with self._lock:
+            if clave in self._figuras:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+                return self._figuras[clave][0]
+            self.fallos += 1
+        
+        # La construcción se hace fuera del lock para no bloquear otras sesiones
+        figura = construir()
+        tamano = len(figura.to_json()) if figura is not None else 0
+        
+        with self._lock:
+            if clave not in self._figuras:
+                self._figuras[clave] = (figura, tamano)
+                self.bytes_residentes += tamano
+            self._figuras.move_to_end(clave)
+            
+            # Desalojar las menos usadas recientemente hasta respetar ambos límites
+            while self._figuras and (len(self._figuras) > self.max_entradas
+                                     or self.bytes_residentes > self.max_bytes):
+                _, (_, tamano_desalojado) = self._figuras.popitem(last=False)
+                self.bytes_residentes -= tamano_desalojado
+                self.desalojos += 1
+        
+        return figura
+    
+    def estadisticas(self):
+        """
+        Devuelve aciertos, fallos, desalojos y tamaño residente de la caché
+        """
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'entradas': len(self._figuras),
+                'bytes_residentes': self.bytes_residentes,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'max_entradas': self.max_entradas,
+                'max_bytes': self.max_bytes
+            }
+
+@st.cache_resource
+def get_cache_figuras():
+    """
+    Instancia única de la caché de figuras para todo el proceso
+    """
+    return CacheFiguras(MAX_FIGURAS_CACHE, MAX_BYTES_FIGURAS_CACHE)
+
+def clave_figura(indicador, serie):
+    """
+    Hash estable de los datos del indicador y de los períodos que determinan su gráfico
+    """
+    digest = hashlib.sha256(json.dumps(
+        [indicador.numero, indicador.nombre, serie.periodos, serie.mostrar.tolist()], ensure_ascii=False
+    ).encode('utf-8'))
+    for arreglo in (serie.ile, serie.reportado, serie.si_no):
+        digest.update(arreglo.tobytes())
+    return digest.hexdigest()
+
+def obtener_grafico_progreso(indicador, serie):
+    """
+    Versión memoizada de create_progress_chart
+    """
+    return get_cache_figuras().obtener(
+        clave_figura(indicador, serie),
+        lambda: create_progress_chart(indicador, serie)
+    )
+
+def obtener_grafico_linea(indicadores, series, multiples_fuentes=False):
+    """
+    Versión memoizada de crear_grafico_linea (la clave combina las de cada indicador)
+    """
+    claves = [clave_figura(indicador, serie) for indicador, serie in zip(indicadores, series)]
+    clave = hashlib.sha256(repr(("linea", COLUMNAS_FACETAS, multiples_fuentes, claves)).encode()).hexdigest()
+    return get_cache_figuras().obtener(
+        clave,
+        lambda: crear_grafico_linea(indicadores, series, multiples_fuentes)
+    )
+
+def limpiar_texto_markdown(texto):
+    """
+    Limpia texto para evitar problemas con markdown
+    """
+    if not texto:
+        return ""
+    
+    # Reemplazar caracteres problemáticos
+    texto_limpio = str(texto)
+    texto_limpio = texto_limpio.replace('*', '')
+    texto_limpio = texto_limpio.replace('\r\n', ' ')
+    texto_limpio = texto_limpio.replace('\r', ' ')
+    texto_limpio = texto_limpio.replace('\n', ' ')
+    texto_limpio = texto_limpio.replace('\t', ' ')
+    
+    # Limpiar espacios múltiples
+    texto_limpio = re.sub(r'\s+', ' ', texto_limpio)
+    
+    return texto_limpio.strip()
+
+LARGO_NOMBRE_CORTO = 50  # Caracteres del nombre en el título de los gráficos
+LARGO_DEFINICION_CORTA = 200  # Caracteres de la definición antes de "Ver definición completa"
+
+def agregar_textos_presentacion(identificacion):
+    """
+    Agrega a la identificación el nombre y la definición limpios y sus formas recortadas para mostrar
+    
+    Se calculan una vez por versión de los datos y por texto distinto (las
+    columnas son categóricas); los reruns leen estas columnas en lugar de volver
+    a limpiar y recortar los textos.
+    """
+    def por_texto(columna, transformar):
+        return columna.map({texto: transformar(texto) for texto in columna.cat.categories}).astype('category')
+    
+    def recortar_definicion(texto):
+        return texto[:LARGO_DEFINICION_CORTA] + "..." if len(texto) > LARGO_DEFINICION_CORTA else texto
+    
+    identificacion['nombre_limpio'] = por_texto(identificacion['nombre'], limpiar_texto_markdown)
+    identificacion['nombre_corto'] = por_texto(identificacion['nombre_limpio'], lambda texto: texto[:LARGO_NOMBRE_CORTO])
+    identificacion['definicion_limpia'] = por_texto(identificacion['definicion'], limpiar_texto_markdown)
+    identificacion['definicion_corta'] = por_texto(identificacion['definicion'], recortar_definicion)
+    return identificacion
+
+# Mapeo de líneas estratégicas conocidas
+LINEAS_ESTRATEGICAS = {
+    "1.": "1. Gestión integral de la contingencia",
+    "2.": "2. Intensificación de la vigilancia",
+    "3.": "3. Promoción de la salud y prevención",
+    "4.": "4. Atención integral de casos",
+    "5.": "5. Comunicación del riesgo y comunitaria"
+}
+
+def get_linea_estrategica_nombre(linea_texto):
+    """
+    Extrae el nombre de la línea estratégica
+    """
+    if not linea_texto or linea_texto.strip() == "":
+        return "Sin clasificar"
+    
+    linea_num = linea_texto.split('.')[0] + '.'
+    return LINEAS_ESTRATEGICAS.get(linea_num, linea_texto[:50])
+
+# Dimensiones de los filtros del sidebar (columnas de la tabla normalizada)
+DIMENSIONES_FILTRO = ['fuente', 'linea_nombre', 'tipo', 'tipo_detectado']
+
+def agregar_columnas_filtro(tabla):
+    """
+    Agrega a la tabla normalizada el nombre de la línea estratégica de cada indicador
+    """
+    nombres_linea = {linea: get_linea_estrategica_nombre(linea) for linea in tabla['linea'].unique()}
+    tabla['linea_nombre'] = tabla['linea'].map(nombres_linea)
+    return tabla
+
+def construir_indices(almacen):
+    """
+    Construye los índices invertidos valor -> posiciones de indicador de cada dimensión de filtro
+    
+    Incluye el orden de presentación de la pestaña de progreso (por nombre de
+    línea y, dentro de cada línea, como vienen los datos).
+    """
+    identificacion = almacen.identificacion
+    dimensiones = {}
+    for dimension in DIMENSIONES_FILTRO:
+        codigos, valores = pd.factorize(identificacion[dimension])
+        orden = np.argsort(codigos, kind='stable')
+        limites = np.searchsorted(codigos[orden], np.arange(len(valores) + 1))
+        dimensiones[dimension] = {valor: orden[limites[k]:limites[k + 1]] for k, valor in enumerate(valores)}
+    return {
+        'total': len(identificacion),
+        'dimensiones': dimensiones,
+        'orden_presentacion': np.argsort(identificacion['linea_nombre'].to_numpy(dtype=object), kind='stable')
+    }
+
+def seleccionar_indicadores(indices, filtros):
+    """
+    Máscara de los indicadores que cumplen todos los filtros
+    
+    `filtros` son pares (dimensión, valores seleccionados); dentro de una
+    dimensión se unen las posiciones de los valores y entre dimensiones se
+    intersectan. Una dimensión sin valores no filtra.
+    """
+    seleccion = np.ones(indices['total'], dtype=bool)
+    for dimension, valores in filtros:
+        if not valores:
+            continue
+        en_dimension = np.zeros(indices['total'], dtype=bool)
+        for valor in valores:
+            posiciones = indices['dimensiones'][dimension].get(valor)
+            if posiciones is not None:
+                en_dimension[posiciones] = True
+        seleccion &= en_dimension
+    return seleccion
+
+def filtrar_tabla(almacen, indices, filtros, periodos):
+    """
+    Aplica los filtros del sidebar y el rango de períodos y devuelve la tabla larga resultante
+    
+    Las filas se toman por posición (indicador × período) de las matrices del almacén.
+    """
+    posiciones = np.flatnonzero(seleccionar_indicadores(indices, filtros))
+    return almacen.tabla_larga(posiciones, periodos)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+@perfilado("Resumen ejecutivo (cálculo)")
+def calcular_resumen_ejecutivo(_almacen, _indices, version, filtros, periodos):
+    """
+    Agrega sobre las matrices del almacén todas las métricas del resumen ejecutivo
+    
+    El resultado queda en caché por versión de datos y combinación de filtros
+    (el almacén y los índices no se hashean: los identifica `version`).
+    """
+    posiciones = np.flatnonzero(seleccionar_indicadores(_indices, filtros))
+    columnas = np.sort(_almacen.columnas_periodo(periodos))
+    reportado = _almacen.reportado[np.ix_(posiciones, columnas)]
+    ile_numerico = np.where(_almacen.si_no[np.ix_(posiciones, columnas)], np.nan,
+                            _almacen.ile[np.ix_(posiciones, columnas)].astype(float))
+    
+    # Seguimiento de cada indicador (orden de aparición, igual que las pestañas)
+    identificacion = _almacen.identificacion.iloc[posiciones]
+    por_indicador = pd.DataFrame({
+        'linea_nombre': identificacion['linea_nombre'].to_numpy(dtype=object),
+        'tipo': identificacion['tipo'].to_numpy(dtype=object),
+        'reportados': reportado.sum(axis=1)
+    })
+    por_indicador['seguimiento'] = por_indicador['reportados'] / max(len(periodos), 1) * 100
+    por_indicador['completo'] = por_indicador['reportados'] == len(periodos)
+    
+    por_linea = por_indicador.groupby('linea_nombre', sort=False).agg(
+        indicadores=('seguimiento', 'size'),
+        seguimiento=('seguimiento', 'mean'),
+        completos=('completo', 'sum')
+    ).reset_index()
+    
+    por_tipo = por_indicador.groupby('tipo', sort=False).size().rename('indicadores').reset_index()
+    
+    # Avance por período: % de indicadores reportados e ILE promedio de los valores numéricos
+    if len(posiciones):
+        con_numero = ~np.isnan(ile_numerico)
+        cantidad = con_numero.sum(axis=0)
+        suma = np.where(con_numero, ile_numerico, 0.0).sum(axis=0)
+        por_periodo = pd.DataFrame({
+            'periodo': pd.Categorical.from_codes(columnas, categories=_almacen.periodos, ordered=True),
+            'completitud': reportado.mean(axis=0) * 100,
+            'ile_promedio': np.divide(suma, cantidad, out=np.full(len(columnas), np.nan), where=cantidad > 0)
+        })
+    else:
+        por_periodo = pd.DataFrame({'periodo': pd.Categorical([], categories=_almacen.periodos, ordered=True),
+                                    'completitud': pd.Series(dtype=float), 'ile_promedio': pd.Series(dtype=float)})
+    periodos_reportados = por_periodo.loc[por_periodo['completitud'] > 0, 'periodo']
+    
+    return {
+        'total': len(por_indicador),
+        'seguimiento_promedio': float(por_indicador['seguimiento'].mean()) if len(por_indicador) else 0.0,
+        'completos': int(por_indicador['completo'].sum()),
+        'ultimo_periodo': str(periodos_reportados.iloc[-1]) if len(periodos_reportados) else "N/A",
+        'por_linea': por_linea,
+        'por_tipo': por_tipo,
+        'por_periodo': por_periodo
+    }
+
+# Tendencias de cada indicador (se calculan una vez por versión de los datos)
+VENTANA_TENDENCIA = int(os.environ.get("INDICADORES_VENTANA_TENDENCIA", "3"))  # Períodos de la media móvil
+META_DEFECTO = float(os.environ.get("INDICADORES_META_DEFECTO", "100"))  # Meta (%) si el libro no la trae
+TOP_MOVIMIENTOS = 10  # Indicadores que se muestran en el ranking del resumen
+
+@perfilado("Tendencias")
+def calcular_tendencias(almacen, ventana=VENTANA_TENDENCIA):
+    """
+    Calcula para todos los indicadores a la vez las matrices indicador × período de tendencia
+    
+    El ILE se lleva a porcentaje (SI = 100, NO = 0) para comparar indicadores
+    cualitativos y cuantitativos. Por cada celda se obtiene el cambio respecto
+    al período anterior con valor (en puntos), la media de los valores de los
+    últimos `ventana` períodos, los períodos seguidos sin reporte, si es un NO
+    que sigue a un SI (regresión) y el cumplimiento de la meta del indicador
+    (META_DEFECTO si el libro no la trae).
+    """
+    n_indicadores, n_periodos = almacen.ile.shape
+    columnas = np.arange(n_periodos)
+    filas = np.arange(n_indicadores)[:, None]
+    
+    valor = np.where(almacen.si_no, almacen.ile * 100, almacen.ile).astype(float)
+    con_valor = np.isfinite(valor)
+    
+    # Último período con valor hasta cada período y el anterior a él (-1 si no hay)
+    ultimo = np.maximum.accumulate(np.where(con_valor, columnas, -1), axis=1)
+    anterior = np.hstack([np.full((n_indicadores, 1), -1), ultimo[:, :-1]])
+    hay_anterior = anterior >= 0
+    valor_anterior = np.where(hay_anterior, valor[filas, np.maximum(anterior, 0)], np.nan)
+    si_no_anterior = hay_anterior & almacen.si_no[filas, np.maximum(anterior, 0)]
+    
+    # Media móvil con sumas acumuladas: cada ventana es la diferencia de dos acumulados
+    suma = np.cumsum(np.where(con_valor, valor, 0.0), axis=1)
+    cuenta = np.cumsum(con_valor, axis=1)
+    suma_ventana = suma - np.hstack([np.zeros((n_indicadores, ventana)), suma])[:, :n_periodos]
+    cuenta_ventana = cuenta - np.hstack([np.zeros((n_indicadores, ventana), dtype=cuenta.dtype), cuenta])[:, :n_periodos]
+    media_movil = np.divide(suma_ventana, cuenta_ventana, out=np.full(valor.shape, np.nan), where=cuenta_ventana > 0)
+    
+    ultimo_reporte = np.maximum.accumulate(np.where(almacen.reportado, columnas, -1), axis=1)
+    
+    meta = almacen.identificacion['meta'].to_numpy(dtype=float)
+    meta = np.where(np.isnan(meta), META_DEFECTO, meta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cumplimiento = np.where(meta[:, None] > 0, valor / meta[:, None] * 100, np.nan)
+    
+    return {
+        'valor': valor.astype(np.float32),
+        'delta': (valor - valor_anterior).astype(np.float32),
+        'media_movil': media_movil.astype(np.float32),
+        'racha_pendiente': (columnas - ultimo_reporte).astype(np.int16),
+        'regresion': almacen.si_no & (valor == 0) & si_no_anterior & (valor_anterior == 100),
+        'cumplimiento': cumplimiento.astype(np.float32),
+        'meta': meta
+    }
+
+@st.cache_data(max_entries=64, show_spinner=False)
+@perfilado("Tendencias (ranking)")
+def calcular_movimientos(_almacen, _tendencias, _indices, version, filtros, periodos):
+    """
+    Situación de cada indicador filtrado al cierre del rango de períodos, para el ranking del resumen
+    
+    Solo toma valores de las matrices de tendencias ya calculadas: el último
+    período con valor del rango (valor, cambio y cumplimiento), la media móvil
+    y la racha de pendientes al cierre del rango, y las regresiones SI → NO
+    dentro del rango. En caché por versión, filtros y rango como el resumen.
+    """
+    posiciones = np.flatnonzero(seleccionar_indicadores(_indices, filtros))
+    columnas = np.sort(_almacen.columnas_periodo(periodos))
+    if not len(posiciones) or not len(columnas):
+        return pd.DataFrame()
+    
+    bloque = np.ix_(posiciones, columnas)
+    con_valor = np.isfinite(_tendencias['valor'][bloque])
+    # Último período con valor del rango (el cierre si ninguno tiene valor)
+    desde_el_final = np.argmax(con_valor[:, ::-1], axis=1)
+    ultima = columnas[len(columnas) - 1 - desde_el_final]
+    cierre = columnas[-1]
+    sin_valor = ~con_valor.any(axis=1)
+    
+    def en_ultima(matriz):
+        valores = matriz[posiciones, ultima].astype(float)
+        valores[sin_valor] = np.nan
+        return valores
+    
+    identificacion = _almacen.identificacion.iloc[posiciones]
+    return pd.DataFrame({
+        'posicion': posiciones,
+        'fuente': identificacion['fuente'].to_numpy(dtype=object),
+        'numero': identificacion['numero'].to_numpy(),
+        'nombre_limpio': identificacion['nombre_limpio'].to_numpy(dtype=object),
+        'linea_nombre': identificacion['linea_nombre'].to_numpy(dtype=object),
+        'ultimo_periodo': np.where(sin_valor, "N/A", np.asarray(_almacen.periodos, dtype=object)[ultima]),
+        'valor': en_ultima(_tendencias['valor']),
+        'delta': en_ultima(_tendencias['delta']),
+        'media_movil': _tendencias['media_movil'][posiciones, cierre].astype(float),
+        'meta': _tendencias['meta'][posiciones],
+        'cumplimiento': en_ultima(_tendencias['cumplimiento']),
+        'racha_pendiente': np.minimum(_tendencias['racha_pendiente'][posiciones, cierre], len(columnas)),
+        'regresiones': _tendencias['regresion'][bloque].sum(axis=1)
+    })
+
+# Criterios del ranking de movimientos: columna, orden ascendente y condición para aparecer
+CRITERIOS_MOVIMIENTOS = {
+    "Mayor caída respecto al período anterior": ('delta', True, lambda movimientos: movimientos['delta'] < 0),
+    "Menor cumplimiento de la meta": ('cumplimiento', True, lambda movimientos: movimientos['cumplimiento'].notna()),
+    "Más períodos pendientes al cierre": ('racha_pendiente', False, lambda movimientos: movimientos['racha_pendiente'] > 0),
+    "Regresiones SI → NO": ('regresiones', False, lambda movimientos: movimientos['regresiones'] > 0)
+}
+
+def tabla_movimientos(movimientos, criterio, incluir_municipio=False, cantidad=TOP_MOVIMIENTOS):
+    """
+    Los indicadores que más empeoran según el criterio, con sus tendencias en columnas para mostrar
+    """
+    columna, ascendente, condicion = CRITERIOS_MOVIMIENTOS[criterio]
+    seleccion = movimientos[condicion(movimientos)]
+    seleccion = seleccion.sort_values([columna, 'delta'], ascending=[ascendente, True], kind='stable').head(cantidad)
+    
+    tabla = pd.DataFrame({
+        'Indicador': seleccion['numero'].to_numpy(),
+        'Nombre': seleccion['nombre_limpio'].to_numpy(),
+        'Línea': seleccion['linea_nombre'].to_numpy(),
+        'Último período': seleccion['ultimo_periodo'].to_numpy(),
+        'ILE (%)': seleccion['valor'].round(1).to_numpy(),
+        'Cambio (pts)': seleccion['delta'].round(1).to_numpy(),
+        f'Media móvil ({VENTANA_TENDENCIA})': seleccion['media_movil'].round(1).to_numpy(),
+        'Meta (%)': seleccion['meta'].round(1).to_numpy(),
+        'Cumplimiento (%)': seleccion['cumplimiento'].round(1).to_numpy(),
+        'Períodos pendientes': seleccion['racha_pendiente'].to_numpy(),
+        'Regresiones SI → NO': seleccion['regresiones'].to_numpy()
+    })
+    if incluir_municipio:
+        tabla.insert(0, 'Municipio', seleccion['fuente'].to_numpy())
+    return tabla
+
+def crear_grafico_lineas(por_linea):
+    """
+    Crea el gráfico de barras del seguimiento promedio por línea estratégica
+    """
+    lineas = por_linea['linea_nombre'].tolist()
+    fig = go.Figure(data=[
+        go.Bar(x=lineas, y=por_linea['seguimiento'].tolist(), 
+              marker_color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57'][:len(lineas)])
+    ])
+    fig.update_layout(
+        title="Seguimiento Promedio por Línea Estratégica (%)",
+        xaxis_title="Línea Estratégica",
+        yaxis_title="Seguimiento (%)",
+        template="plotly_white",
+        height=400,
+        margin=dict(l=20, r=20, t=60, b=20)
+    )
+    return fig
+
+def crear_grafico_tipos(por_tipo):
+    """
+    Crea el gráfico de dona con la distribución de tipos de indicadores
+    """
+    fig = go.Figure(data=[go.Pie(
+        labels=por_tipo['tipo'].tolist(),
+        values=por_tipo['indicadores'].tolist(),
+        hole=0.4
+    )])
+    fig.update_layout(
+        title="Tipos de Indicadores", 
+        height=400,
+        margin=dict(l=20, r=20, t=60, b=20)
+    )
+    return fig
+
+def crear_grafico_periodos(por_periodo):
     """
-    Carga y procesa el archivo Excel de indicadores
+    Crea el gráfico de reporte e ILE promedio por período
     """
-    try:
-        # Leer el archivo Excel
-        df = pd.read_excel('indicadores.xlsx', sheet_name='Ficha_indicadores', header=None)
-        
-        # Identificar las filas de encabezados
-        header_row = 1  # Fila 2 (índice 1)
-        subheader_row = 3  # Fila 4 (índice 3)
-        data_start_row = 4  # Datos empiezan en fila 5 (índice 4)
-        
-        # Extraer datos de indicadores
-        indicadores_data = []
-        
-        # Solo últimos 3 meses: Marzo, Abril, Mayo 2025
-        periodos = [
-            ("Mar 2025", [23, 24, 25]),  # Columnas X, Y, Z
-            ("Abr 2025", [26, 27, 28]),  # Columnas AA, AB, AC
-            ("May 2025", [29, 30, 31]),  # Columnas AD, AE, AF
-        ]
-        
-        # Procesar cada fila de indicadores (empezando desde la fila 5)
-        for row_idx in range(data_start_row, min(data_start_row + 25, len(df))):
-            try:
-                # Verificar si hay un número de indicador
-                if pd.isna(df.iloc[row_idx, 0]) or df.iloc[row_idx, 0] == '':
-                    continue
-                    
-                numero = df.iloc[row_idx, 0]
-                linea = str(df.iloc[row_idx, 1]) if not pd.isna(df.iloc[row_idx, 1]) else ""
-                nombre = str(df.iloc[row_idx, 2]) if not pd.isna(df.iloc[row_idx, 2]) else ""
-                tipo = str(df.iloc[row_idx, 3]) if not pd.isna(df.iloc[row_idx, 3]) else ""
-                definicion = str(df.iloc[row_idx, 4]) if not pd.isna(df.iloc[row_idx, 4]) else ""
-                
-                # Si el número no es numérico, continuar
-                try:
-                    numero = int(float(numero))
-                except:
-                    continue
-                
-                # Extraer número de línea estratégica para ordenamiento
-                linea_numero = 999  # Valor por defecto
-                try:
-                    if linea.strip():
-                        linea_numero = int(linea.split('.')[0])
-                except:
-                    pass
-                
-                # Extraer datos de cada período
-                datos_periodos = {}
-                for periodo_name, cols in periodos:
-                    try:
-                        if len(cols) >= 3 and all(col < len(df.columns) for col in cols):
-                            numerador = df.iloc[row_idx, cols[0]]
-                            denominador = df.iloc[row_idx, cols[1]]
-                            ile = df.iloc[row_idx, cols[2]]
-                            
-                            # Limpiar datos
-                            numerador = str(numerador).strip() if not pd.isna(numerador) else ""
-                            denominador = str(denominador).strip() if not pd.isna(denominador) else ""
-                            ile = str(ile).strip() if not pd.isna(ile) else ""
-                            
-                            datos_periodos[periodo_name] = {
-                                'numerador': numerador,
-                                'denominador': denominador,
-                                'ile': ile
-                            }
-                    except Exception as e:
-                        datos_periodos[periodo_name] = {
-                            'numerador': "",
-                            'denominador': "",
-                            'ile': ""
-                        }
-                
-                indicadores_data.append({
-                    'numero': numero,
-                    'linea': linea,
-                    'linea_numero': linea_numero,
-                    'nombre': nombre,
-                    'tipo': tipo,
-                    'definicion': definicion,
-                    'datos': datos_periodos
-                })
-                
-            except Exception as e:
-                continue
-        
-        # Ordenar por línea estratégica y luego por número de indicador
-        indicadores_data.sort(key=lambda x: (x['linea_numero'], x['numero']))
-        
-        return indicadores_data
-        
-    except Exception as e:
-        st.error(f"Error al cargar el archivo: {str(e)}")
-        return []
+    etiquetas_periodo = por_periodo['periodo'].astype(str).tolist()
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=etiquetas_periodo,
+        y=por_periodo['completitud'].tolist(),
+        name="Indicadores reportados (%)",
+        marker_color='#4ECDC4'
+    ))
+    fig.add_trace(go.Scatter(
+        x=etiquetas_periodo,
+        y=por_periodo['ile_promedio'].tolist(),
+        name="ILE promedio (%)",
+        mode='lines+markers',
+        line=dict(color='#007bff', width=3),
+        connectgaps=False
+    ))
+    fig.update_layout(
+        title="Reporte e ILE Promedio por Período",
+        xaxis_title="Período",
+        yaxis_title="%",
+        template="plotly_white",
+        height=400,
+        legend=dict(orientation="h", y=-0.2),
+        margin=dict(l=20, r=20, t=60, b=20)
+    )
+    return fig
+
+def tabla_resumen_lineas(por_linea):
+    """
+    Construye la tabla de resumen por línea estratégica (nombres abreviados)
+    """
+    resumen_lineas = []
+    for fila in por_linea.itertuples(index=False):
+        nombre_corto = fila.linea_nombre.split('.')[1].strip() if '.' in fila.linea_nombre else fila.linea_nombre
+        resumen_lineas.append({
+            'Línea': nombre_corto[:20] + "..." if len(nombre_corto) > 20 else nombre_corto,
+            'Indicadores': int(fila.indicadores),
+            'Seguimiento (%)': f"{fila.seguimiento:.1f}%",
+            'Completos': int(fila.completos)
+        })
+    return pd.DataFrame(resumen_lineas)
 
-def detect_indicator_type(indicador_data, periodos):
+# Formatos de descarga de la pestaña de datos detallados: extensión y tipo MIME
+FORMATOS_EXPORTACION = {
+    "CSV": ("csv", "text/csv"),
+    "CSV comprimido (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel (xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+}
+TAMANO_BLOQUE_EXPORTACION = 5000  # Filas por bloque al escribir una descarga
+
+@perfilado("Tabla detallada")
+def filas_detalladas(tabla_filtrada, incluir_municipio=False, categoricas=True):
     """
-    Detecta si un indicador es cualitativo (SI/NO) o cuantitativo (numérico)
+    Construye las filas de la tabla de datos detallados a partir de la tabla filtrada
+    
+    Con `categoricas` los textos repetidos (nombre, definición, línea, tipo) se
+    guardan una sola vez como categorías: las columnas de la tabla filtrada ya
+    lo son, así que se pasan sin materializar un texto por fila.
     """
-    valores_ile = []
+    def texto(columna):
+        return columna.array.remove_unused_categories() if categoricas else columna.to_numpy()
     
-    for periodo in periodos:
-        if periodo in indicador_data['datos']:
-            ile = indicador_data['datos'][periodo]['ile']
-            if ile and ile.strip():
-                valores_ile.append(ile.strip().upper())
+    def con_vacios(columna, texto):
+        valores = columna.to_numpy(dtype=object)
+        return np.where(valores == "", texto, valores)
     
-    if not valores_ile:
-        return "sin_datos"
+    filas = pd.DataFrame({
+        'Indicador': tabla_filtrada['numero'].to_numpy(),
+        'Nombre': texto(tabla_filtrada['nombre_limpio']),
+        'Línea': texto(tabla_filtrada['linea_nombre']),
+        'Tipo': texto(tabla_filtrada['tipo']),
+        'Definición': texto(tabla_filtrada['definicion_limpia']),
+        'Período': texto(tabla_filtrada['periodo']),
+        'Numerador': con_vacios(tabla_filtrada['numerador'], "Pendiente"),
+        'Denominador': con_vacios(tabla_filtrada['denominador'], "N/A"),
+        'ILE': tabla_filtrada['ile_mostrar'].to_numpy()
+    })
+    if incluir_municipio:
+        filas.insert(0, 'Municipio', texto(tabla_filtrada['fuente']))
+    return filas
+
+def anomalias_filtradas(datos, posiciones, periodos):
+    """
+    Anomalías de consistencia de los indicadores y períodos seleccionados, con la identificación de cada indicador
     
-    # Verificar si todos los valores son SI/NO
-    valores_si_no = ['SI', 'NO']
-    es_cualitativo = all(val in valores_si_no for val in valores_ile if val)
+    Se ordenan como los indicadores en `posiciones` y, dentro de cada uno, por período y regla.
+    """
+    anomalias = datos['anomalias']
+    orden = np.full(len(datos['almacen']), -1)
+    orden[posiciones] = np.arange(len(posiciones))
+    orden_anomalias = orden[anomalias['posicion'].to_numpy(dtype=np.int64)]
+    seleccion = (orden_anomalias >= 0) & anomalias['periodo'].isin(periodos).to_numpy()
+    anomalias = anomalias[seleccion]
+    anomalias = anomalias.iloc[np.lexsort((anomalias['regla'].cat.codes.to_numpy(),
+                                           anomalias['periodo'].cat.codes.to_numpy(),
+                                           orden_anomalias[seleccion]))].reset_index(drop=True)
+    
+    identificacion = datos['almacen'].identificacion.iloc[anomalias['posicion'].to_numpy(dtype=np.int64)]
+    for columna in ['fuente', 'numero', 'nombre_limpio', 'linea_nombre']:
+        anomalias[columna] = identificacion[columna].to_numpy()
+    return anomalias
+
+def filas_anomalias(tabla_anomalias, incluir_municipio=False, categoricas=True):
+    """
+    Construye las filas de la tabla de anomalías (mismas opciones que filas_detalladas)
+    """
+    filas = pd.DataFrame({
+        'Indicador': tabla_anomalias['numero'].to_numpy(),
+        'Nombre': tabla_anomalias['nombre_limpio'].to_numpy(),
+        'Línea': tabla_anomalias['linea_nombre'].to_numpy(),
+        'Período': tabla_anomalias['periodo'].astype(str).to_numpy(),
+        'Anomalía': tabla_anomalias['regla'].map(REGLAS_CONSISTENCIA).astype(str).to_numpy(),
+        'Numerador': tabla_anomalias['numerador'].to_numpy(),
+        'Denominador': tabla_anomalias['denominador'].to_numpy(),
+        'ILE en el libro': tabla_anomalias['ile'].to_numpy(),
+        'ILE mostrado': tabla_anomalias['ile_valor'].to_numpy(dtype=float).round(2),
+        'ILE esperado': tabla_anomalias['esperado'].to_numpy(dtype=float).round(2)
+    })
+    if incluir_municipio:
+        filas.insert(0, 'Municipio', tabla_anomalias['fuente'].to_numpy())
+    
+    if categoricas:
+        for columna in ['Municipio', 'Nombre', 'Línea', 'Período', 'Anomalía']:
+            if columna in filas:
+                filas[columna] = filas[columna].astype('category')
+    return filas
+
+@perfilado("Exportación")
+def exportar_tabla(tabla_filtrada, formato, destino, incluir_municipio=False,
+                   tamano_bloque=TAMANO_BLOQUE_EXPORTACION, filas=filas_detalladas):
+    """
+    Escribe la tabla detallada en `destino` (archivo binario) bloque a bloque
+    
+    Las filas formateadas se arman de a un bloque, así que no se duplica en
+    texto toda la tabla filtrada (que sí está en memoria, con sus textos como
+    categorías). `formato` es una de las extensiones de FORMATOS_EXPORTACION y
+    `filas` arma las filas de cada bloque (filas_detalladas o filas_anomalias).
+    """
+    bloques = (filas(tabla_filtrada.iloc[inicio:inicio + tamano_bloque],
+                     incluir_municipio, categoricas=False)
+               for inicio in range(0, len(tabla_filtrada), tamano_bloque))
+    
+    if formato in ("csv", "csv.gz"):
+        salida = gzip.GzipFile(fileobj=destino, mode='wb') if formato == "csv.gz" else destino
+        texto = io.TextIOWrapper(salida, encoding='utf-8', newline='')
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(texto, index=False, header=(i == 0))
+        texto.flush()
+        texto.detach()
+        if formato == "csv.gz":
+            salida.close()
+    
+    elif formato == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        escritor = None
+        for bloque in bloques:
+            # Cada bloque es un row group; Parquet codifica por diccionario los textos repetidos
+            tabla_arrow = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabla_arrow.schema, compression='zstd')
+            escritor.write_table(tabla_arrow)
+        if escritor is not None:
+            escritor.close()
+    
+    elif formato == "xlsx":
+        from openpyxl import Workbook
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet("Indicadores")
+        for i, bloque in enumerate(bloques):
+            if i == 0:
+                hoja.append(list(bloque.columns))
+            for fila in bloque.itertuples(index=False):
+                hoja.append(list(fila))
+        libro.save(destino)
     
-    if es_cualitativo:
-        return "cualitativo"
     else:
-        return "cuantitativo"
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
 
-def corregir_porcentaje(valor):
+def preparar_descarga(tabla_filtrada, formato, incluir_municipio=False, filas=filas_detalladas):
     """
-    Corrige porcentajes que vienen como decimales del Excel multiplicando por 100
+    Genera el archivo de descarga en un temporal (pasa a disco si es grande) y devuelve sus bytes
+    
+    st.download_button no acepta un archivo en disco para servirlo por
+    partes: guarda el contenido completo en el almacén de archivos en memoria
+    de Streamlit mientras el botón sigue en pantalla. La memoria de una
+    descarga crece entonces con el tamaño del archivo; el temporal solo evita
+    tener además en memoria el archivo mientras se escribe cuando supera 16 MB.
     """
-    try:
-        num = float(valor.replace(',', '.'))
-        # Si es un decimal entre 0 y 1 (inclusive), probablemente es un porcentaje mal calculado
-        if 0 <= num <= 1:
-            return num * 100
-        return num
-    except:
-        return valor
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as destino:
+        exportar_tabla(tabla_filtrada, formato, destino, incluir_municipio, filas=filas)
+        destino.seek(0)
+        return destino.read()
 
-def create_progress_chart(indicador_data, periodos):
+def mostrar_descarga(tabla, nombre_archivo, incluir_municipio=False, filas=filas_detalladas, clave="datos"):
     """
-    Crea gráfico de progreso para un indicador específico
+    Selector de formato y botón que genera la descarga de la tabla solo cuando se solicita
     """
-    valores = []
-    etiquetas = []
-    valores_originales = []
-    valores_display = []
+    col_formato, col_boton = st.columns([3, 1])
+    with col_formato:
+        formato_descarga = st.selectbox(
+            "Formato de descarga:",
+            options=list(FORMATOS_EXPORTACION),
+            index=0,
+            key=f"formato_{clave}"
+        )
+    extension, mime = FORMATOS_EXPORTACION[formato_descarga]
     
-    for periodo in periodos:
-        if periodo in indicador_data['datos']:
-            ile = indicador_data['datos'][periodo]['ile']
-            etiquetas.append(periodo)
-            
-            if ile and ile.strip() and ile.strip() != "":
-                # Intentar convertir a número si es posible
-                try:
-                    if ile.upper() == 'SI':
-                        valores.append(1)
-                        valores_originales.append('SI')
-                        valores_display.append(1)
-                    elif ile.upper() == 'NO':
-                        valores.append(0)
-                        valores_originales.append('NO')
-                        valores_display.append(1)
-                    else:
-                        # Intentar como número y corregir porcentaje si es necesario
-                        numero = corregir_porcentaje(ile)
-                        valores.append(numero)
-                        # Mostrar el valor corregido en el gráfico
-                        if isinstance(numero, float):
-                            valores_originales.append(f"{numero:.1f}")
-                        else:
-                            valores_originales.append(str(numero))
-                        valores_display.append(numero)
-                except:
-                    valores.append(None)
-                    valores_originales.append('Pendiente')
-                    valores_display.append(None)
-            else:
-                valores.append(None)
-                valores_originales.append('Pendiente')
-                valores_display.append(None)
+    with col_boton:
+        st.markdown("&nbsp;")
+        preparar = st.button("📦 Preparar descarga", key=f"preparar_{clave}")
     
-    if not valores or all(v is None for v in valores):
+    if preparar:
+        with st.spinner("Generando archivo..."):
+            contenido = preparar_descarga(tabla, extension, incluir_municipio, filas)
+        st.download_button(
+            label=f"📥 Descargar datos ({formato_descarga}, {len(contenido) / 1024:.0f} KB)",
+            data=contenido,
+            file_name=f"{nombre_archivo.lower().replace(' ', '_')}.{extension}",
+            mime=mime
+        )
+
+def tabla_datos_periodo(serie):
+    """
+    Construye la tabla de numerador, denominador e ILE de un indicador en los períodos de la serie
+    """
+    return pd.DataFrame({
+        'Período': serie.periodos,
+        'Numerador': [texto or 'Pendiente' for texto in serie.numerador],
+        'Denominador': [texto or 'N/A' for texto in serie.denominador],
+        'ILE': serie.mostrar.tolist()
+    })
+
+def mostrar_progreso_indicador(indicador, serie):
+    """
+    Muestra el gráfico de progreso y la tabla por período de un indicador
+    """
+    # Gráfico de progreso
+    fig = obtener_grafico_progreso(indicador, serie)
+    if fig:
+        # Dos municipios con los mismos datos generan la misma figura; la clave los distingue
+        st.plotly_chart(fig, use_container_width=True, key=f"grafico_{indicador.fuente}_{indicador.numero}")
+    else:
+        st.info("No hay datos suficientes para generar el gráfico.")
+    
+    # Tabla de datos responsive
+    st.markdown("**Datos por período:**")
+    df_tabla = tabla_datos_periodo(serie)
+    if not df_tabla.empty:
+        st.dataframe(df_tabla, use_container_width=True)
+
+ARCHIVO_LOGO = "Logo_gobernacion.png"
+ANCHO_LOGO = 150  # Ancho en el sidebar (px)
+
+@st.cache_resource(show_spinner=False)
+def cargar_logo(ruta, mtime_ns, ancho=ANCHO_LOGO):
+    """
+    Decodifica y reduce el logo una vez por proceso y versión del archivo; devuelve PNG en bytes (None si falla)
+    """
+    try:
+        from PIL import Image
+        with Image.open(ruta) as imagen:
+            # El doble del ancho mostrado para pantallas de alta densidad
+            imagen.thumbnail((ancho * 2, imagen.height))
+            salida = io.BytesIO()
+            imagen.save(salida, format="PNG", optimize=True)
+        return salida.getvalue()
+    except Exception:
+        return None
+
+def obtener_logo():
+    """
+    Bytes del logo ya reducido (None si el archivo no existe o no se puede leer)
+    """
+    try:
+        return cargar_logo(ARCHIVO_LOGO, os.stat(ARCHIVO_LOGO).st_mtime_ns)
+    except OSError:
         return None
+
+def configurar_pagina():
+    """
+    Configura la página y muestra el encabezado del dashboard (solo al ejecutar la app)
+    """
+    # Configuración de la página
+    st.set_page_config(
+        page_title="Indicadores - Plan Contingencia Fiebre Amarilla",
+        page_icon="🦟",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
     
-    # Detectar tipo de indicador
-    tipo_indicador = detect_indicator_type(indicador_data, periodos)
+    # Título principal (sin logo aquí)
+    st.title("🦟 Plan de Contingencia para Alertas y Emergencia por Fiebre Amarilla")
+    st.markdown("### 📊 **Seguimiento de Indicadores**")
+    st.markdown("**Secretaría de Salud del Tolima**")
+
+# Secciones del dashboard (antes pestañas): en cada rerun solo se calcula la seleccionada
+SECCIONES_DASHBOARD = ["📈 Progreso Temporal", "📊 Resumen Ejecutivo", "📋 Datos Detallados", "🔎 Anomalías"]
+
+@fragmento_perfilado("Ficha de indicador")
+def mostrar_ficha_indicador(indicador, almacen, periodos, carga_bajo_demanda, multiples_fuentes):
+    """
+    Expander de un indicador: ficha, seguimiento y, al abrirlo, gráfico y tabla por período
     
-    # Crear gráfico
-    fig = go.Figure()
+    Es un fragmento: sus controles (definición completa, ver gráfico) solo
+    re-ejecutan este indicador y no el resto de la página.
+    """
+    # Nombre limpio (sin caracteres que rompan el markdown), calculado al cargar los datos
+    titulo = f"**{indicador.numero}. {indicador.nombre_limpio}**"
+    if multiples_fuentes:
+        titulo += f" — {indicador.fuente}"
+    clave = f"{indicador.fuente}_{indicador.numero}"
     
-    if tipo_indicador == "cualitativo":
-        # Gráfico de barras para indicadores SI/NO
-        colores = []
-        textos = []
-        valores_barras = []
+    # Usar expanders como antes, pero mejorados
+    with st.expander(titulo, expanded=False):
         
-        for i, val in enumerate(valores):
-            if val == 1 and valores_originales[i] == 'SI':
-                colores.append('#28a745')  # Verde para SI
-                textos.append('SI')
-                valores_barras.append(1)
-            elif val == 0 and valores_originales[i] == 'NO':
-                colores.append('#dc3545')  # Rojo para NO
-                textos.append('NO')
-                valores_barras.append(1)
+        # Layout responsive con columnas
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.markdown(f"**Tipo:** {indicador.tipo}")
+            st.markdown(f"**Línea:** {indicador.linea}")
+            
+            # Definición operacional con toggle para ver completa
+            st.markdown("**Definición operacional:**")
+            if len(indicador.definicion) > LARGO_DEFINICION_CORTA:
+                mostrar_def_completa = st.checkbox(
+                    "Ver definición completa", 
+                    key=f"def_{clave}"
+                )
+                if mostrar_def_completa:
+                    st.info(indicador.definicion)
+                else:
+                    st.info(indicador.definicion_corta)
             else:
-                colores.append('#6c757d')  # Gris para pendiente
-                textos.append('Pendiente')
-                valores_barras.append(0.5)
+                st.info(indicador.definicion)
         
-        fig.add_trace(go.Bar(
-            x=etiquetas,
-            y=valores_barras,
-            marker_color=colores,
-            text=textos,
-            textposition='inside',
-            textfont=dict(color='white', size=14)
-        ))
+        with col2:
+            # Seguimiento en el rango seleccionado
+            serie = almacen.serie(indicador.posicion, periodos)
+            seguimiento = calcular_seguimiento(serie, periodos)
+            st.metric("Seguimiento", f"{seguimiento:.0f}%")
+            
+            # Mostrar tipo de indicador detectado
+            tipo_detected = detect_indicator_type(serie)
+            st.info(ETIQUETAS_TIPO_DETECTADO.get(tipo_detected, ETIQUETAS_TIPO_DETECTADO["sin_datos"]))
         
-        fig.update_layout(
-            yaxis=dict(tickvals=[0, 0.5, 1], ticktext=['', 'Pendiente', 'Cumplido']),
-            height=350
+        # Gráfico y tabla solo cuando el usuario abre el indicador
+        if not carga_bajo_demanda or st.toggle(
+            "📈 Ver gráfico y datos por período",
+            key=f"abrir_{clave}"
+        ):
+            mostrar_progreso_indicador(indicador, serie)
+
+@fragmento_perfilado("Pestaña Progreso Temporal")
+def seccion_progreso(almacen, posiciones_filtradas, periodos, tamano_pagina, vista_progreso,
+                     carga_bajo_demanda, multiples_fuentes):
+    """
+    Sección de progreso temporal: la página actual de indicadores, por indicador o por línea estratégica
+    
+    Es un fragmento: cambiar de página solo re-ejecuta esta sección.
+    """
+    st.header("📈 Progreso Temporal de Indicadores")
+    
+    if not len(posiciones_filtradas):
+        st.warning("No hay indicadores que coincidan con los filtros seleccionados.")
+        return
+    
+    # Paginación: solo los indicadores de la página actual se envían al navegador
+    total_paginas = max(1, -(-len(posiciones_filtradas) // tamano_pagina))
+    if st.session_state.get("pagina_progreso", 1) > total_paginas:
+        st.session_state["pagina_progreso"] = 1
+    if total_paginas > 1:
+        pagina = st.number_input(
+            f"Página (de {total_paginas}):",
+            min_value=1,
+            max_value=total_paginas,
+            step=1,
+            key="pagina_progreso"
         )
-        
     else:
-        # Gráfico de línea para indicadores cuantitativos
-        fig.add_trace(go.Scatter(
-            x=etiquetas,
-            y=valores_display,
-            mode='lines+markers+text',
-            line=dict(color='#007bff', width=3),
-            marker=dict(size=10, color='#007bff'),
-            text=valores_originales,
-            textposition='top center',
-            connectgaps=False
-        ))
+        pagina = 1
+    inicio_pagina = (pagina - 1) * tamano_pagina
+    pagina_actual = almacen.fichas(posiciones_filtradas[inicio_pagina:inicio_pagina + tamano_pagina])
+    st.caption(f"Mostrando indicadores {inicio_pagina + 1}–{inicio_pagina + len(pagina_actual)} "
+               f"de {len(posiciones_filtradas)}")
+    
+    if vista_progreso == VISTAS_PROGRESO[1]:
+        # Una figura por línea estratégica con los indicadores de la página
+        por_linea = {}
+        for indicador in pagina_actual:
+            por_linea.setdefault(indicador.linea_nombre, []).append(indicador)
+        for linea_nombre, indicadores_linea in por_linea.items():
+            st.subheader(f"🎯 {linea_nombre}")
+            series_linea = [almacen.serie(indicador.posicion, periodos) for indicador in indicadores_linea]
+            fig = obtener_grafico_linea(indicadores_linea, series_linea, multiples_fuentes)
+            st.plotly_chart(fig, use_container_width=True, key=f"linea_{linea_nombre}_{pagina}")
+        return
+    
+    # Mostrar por línea estratégica, un expander (fragmento) por indicador
+    linea_anterior = None
+    for indicador in pagina_actual:
+        if indicador.linea_nombre != linea_anterior:
+            st.subheader(f"🎯 {indicador.linea_nombre}")
+            linea_anterior = indicador.linea_nombre
+        mostrar_ficha_indicador(indicador, almacen, periodos, carga_bajo_demanda, multiples_fuentes)
+
+def seccion_resumen(datos, filtros, periodos, multiples_fuentes=False):
+    """
+    Sección del resumen ejecutivo: métricas generales, gráficos por línea, tipo y período y ranking de tendencias
+    """
+    st.header("📊 Resumen Ejecutivo")
+    
+    resumen = calcular_resumen_ejecutivo(datos['almacen'], datos['indices'],
+                                         datos['version'], filtros, tuple(periodos))
+    
+    # Métricas generales - Layout responsive
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Indicadores", resumen['total'])
+    
+    with col2:
+        st.metric("Seguimiento Promedio", f"{resumen['seguimiento_promedio']:.1f}%")
+    
+    with col3:
+        # Indicadores con datos completos
+        st.metric("Indicadores Completos", resumen['completos'])
+    
+    with col4:
+        # Último período reportado
+        st.metric("Último Período", resumen['ultimo_periodo'])
+    
+    st.markdown("---")
+    
+    # Gráfico de seguimiento por línea estratégica
+    st.subheader("🎯 Seguimiento por Línea Estratégica")
+    
+    por_linea = resumen['por_linea']
+    if not por_linea.empty:
+        st.plotly_chart(crear_grafico_lineas(por_linea), use_container_width=True)
+    
+    # Layout responsive para gráficos
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Distribución de tipos de indicadores
+        st.subheader("📊 Distribución de Tipos")
         
-        fig.update_layout(height=350)
+        st.plotly_chart(crear_grafico_tipos(resumen['por_tipo']), use_container_width=True)
     
-    fig.update_layout(
-        title=f"Indicador {indicador_data['numero']}: {limpiar_texto_markdown(indicador_data['nombre'])[:50]}...",
-        xaxis_title="Período",
-        showlegend=False,
-        template="plotly_white",
-        font=dict(size=12),
-        margin=dict(l=20, r=20, t=60, b=20)
-    )
+    with col2:
+        # Tabla de resumen por línea
+        st.subheader("📋 Resumen por Línea")
+        df_resumen = tabla_resumen_lineas(por_linea)
+        if not df_resumen.empty:
+            st.dataframe(df_resumen, use_container_width=True)
     
-    return fig
+    # Avance por período
+    st.subheader("📅 Avance por Período")
+    por_periodo = resumen['por_periodo']
+    if not por_periodo.empty:
+        st.plotly_chart(crear_grafico_periodos(por_periodo), use_container_width=True)
+    
+    mostrar_movimientos(datos, filtros, periodos, multiples_fuentes)
 
-def limpiar_texto_markdown(texto):
+@fragmento_perfilado("Ranking de tendencias")
+def mostrar_movimientos(datos, filtros, periodos, multiples_fuentes):
     """
-    Limpia texto para evitar problemas con markdown
+    Ranking de los indicadores que más empeoran al cierre del rango, según el criterio elegido
+    
+    Es un fragmento: cambiar el criterio no recalcula el resto del resumen.
     """
-    if not texto:
-        return ""
+    st.subheader("📉 Indicadores que Más Empeoran")
+    movimientos = calcular_movimientos(datos['almacen'], datos['tendencias'], datos['indices'],
+                                       datos['version'], filtros, tuple(periodos))
+    if movimientos.empty:
+        st.info("No hay indicadores con datos en el rango seleccionado.")
+        return
     
-    # Reemplazar caracteres problemáticos
-    texto_limpio = str(texto)
-    texto_limpio = texto_limpio.replace('*', '')
-    texto_limpio = texto_limpio.replace('\r\n', ' ')
-    texto_limpio = texto_limpio.replace('\r', ' ')
-    texto_limpio = texto_limpio.replace('\n', ' ')
-    texto_limpio = texto_limpio.replace('\t', ' ')
+    criterio = st.selectbox("Ordenar por:", options=list(CRITERIOS_MOVIMIENTOS), key="criterio_movimientos")
+    tabla = tabla_movimientos(movimientos, criterio, multiples_fuentes)
+    if tabla.empty:
+        st.success("✅ Ningún indicador cumple este criterio en el rango seleccionado.")
+    else:
+        st.dataframe(tabla, use_container_width=True, hide_index=True)
+        st.caption(f"Cambio respecto al período anterior con valor; media móvil de los últimos {VENTANA_TENDENCIA} "
+                   f"períodos; SI cuenta como 100% y NO como 0%. Meta por defecto: {META_DEFECTO:g}%.")
+
+@fragmento_perfilado("Pestaña Datos Detallados")
+def seccion_datos(datos, filtros, periodos, multiples_fuentes):
+    """
+    Sección de datos detallados: tabla filtrada y descarga
     
-    # Limpiar espacios múltiples
-    texto_limpio = re.sub(r'\s+', ' ', texto_limpio)
+    Es un fragmento: elegir el formato o preparar la descarga no recalcula el
+    resto del dashboard.
+    """
+    st.header("📋 Datos Detallados")
     
-    return texto_limpio.strip()
+    # Tabla completa de los indicadores filtrados (vectorizada desde la tabla normalizada)
+    tabla_filtrada = filtrar_tabla(datos['almacen'], datos['indices'], filtros, periodos)
+    
+    if not tabla_filtrada.empty:
+        df_completa = filas_detalladas(tabla_filtrada, multiples_fuentes)
+        st.dataframe(df_completa, use_container_width=True, height=600)
+        
+        # Opción de descarga: el archivo se genera solo cuando se solicita
+        mostrar_descarga(tabla_filtrada, f"indicadores_fiebre_amarilla_{periodos[0]}_{periodos[-1]}",
+                         multiples_fuentes)
 
-def get_linea_estrategica_nombre(linea_texto):
+@fragmento_perfilado("Pestaña Anomalías")
+def seccion_anomalias(datos, posiciones_filtradas, periodos, multiples_fuentes):
     """
-    Extrae el nombre de la línea estratégica
+    Sección de anomalías: celdas cuyo numerador, denominador e ILE no son consistentes, y su descarga
+    
+    Las anomalías se calculan al cargar cada versión de los datos
+    (validar_consistencia); aquí solo se filtran. Es un fragmento: elegir el
+    tipo de anomalía o preparar la descarga solo re-ejecuta esta sección.
     """
-    if not linea_texto or linea_texto.strip() == "":
-        return "Sin clasificar"
+    st.header("🔎 Anomalías de Consistencia")
+    st.caption(f"El ILE se compara con numerador / denominador × 100 (tolerancia de {TOLERANCIA_ILE:g} puntos "
+               f"o 1%); los porcentajes válidos van de 0 a {ILE_MAXIMO:g}.")
     
-    # Mapeo de líneas estratégicas conocidas
-    lineas_map = {
-        "1.": "1. Gestión integral de la contingencia",
-        "2.": "2. Intensificación de la vigilancia",
-        "3.": "3. Promoción de la salud y prevención",
-        "4.": "4. Atención integral de casos",
-        "5.": "5. Comunicación del riesgo y comunitaria"
-    }
+    tabla_anomalias = anomalias_filtradas(datos, posiciones_filtradas, periodos)
+    if tabla_anomalias.empty:
+        st.success("✅ No hay anomalías en los indicadores y períodos seleccionados.")
+        return
     
-    linea_num = linea_texto.split('.')[0] + '.'
-    return lineas_map.get(linea_num, linea_texto[:50])
+    # Conteo por regla
+    conteo = tabla_anomalias['regla'].value_counts()
+    for columna, (regla, etiqueta) in zip(st.columns(len(REGLAS_CONSISTENCIA)), REGLAS_CONSISTENCIA.items()):
+        with columna:
+            st.metric(etiqueta, int(conteo.get(regla, 0)))
+    
+    reglas_seleccionadas = st.multiselect(
+        "Tipo de anomalía:",
+        options=list(REGLAS_CONSISTENCIA),
+        format_func=REGLAS_CONSISTENCIA.get,
+        placeholder="Todas"
+    )
+    if reglas_seleccionadas:
+        tabla_anomalias = tabla_anomalias[tabla_anomalias['regla'].isin(reglas_seleccionadas)]
+    
+    st.dataframe(filas_anomalias(tabla_anomalias, multiples_fuentes), use_container_width=True, hide_index=True)
+    if not tabla_anomalias.empty:
+        mostrar_descarga(tabla_anomalias, f"anomalias_indicadores_{periodos[0]}_{periodos[-1]}",
+                         multiples_fuentes, filas=filas_anomalias, clave="anomalias")
 
-def main():
-    # Cargar datos
+def mostrar_dashboard():
+    # Cargar datos (solo la primera visita del proceso espera la lectura del Excel)
     with st.spinner("Cargando datos del archivo Excel..."):
-        indicadores = load_and_process_data()
+        datos_cargados, datos_al, cargados_el = obtener_datos_vigentes()
+    almacen = datos_cargados['almacen']
+    periodos_disponibles = datos_cargados['periodos']
+    fuentes_disponibles = datos_cargados['fuentes']
     
-    if not indicadores:
+    # Archivos que no se pudieron cargar (los demás se muestran igual)
+    if datos_cargados['errores']:
+        with st.expander(f"⚠️ {len(datos_cargados['errores'])} archivo(s) no se pudieron cargar", expanded=almacen is None):
+            for fuente, mensaje in datos_cargados['errores']:
+                st.markdown(f"**{fuente}:** {mensaje}")
+    
+    # Aviso cuando la sesión pasa a una versión nueva de los datos
+    version_anterior = st.session_state.get("version_datos")
+    if version_anterior is not None and datos_cargados['version'] not in (None, version_anterior):
+        st.toast(f"🔄 Datos actualizados al {datos_al:%Y-%m-%d %H:%M:%S}")
+    st.session_state["version_datos"] = datos_cargados['version']
+    
+    if almacen is None or not len(almacen):
         st.error("No se pudieron cargar los datos. Asegúrate de que el archivo 'indicadores.xlsx' esté en el directorio correcto.")
         return
     
+    # Opciones de los filtros: de los índices de los datos cargados o, con el histórico, de todo lo ingerido
+    dimensiones = datos_cargados['indices']['dimensiones']
+    opciones_filtro = {dimension: sorted(dimensiones[dimension]) for dimension in DIMENSIONES_FILTRO}
+    try:
+        historico = get_historico()
+        if historico is not None:
+            marca_historico = historico.marca()
+            periodos_disponibles = historico.periodos() or periodos_disponibles
+            opciones_filtro.update(historico.opciones())
+            fuentes_disponibles = opciones_filtro['fuente']
+    except Exception as e:
+        st.warning(f"No se pudo consultar el histórico ({ARCHIVO_HISTORICO}): {str(e)}")
+        historico = None
+    multiples_fuentes = len(fuentes_disponibles) > 1
+    
     # Sidebar para filtros y logo
     with st.sidebar:
-        # Logo en el sidebar - Más pequeño
-        try:
-            logo = Image.open("Logo_gobernacion.png")
-            st.image(logo, width=150)
+        # Logo en el sidebar - Más pequeño (decodificado una sola vez por proceso)
+        logo = obtener_logo()
+        if logo is not None:
+            st.image(logo, width=ANCHO_LOGO)
             st.markdown("---")
-        except:
+        else:
             st.markdown("🏛️ **Gobernación del Tolima**")
             st.markdown("---")
         
         st.header("🔧 Configuración")
         
-        # Filtro por línea estratégica
-        lineas_unicas = list(set([get_linea_estrategica_nombre(ind['linea']) for ind in indicadores]))
-        lineas_unicas.sort()
+        # Filtros de selección múltiple (sin selección = todos)
+        # Filtro por municipio (solo cuando se consolidan varios libros)
+        fuentes_seleccionadas = []
+        if multiples_fuentes:
+            fuentes_seleccionadas = st.multiselect(
+                "Municipio:",
+                options=fuentes_disponibles,
+                placeholder="Todos"
+            )
         
-        linea_seleccionada = st.selectbox(
+        # Filtro por línea estratégica
+        lineas_seleccionadas = st.multiselect(
             "Seleccionar Línea Estratégica:",
-            options=["Todas"] + lineas_unicas,
-            index=0
+            options=opciones_filtro['linea_nombre'],
+            placeholder="Todas"
         )
         
         # Filtro por tipo de indicador
-        tipos_unicos = list(set([ind['tipo'] for ind in indicadores if ind['tipo']]))
-        tipo_seleccionado = st.selectbox(
+        tipos_seleccionados = st.multiselect(
             "Tipo de Indicador:",
-            options=["Todos"] + tipos_unicos,
-            index=0
+            options=[tipo for tipo in opciones_filtro['tipo'] if tipo],
+            placeholder="Todos"
+        )
+        
+        # Filtro por tipo detectado en todo el histórico (SI/NO o numérico)
+        tipos_detectados = st.multiselect(
+            "Tipo Detectado:",
+            options=opciones_filtro['tipo_detectado'],
+            format_func=lambda tipo: ETIQUETAS_TIPO_DETECTADO.get(tipo, tipo),
+            placeholder="Todos"
+        )
+        
+        # Rango de períodos a mostrar (por defecto todo el histórico del plan)
+        if len(periodos_disponibles) > 1:
+            periodo_inicio, periodo_fin = st.select_slider(
+                "Rango de Períodos:",
+                options=periodos_disponibles,
+                value=(periodos_disponibles[0], periodos_disponibles[-1])
+            )
+        else:
+            periodo_inicio = periodo_fin = periodos_disponibles[0] if periodos_disponibles else None
+        
+        # Visualización del progreso temporal
+        vista_progreso = st.radio(
+            "Vista del progreso:",
+            options=VISTAS_PROGRESO,
+            help="Por línea estratégica dibuja una sola figura por línea, con un subgráfico por indicador"
+        )
+        opciones_pagina = sorted(set(OPCIONES_TAMANO_PAGINA + [TAMANO_PAGINA]))
+        tamano_pagina = st.selectbox(
+            "Indicadores por página:",
+            options=opciones_pagina,
+            index=opciones_pagina.index(TAMANO_PAGINA)
+        )
+        carga_bajo_demanda = st.checkbox(
+            "Cargar gráficos bajo demanda",
+            value=True,
+            help="Genera el gráfico y la tabla de un indicador solo cuando se abre (vista por indicador)"
         )
         
         st.markdown("---")
         st.markdown("### 📋 Resumen")
-        st.markdown(f"**Total indicadores:** {len(indicadores)}")
+        st.markdown(f"**Total indicadores:** {len(almacen)}")
+        if multiples_fuentes:
+            st.markdown(f"**Municipios:** {len(fuentes_disponibles)}")
         st.markdown(f"**Líneas estratégicas:** 5")
+        if datos_al is not None:
+            st.caption(f"🕒 Datos al {datos_al:%Y-%m-%d %H:%M:%S} (cargados {cargados_el:%H:%M:%S})")
         
         st.markdown("---")
         st.markdown("### 👨‍💻 Información del Sistema")
         st.markdown("**Desarrollado por:**")
         st.markdown("**Ing. José Miguel Santos**")
         st.markdown("*Secretaría de Salud del Tolima*")
+        
+        with st.expander("🗄️ Caché", expanded=False):
+            st.markdown("**Datos**")
+            estadisticas = obtener_estadisticas_cache()
+            st.markdown(f"**Versión:** `{estadisticas['version']}`")
+            st.markdown(f"**Aciertos (memoria / snapshot):** {estadisticas['aciertos_memoria']} / {estadisticas['aciertos_snapshot']}")
+            st.markdown(f"**Fallos (lectura del Excel):** {estadisticas['fallos']}")
+            if estadisticas['ultima_carga_ms'] is not None:
+                st.markdown(f"**Última carga:** {estadisticas['ultima_carga_ms']:.0f} ms ({estadisticas['ultima_fuente']})")
+            if estadisticas['celdas_leidas']:
+                st.markdown(f"**Celdas recalculadas:** {estadisticas['celdas_recalculadas']} de {estadisticas['celdas_leidas']} leídas")
+            refresco = get_refresco(FUENTES_DATOS, HOJA_DATOS).resumen()
+            if refresco['ultima_revision'] is not None:
+                st.markdown(f"**Refresco:** {'activo' if refresco['activo'] else 'en cada solicitud'}, "
+                            f"última revisión {refresco['ultima_revision']:%H:%M:%S}, {refresco['reemplazos']} versiones cargadas")
+            if refresco['actualizando']:
+                st.markdown("🔄 Cargando una versión nueva en segundo plano")
+            if refresco['ultimo_error']:
+                st.markdown(f"**Última versión descartada:** {refresco['ultimo_error']}")
+            if historico is not None:
+                st.markdown(f"**Histórico:** {marca_historico[0]} versiones, última ingesta {marca_historico[1] or 'N/A'}")
+            
+            st.markdown("**Figuras**")
+            estadisticas_figuras = get_cache_figuras().estadisticas()
+            st.markdown(f"**Aciertos / fallos:** {estadisticas_figuras['aciertos']} / {estadisticas_figuras['fallos']} "
+                        f"({estadisticas_figuras['tasa_aciertos']:.0%})")
+            st.markdown(f"**Desalojos:** {estadisticas_figuras['desalojos']}")
+            st.markdown(f"**Residentes:** {estadisticas_figuras['entradas']}/{estadisticas_figuras['max_entradas']} figuras, "
+                        f"{estadisticas_figuras['bytes_residentes'] / 1024:.0f} KB")
     
-    # Filtrar indicadores
-    indicadores_filtrados = indicadores.copy()
+    # Períodos seleccionados en el rango
+    if periodo_inicio is None:
+        periodos = []
+    else:
+        periodos = periodos_disponibles[periodos_disponibles.index(periodo_inicio):
+                                        periodos_disponibles.index(periodo_fin) + 1]
     
-    if linea_seleccionada != "Todas":
-        indicadores_filtrados = [ind for ind in indicadores_filtrados 
-                               if get_linea_estrategica_nombre(ind['linea']) == linea_seleccionada]
+    # Con el histórico, las pestañas trabajan sobre el rango y los filtros consultados en SQLite
+    datos = datos_cargados
+    if historico is not None and periodos:
+        datos = consultar_historico(marca_historico, tuple(periodos), tuple(fuentes_seleccionadas),
+                                    tuple(lineas_seleccionadas), tuple(tipos_seleccionados))
+        if datos is None:
+            st.warning("No hay mediciones en el histórico para los filtros seleccionados.")
+            return
+    almacen = datos['almacen']
     
-    if tipo_seleccionado != "Todos":
-        indicadores_filtrados = [ind for ind in indicadores_filtrados 
-                               if ind['tipo'] == tipo_seleccionado]
+    # Filtrar indicadores: intersección de los índices invertidos, en el orden de presentación
+    filtros = (
+        ('fuente', tuple(fuentes_seleccionadas)),
+        ('linea_nombre', tuple(lineas_seleccionadas)),
+        ('tipo', tuple(tipos_seleccionados)),
+        ('tipo_detectado', tuple(tipos_detectados))
+    )
+    seleccion = seleccionar_indicadores(datos['indices'], filtros)
+    orden_presentacion = datos['indices']['orden_presentacion']
+    posiciones_filtradas = orden_presentacion[seleccion[orden_presentacion]]
     
-    # Períodos definidos (últimos 3 meses)
-    periodos = ["Mar 2025", "Abr 2025", "May 2025"]
+    # Solo se calcula la sección visible; cada una se re-ejecuta por separado al usar sus controles
+    seccion = st.radio(
+        "Sección:",
+        options=SECCIONES_DASHBOARD,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="seccion_dashboard"
+    )
     
-    # Pestañas principales
-    tab1, tab2, tab3 = st.tabs(["📈 Progreso Temporal", "📊 Resumen Ejecutivo", "📋 Datos Detallados"])
+    if seccion == SECCIONES_DASHBOARD[0]:
+        with medir_etapa("Pestaña Progreso Temporal"):
+            seccion_progreso(almacen, posiciones_filtradas, periodos, tamano_pagina,
+                             vista_progreso, carga_bajo_demanda, multiples_fuentes)
+    elif seccion == SECCIONES_DASHBOARD[1]:
+        with medir_etapa("Pestaña Resumen Ejecutivo"):
+            seccion_resumen(datos, filtros, periodos, multiples_fuentes)
+    elif seccion == SECCIONES_DASHBOARD[2]:
+        with medir_etapa("Pestaña Datos Detallados"):
+            seccion_datos(datos, filtros, periodos, multiples_fuentes)
+    else:
+        with medir_etapa("Pestaña Anomalías"):
+            seccion_anomalias(datos, posiciones_filtradas, periodos, multiples_fuentes)
+
+def perfilado_solicitado():
+    """
+    Indica si el perfilado está activo por variable de entorno o por el parámetro ?perfil=1
+    """
+    return PERFIL_ACTIVO or st.query_params.get("perfil", "0").lower() not in ("", "0", "false", "no")
+
+def mostrar_panel_perfil(resumen, arranque, contenedor=None, titulo="⏱️ Rendimiento"):
+    """
+    Muestra las duraciones, llamadas y aciertos de caché del rerun y el arranque del proceso (en el sidebar por defecto)
+    """
+    with (contenedor or st.sidebar).expander(titulo, expanded=False):
+        st.markdown(f"**Rerun:** {resumen['total_ms']:.0f} ms")
+        st.markdown(f"**Arranque del proceso:** importaciones {arranque['importaciones_ms']:.0f} ms, "
+                    f"primer render {arranque['primer_render_ms']:.0f} ms")
+        etapas = pd.DataFrame([
+            {'Etapa': etapa, 'ms': round(medida['ms'], 1), 'Llamadas': medida['llamadas']}
+            for etapa, medida in sorted(resumen['etapas'].items(), key=lambda item: -item[1]['ms'])
+        ])
+        if not etapas.empty:
+            st.dataframe(etapas, hide_index=True, use_container_width=True)
+        for nombre, cache in resumen['caches'].items():
+            if cache['consultas']:
+                st.markdown(f"**Caché de {nombre}:** {cache['aciertos']}/{cache['consultas']} aciertos "
+                            f"({cache['aciertos'] / cache['consultas']:.0%})")
+
+def escribir_perfil(resumen):
+    """
+    Agrega el perfil de un rerun (completo o de fragmento) a INDICADORES_PERFIL_LOG como una línea JSON
+    """
+    if not ARCHIVO_PERFIL:
+        return
+    try:
+        with open(ARCHIVO_PERFIL, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resumen, ensure_ascii=False) + "\n")
+    except OSError as e:
+        st.warning(f"No se pudo escribir el perfil en {ARCHIVO_PERFIL}: {e}")
+
+def main():
+    global _perfil
+    configurar_pagina()
+    _perfil = PerfilEjecucion() if perfilado_solicitado() else None
     
-    with tab1:
-        st.header("📈 Progreso Temporal de Indicadores")
-        
-        if not indicadores_filtrados:
-            st.warning("No hay indicadores que coincidan con los filtros seleccionados.")
-            return
-        
-        # Agrupar por línea estratégica
-        indicadores_por_linea = {}
-        for indicador in indicadores_filtrados:
-            linea_nombre = get_linea_estrategica_nombre(indicador['linea'])
-            if linea_nombre not in indicadores_por_linea:
-                indicadores_por_linea[linea_nombre] = []
-            indicadores_por_linea[linea_nombre].append(indicador)
-        
-        # Mostrar por línea estratégica
-        for linea_nombre in sorted(indicadores_por_linea.keys()):
-            st.subheader(f"🎯 {linea_nombre}")
-            
-            indicadores_linea = indicadores_por_linea[linea_nombre]
-            
-            for indicador in indicadores_linea:
-                # Limpiar el nombre para evitar problemas con markdown
-                nombre_limpio = limpiar_texto_markdown(indicador['nombre'])
-                
-                # Usar expanders como antes, pero mejorados
-                with st.expander(f"**{indicador['numero']}. {nombre_limpio}**", expanded=False):
-                    
-                    # Layout responsive con columnas
-                    col1, col2 = st.columns([3, 1])
-                    
-                    with col1:
-                        st.markdown(f"**Tipo:** {indicador['tipo']}")
-                        st.markdown(f"**Línea:** {indicador['linea']}")
-                        
-                        # Definición operacional con toggle para ver completa
-                        st.markdown("**Definición operacional:**")
-                        if len(indicador['definicion']) > 200:
-                            mostrar_def_completa = st.checkbox(
-                                "Ver definición completa", 
-                                key=f"def_{indicador['numero']}"
-                            )
-                            if mostrar_def_completa:
-                                st.info(indicador['definicion'])
-                            else:
-                                definicion_corta = indicador['definicion'][:200] + "..."
-                                st.info(definicion_corta)
-                        else:
-                            st.info(indicador['definicion'])
-                    
-                    with col2:
-                        # Calcular seguimiento
-                        total_periodos = len(periodos)
-                        reportados = sum(1 for p in periodos 
-                                       if indicador['datos'].get(p, {}).get('ile', '').strip())
-                        seguimiento = (reportados / total_periodos) * 100
-                        st.metric("Seguimiento", f"{seguimiento:.0f}%")
-                        
-                        # Mostrar tipo de indicador detectado
-                        tipo_detected = detect_indicator_type(indicador, periodos)
-                        if tipo_detected == "cualitativo":
-                            st.info("📊 Cualitativo")
-                        elif tipo_detected == "cuantitativo":
-                            st.info("📈 Cuantitativo")
-                        else:
-                            st.info("⚪ Sin datos")
-                    
-                    # Gráfico de progreso
-                    fig = create_progress_chart(indicador, periodos)
-                    if fig:
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("No hay datos suficientes para generar el gráfico.")
-                    
-                    # Tabla de datos responsive
-                    st.markdown("**Datos por período:**")
-                    datos_tabla = []
-                    for periodo in periodos:
-                        if periodo in indicador['datos']:
-                            datos = indicador['datos'][periodo]
-                            ile_corregido = datos['ile']
-                            
-                            # Aplicar corrección de porcentaje si es necesario
-                            if datos['ile'] and datos['ile'].strip():
-                                try:
-                                    if datos['ile'].upper() not in ['SI', 'NO']:
-                                        ile_value = corregir_porcentaje(datos['ile'])
-                                        if isinstance(ile_value, float):
-                                            ile_corregido = f"{ile_value:.1f}"
-                                except:
-                                    pass
-                            
-                            datos_tabla.append({
-                                'Período': periodo,
-                                'Numerador': datos['numerador'] or 'Pendiente',
-                                'Denominador': datos['denominador'] or 'N/A',
-                                'ILE': ile_corregido or 'Pendiente'
-                            })
-                    
-                    if datos_tabla:
-                        df_tabla = pd.DataFrame(datos_tabla)
-                        st.dataframe(df_tabla, use_container_width=True)
-    
-    with tab2:
-        st.header("📊 Resumen Ejecutivo")
-        
-        # Métricas generales - Layout responsive
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Indicadores", len(indicadores_filtrados))
-        
-        with col2:
-            # Calcular promedio de seguimiento
-            seguimientos = []
-            for ind in indicadores_filtrados:
-                reportados = sum(1 for p in periodos 
-                               if ind['datos'].get(p, {}).get('ile', '').strip())
-                seguimientos.append((reportados / len(periodos)) * 100)
-            promedio_seguimiento = sum(seguimientos) / len(seguimientos) if seguimientos else 0
-            st.metric("Seguimiento Promedio", f"{promedio_seguimiento:.1f}%")
-        
-        with col3:
-            # Indicadores con datos completos
-            completos = sum(1 for seg in seguimientos if seg == 100)
-            st.metric("Indicadores Completos", completos)
-        
-        with col4:
-            # Último período reportado
-            st.metric("Último Período", "May 2025")
-        
-        st.markdown("---")
-        
-        # Gráfico de seguimiento por línea estratégica
-        st.subheader("🎯 Seguimiento por Línea Estratégica")
-        
-        seguimiento_por_linea = {}
-        for ind in indicadores_filtrados:
-            linea_key = get_linea_estrategica_nombre(ind['linea'])
-            if linea_key not in seguimiento_por_linea:
-                seguimiento_por_linea[linea_key] = []
-            
-            reportados = sum(1 for p in periodos 
-                           if ind['datos'].get(p, {}).get('ile', '').strip())
-            seguimiento_por_linea[linea_key].append((reportados / len(periodos)) * 100)
-        
-        if seguimiento_por_linea:
-            lineas = list(seguimiento_por_linea.keys())
-            promedios = [sum(vals) / len(vals) for vals in seguimiento_por_linea.values()]
-            
-            fig_seguimiento = go.Figure(data=[
-                go.Bar(x=lineas, y=promedios, 
-                      marker_color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57'][:len(lineas)])
-            ])
-            fig_seguimiento.update_layout(
-                title="Seguimiento Promedio por Línea Estratégica (%)",
-                xaxis_title="Línea Estratégica",
-                yaxis_title="Seguimiento (%)",
-                template="plotly_white",
-                height=400,
-                margin=dict(l=20, r=20, t=60, b=20)
-            )
-            st.plotly_chart(fig_seguimiento, use_container_width=True)
-        
-        # Layout responsive para gráficos
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Distribución de tipos de indicadores
-            st.subheader("📊 Distribución de Tipos")
-            tipos_count = {}
-            for ind in indicadores_filtrados:
-                tipo = ind['tipo']
-                tipos_count[tipo] = tipos_count.get(tipo, 0) + 1
-            
-            fig_pie = go.Figure(data=[go.Pie(
-                labels=list(tipos_count.keys()),
-                values=list(tipos_count.values()),
-                hole=0.4
-            )])
-            fig_pie.update_layout(
-                title="Tipos de Indicadores", 
-                height=400,
-                margin=dict(l=20, r=20, t=60, b=20)
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
-        
-        with col2:
-            # Tabla de resumen por línea
-            st.subheader("📋 Resumen por Línea")
-            resumen_lineas = []
-            for linea_key, seguimientos_linea in seguimiento_por_linea.items():
-                nombre_corto = linea_key.split('.')[1].strip() if '.' in linea_key else linea_key
-                resumen_lineas.append({
-                    'Línea': nombre_corto[:20] + "..." if len(nombre_corto) > 20 else nombre_corto,
-                    'Indicadores': len(seguimientos_linea),
-                    'Seguimiento (%)': f"{sum(seguimientos_linea) / len(seguimientos_linea):.1f}%"
-                })
-            
-            if resumen_lineas:
-                df_resumen = pd.DataFrame(resumen_lineas)
-                st.dataframe(df_resumen, use_container_width=True)
-    
-    with tab3:
-        st.header("📋 Datos Detallados")
-        
-        # Tabla completa de todos los indicadores
-        tabla_completa = []
-        for ind in indicadores_filtrados:
-            for periodo in periodos:
-                if periodo in ind['datos']:
-                    datos = ind['datos'][periodo]
-                    
-                    # Aplicar corrección de porcentaje
-                    ile_corregido = datos['ile'] or 'Pendiente'
-                    if datos['ile'] and datos['ile'].strip():
-                        try:
-                            if datos['ile'].upper() not in ['SI', 'NO']:
-                                ile_value = corregir_porcentaje(datos['ile'])
-                                if isinstance(ile_value, float):
-                                    ile_corregido = f"{ile_value:.1f}"
-                        except:
-                            pass
-                    
-                    tabla_completa.append({
-                        'Indicador': ind['numero'],
-                        'Nombre': limpiar_texto_markdown(ind['nombre']),
-                        'Línea': get_linea_estrategica_nombre(ind['linea']),
-                        'Tipo': ind['tipo'],
-                        'Definición': limpiar_texto_markdown(ind['definicion']),
-                        'Período': periodo,
-                        'Numerador': datos['numerador'] or 'Pendiente',
-                        'Denominador': datos['denominador'] or 'N/A',
-                        'ILE': ile_corregido
-                    })
-        
-        if tabla_completa:
-            df_completa = pd.DataFrame(tabla_completa)
-            st.dataframe(df_completa, use_container_width=True, height=600)
-            
-            # Opción de descarga
-            csv = df_completa.to_csv(index=False)
-            st.download_button(
-                label="📥 Descargar datos como CSV",
-                data=csv,
-                file_name="indicadores_fiebre_amarilla_mar_may_2025.csv",
-                mime="text/csv"
-            )
+    try:
+        mostrar_dashboard()
+    finally:
+        arranque = registrar_arranque()
+        if _perfil is not None:
+            resumen = _perfil.resumen()
+            _perfil = None
+            mostrar_panel_perfil(resumen, arranque)
+            escribir_perfil(resumen)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
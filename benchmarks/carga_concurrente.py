@@ -0,0 +1,349 @@
+"""
+Prueba de carga del dashboard con varias sesiones concurrentes contra un servidor real
+
+Levanta `streamlit run app.py` sin navegador y abre N sesiones por el mismo
+websocket que usa el navegador (/_stcore/stream). Cada sesión cambia de
+sección, de línea estratégica y de rango de períodos, ordena el ranking del
+resumen, abre indicadores y prepara descargas; los controles que viven dentro
+de un fragmento re-ejecutan solo ese fragmento, como en el navegador. Lo que
+dibuja el servidor se interpreta con el árbol de elementos del AppTest de
+Streamlit para encontrar los controles.
+
+Por cada cantidad de sesiones se informa la latencia de los reruns (p50 y p95,
+desde que se envía el rerun hasta que el script termina), los reruns por
+segundo, la CPU del servidor, la memoria por sesión (crecimiento del RSS del
+servidor con las sesiones abiertas, dividido entre ellas) y el RSS total del
+servidor. El RSS y la CPU se leen de /proc, así que la prueba corre en Linux.
+El cliente corre en este proceso: en un host con una sola CPU compite con el
+servidor. Requiere `websockets` (pip install -r benchmarks/requirements.txt).
+
+    python benchmarks/carga_concurrente.py --sesiones 1,5,10,20 --acciones 15
+    python benchmarks/carga_concurrente.py --sesiones 10 --indicadores 400 --periodos 48 --guardar carga.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+
+from libros_sinteticos import generar_libros
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIVO_APP = os.path.join(RAIZ, "app.py")
+ESPERA_SERVIDOR = 120  # Segundos máximos para que el servidor responda al health check
+
+def _lista_enteros(texto):
+    return [int(valor) for valor in texto.split(',')]
+
+def rss_mb(pid):
+    """
+    RSS actual del proceso en MB
+    """
+    with open(f"/proc/{pid}/status", encoding='ascii') as f:
+        for linea in f:
+            if linea.startswith("VmRSS:"):
+                return int(linea.split()[1]) / 1024
+    return 0.0
+
+def cpu_segundos(pid):
+    """
+    Tiempo de CPU (usuario + sistema) consumido por el proceso
+    """
+    with open(f"/proc/{pid}/stat", encoding='ascii') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def servidor_dashboard(entorno, directorio):
+    """
+    Levanta app.py con `streamlit run` sin navegador y devuelve el proceso y la URL del websocket
+    """
+    puerto = _puerto_libre()
+    ruta_log = os.path.join(directorio, "servidor.log")
+    with open(ruta_log, 'w', encoding='utf-8') as log:
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", ARCHIVO_APP, "--server.headless", "true",
+             "--server.port", str(puerto), "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false"],
+            cwd=RAIZ, env=entorno, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        limite = time.monotonic() + ESPERA_SERVIDOR
+        while True:
+            try:
+                urllib.request.urlopen(f"http://localhost:{puerto}/_stcore/health", timeout=1).read()
+                break
+            except OSError:
+                if proceso.poll() is not None or time.monotonic() > limite:
+                    with open(ruta_log, encoding='utf-8') as log:
+                        raise RuntimeError(f"El servidor no arrancó:\n{log.read()[-2000:]}")
+                time.sleep(0.2)
+        yield proceso, f"ws://localhost:{puerto}/_stcore/stream"
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+
+class SesionDashboard:
+    """
+    Una pestaña del navegador: envía reruns por el websocket y guarda lo último que dibujó el servidor
+    """
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.mensajes = {}  # Ruta del delta -> mensaje (un rerun de fragmento reemplaza solo sus rutas)
+        self.fragmentos = {}  # Id del control -> fragmento que lo dibuja ('' si está fuera de fragmentos)
+        self.seccion = 0  # La app abre en la primera sección
+
+    async def rerun(self, *estados, fragmento=""):
+        """
+        Envía un rerun con los controles cambiados y espera el fin del script; devuelve los ms y los errores
+
+        Como en el navegador, los controles que no cambian no se envían: el
+        servidor conserva su valor anterior.
+        """
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ""
+        mensaje.rerun_script.page_script_hash = ""
+        mensaje.rerun_script.widget_states.widgets.extend(estados)
+        mensaje.rerun_script.fragment_id = fragmento
+        if not fragmento:
+            self.mensajes.clear()
+
+        errores = []
+        inicio = time.perf_counter()
+        await self.conexion.send(mensaje.SerializeToString())
+        while True:
+            recibido = ForwardMsg()
+            recibido.ParseFromString(await self.conexion.recv())
+            tipo = recibido.WhichOneof("type")
+            if tipo == "script_finished":
+                break
+            if tipo != "delta":
+                continue
+            self.mensajes[tuple(recibido.metadata.delta_path)] = recibido
+            if recibido.delta.WhichOneof("type") == "new_element":
+                elemento = recibido.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                if tipo_elemento == "exception":
+                    errores.append(elemento.exception.message)
+                control = getattr(elemento, tipo_elemento)
+                if getattr(control, "id", ""):
+                    self.fragmentos[control.id] = recibido.delta.fragment_id
+        return (time.perf_counter() - inicio) * 1000, errores
+
+    def arbol(self):
+        return parse_tree_from_messages(list(self.mensajes.values()))
+
+def _por_etiqueta(controles, etiqueta):
+    """
+    Control con la etiqueta dada, o None si la app no lo dibujó
+    """
+    return next((control for control in controles if control.label == etiqueta), None)
+
+def _texto(control, valor):
+    return WidgetState(id=control.id, string_value=valor)
+
+def _lista(control, valores):
+    estado = WidgetState(id=control.id)
+    estado.string_array_value.data.extend(valores)
+    return estado
+
+def cambiar_seccion(sesion, arbol, rng):
+    seccion = arbol.radio(key="seccion_dashboard")
+    sesion.seccion = rng.choice([k for k in range(len(seccion.options)) if k != sesion.seccion])
+    return [_texto(seccion, seccion.options[sesion.seccion])]
+
+def cambiar_lineas(sesion, arbol, rng):
+    lineas = _por_etiqueta(arbol.sidebar.multiselect, "Seleccionar Línea Estratégica:")
+    if lineas is None:
+        return cambiar_seccion(sesion, arbol, rng)
+    return [_lista(lineas, rng.sample(lineas.options, rng.randint(0, min(2, len(lineas.options)))))]
+
+def cambiar_rango(sesion, arbol, rng):
+    rango = _por_etiqueta(arbol.sidebar.select_slider, "Rango de Períodos:")
+    if rango is None or len(rango.options) < 2:
+        return cambiar_seccion(sesion, arbol, rng)
+    inicio, fin = sorted(rng.sample(range(len(rango.options)), 2))
+    return [_lista(rango, [rango.options[inicio], rango.options[fin]])]
+
+def usar_seccion(sesion, arbol, rng):
+    """
+    Usa un control de la sección abierta: abrir un indicador, ordenar el ranking o preparar una descarga
+    """
+    if sesion.seccion == 0:
+        abrir = [toggle for toggle in arbol.toggle if toggle.key and toggle.key.startswith("abrir_")]
+        if abrir:
+            return [WidgetState(id=rng.choice(abrir).id, bool_value=True)]
+    elif sesion.seccion == 1:
+        criterio = arbol.selectbox(key="criterio_movimientos")
+        return [_texto(criterio, rng.choice(criterio.options))]
+    else:
+        clave = "datos" if sesion.seccion == 2 else "anomalias"
+        botones = [boton for boton in arbol.button if boton.key == f"preparar_{clave}"]
+        if botones:
+            formato = arbol.selectbox(key=f"formato_{clave}")
+            return [_texto(formato, rng.choice(formato.options)), WidgetState(id=botones[0].id, trigger_value=True)]
+    return cambiar_seccion(sesion, arbol, rng)
+
+# Acciones de un usuario y su peso relativo
+ACCIONES = [(cambiar_seccion, 3), (cambiar_lineas, 2), (cambiar_rango, 1), (usar_seccion, 4)]
+
+async def ejecutar_sesion(sesion, semilla, n_acciones, pausa):
+    """
+    Abre la página y ejecuta las acciones de un usuario; devuelve las latencias y los errores de sus reruns
+    """
+    rng = random.Random(semilla)
+    ms, errores = await sesion.rerun()
+    latencias = [ms]
+    for _ in range(n_acciones):
+        if pausa:
+            await asyncio.sleep(rng.uniform(0, 2 * pausa))
+        accion = rng.choices([accion for accion, _ in ACCIONES], weights=[peso for _, peso in ACCIONES])[0]
+        try:
+            estados = accion(sesion, sesion.arbol(), rng)
+        except (KeyError, IndexError, ValueError) as e:
+            errores.append(f"{accion.__name__}: {e!r}")
+            continue
+        ms, fallas = await sesion.rerun(*estados, fragmento=sesion.fragmentos.get(estados[0].id, ""))
+        latencias.append(ms)
+        errores.extend(fallas)
+    return latencias, errores
+
+async def medir_sesiones(url, pid, n_sesiones, n_acciones, pausa, intervalo_rss=0.1):
+    """
+    Abre n_sesiones concurrentes y mide latencias, CPU y memoria del servidor mientras siguen abiertas
+    """
+    rss_base = rss_mb(pid)
+    pico = [rss_base]
+    async def muestrear():
+        while True:
+            pico[0] = max(pico[0], rss_mb(pid))
+            await asyncio.sleep(intervalo_rss)
+
+    conexiones = [await websockets.connect(url, max_size=None) for _ in range(n_sesiones)]
+    muestreo = asyncio.ensure_future(muestrear())
+    try:
+        cpu_inicio, inicio = cpu_segundos(pid), time.perf_counter()
+        resultados = await asyncio.gather(*(ejecutar_sesion(SesionDashboard(conexion), k, n_acciones, pausa)
+                                            for k, conexion in enumerate(conexiones)))
+        duracion = time.perf_counter() - inicio
+        cpu = cpu_segundos(pid) - cpu_inicio
+        # Memoria con todas las sesiones aún abiertas
+        rss_final = rss_mb(pid)
+    finally:
+        muestreo.cancel()
+        for conexion in conexiones:
+            await conexion.close()
+
+    latencias = np.array([ms for latencias_sesion, _ in resultados for ms in latencias_sesion])
+    errores = [error for _, errores_sesion in resultados for error in errores_sesion]
+    p50, p95 = np.percentile(latencias, [50, 95])
+    return {
+        'sesiones': n_sesiones,
+        'reruns': len(latencias),
+        'errores': len(errores),
+        'ejemplos_error': errores[:5],
+        'p50_ms': round(float(p50), 1),
+        'p95_ms': round(float(p95), 1),
+        'max_ms': round(float(latencias.max()), 1),
+        'reruns_por_segundo': round(len(latencias) / duracion, 2),
+        'cpu_servidor_pct': round(100 * cpu / duracion, 1),
+        'mb_por_sesion': round(max(rss_final - rss_base, 0) / n_sesiones, 2),
+        'rss_mb': round(rss_final, 1),
+        'rss_pico_mb': round(max(pico[0], rss_final), 1)
+    }
+
+async def ejecutar_prueba(url, pid, sesiones, n_acciones, pausa):
+    """
+    Primera visita (carga los libros y llena las cachés, no cuenta en las mediciones) y una ronda por cantidad de sesiones
+    """
+    rss_inicial = rss_mb(pid)
+    async with websockets.connect(url, max_size=None) as conexion:
+        primera_carga_ms, errores = await SesionDashboard(conexion).rerun()
+    if errores:
+        raise RuntimeError(f"La app falló en la primera carga: {errores[0]}")
+    print(f"🚀 Primera carga: {primera_carga_ms:.0f} ms (RSS del servidor {rss_inicial:.0f} → {rss_mb(pid):.0f} MB)")
+
+    rondas = []
+    for n_sesiones in sesiones:
+        ronda = await medir_sesiones(url, pid, n_sesiones, n_acciones, pausa)
+        rondas.append(ronda)
+        print(f"\n👥 {n_sesiones} sesión(es), {ronda['reruns']} reruns, {ronda['errores']} con error")
+        print(f"   latencia p50   {ronda['p50_ms']:>8.0f} ms")
+        print(f"   latencia p95   {ronda['p95_ms']:>8.0f} ms")
+        print(f"   reruns/s       {ronda['reruns_por_segundo']:>8.1f}")
+        print(f"   CPU servidor   {ronda['cpu_servidor_pct']:>8.0f} %")
+        print(f"   memoria/sesión {ronda['mb_por_sesion']:>8.1f} MB")
+        print(f"   RSS servidor   {ronda['rss_mb']:>8.0f} MB (pico {ronda['rss_pico_mb']:.0f} MB)")
+        for error in ronda['ejemplos_error']:
+            print(f"   ⚠️ {error[:200]}")
+    return primera_carga_ms, rondas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones concurrentes del dashboard")
+    parser.add_argument("--sesiones", type=_lista_enteros, default=[1, 5, 10],
+                        help="Cantidades de sesiones concurrentes a probar, separadas por coma")
+    parser.add_argument("--acciones", type=int, default=10, help="Acciones (reruns) de cada sesión")
+    parser.add_argument("--pausa", type=float, default=0.0,
+                        help="Pausa media en segundos entre acciones de una sesión (0 = sin pausa)")
+    parser.add_argument("--fuentes", help="Libros a cargar (por defecto INDICADORES_FUENTES o indicadores.xlsx)")
+    parser.add_argument("--indicadores", type=int, help="Genera libros sintéticos con esta cantidad de indicadores")
+    parser.add_argument("--periodos", type=int, default=9, help="Períodos de los libros sintéticos")
+    parser.add_argument("--municipios", type=int, default=1, help="Municipios de los libros sintéticos")
+    parser.add_argument("--guardar", help="Guarda los resultados en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/status"):
+        print("❌ La prueba lee la memoria y la CPU del servidor en /proc (solo Linux)", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno = dict(os.environ)
+        if args.indicadores:
+            entorno['INDICADORES_FUENTES'] = generar_libros(os.path.join(directorio, "libros"), args.indicadores,
+                                                            args.periodos, args.municipios)
+            entorno['INDICADORES_CACHE_DIR'] = os.path.join(directorio, "snapshots")
+        elif args.fuentes:
+            entorno['INDICADORES_FUENTES'] = args.fuentes
+
+        try:
+            with servidor_dashboard(entorno, directorio) as (servidor, url):
+                primera_carga_ms, rondas = asyncio.run(
+                    ejecutar_prueba(url, servidor.pid, args.sesiones, args.acciones, args.pausa))
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({
+                'entorno': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                            'cpus': os.cpu_count(), 'acciones': args.acciones, 'pausa': args.pausa},
+                'primera_carga_ms': round(primera_carga_ms, 1),
+                'rondas': rondas
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados guardados en {args.guardar}")
+    return 1 if any(ronda['errores'] for ronda in rondas) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Mide el tiempo y la memoria pico de cada etapa del dashboard sobre libros sintéticos
+
+Cada escenario varía un eje (indicadores, períodos o municipios) dejando los
+otros en su primer valor. Las etapas son la carga del Excel, la carga desde el
+snapshot, el cálculo de derivados, la validación de consistencia, las
+tendencias, los gráficos de la pestaña de progreso, el filtro del sidebar, el
+resumen ejecutivo y la exportación CSV de los datos detallados.
+
+    python benchmarks/ejecutar_benchmark.py --guardar benchmarks/baseline.json
+    python benchmarks/ejecutar_benchmark.py --comparar benchmarks/baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.logger import set_log_level
+
+# Sin servidor de Streamlit las cachés avisan que corren en modo "bare"; no aplica aquí
+set_log_level("error")
+import app
+from libros_sinteticos import generar_libros
+
+def _lista_enteros(texto):
+    return [int(valor) for valor in texto.split(',')]
+
+def limpiar_caches(directorio_snapshots=None):
+    """
+    Vacía las cachés en memoria del dashboard y, si se indica, los snapshots en disco
+    """
+    app._cargar_version.clear()
+    app._estado_cache_datos.clear()
+    app.calcular_resumen_ejecutivo.clear()
+    app.calcular_movimientos.clear()
+    if directorio_snapshots and os.path.isdir(directorio_snapshots):
+        shutil.rmtree(directorio_snapshots)
+
+def medir(etapa, repeticiones, preparar=lambda: None):
+    """
+    Ejecuta una etapa varias veces y devuelve la mediana del tiempo (ms) y la memoria pico (MB)
+
+    La memoria se mide en una ejecución aparte con tracemalloc para no inflar los
+    tiempos; no incluye la de los procesos hijos.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        preparar()
+        inicio = time.perf_counter()
+        etapa()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    preparar()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    etapa()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return {'ms': round(statistics.median(tiempos), 2), 'mb_pico': round(pico / 2**20, 2)}
+
+def ejecutar_escenario(n_indicadores, n_periodos, n_municipios, repeticiones, directorio):
+    """
+    Genera los libros de un escenario y mide todas sus etapas
+    """
+    fuente = generar_libros(os.path.join(directorio, "libros"), n_indicadores, n_periodos, n_municipios)
+    snapshots = os.path.join(directorio, "snapshots")
+    app.DIRECTORIO_SNAPSHOTS = snapshots
+    resultados = {}
+
+    resultados['carga_excel'] = medir(lambda: app.load_and_process_data(fuente), repeticiones,
+                                      preparar=lambda: limpiar_caches(snapshots))
+    resultados['carga_snapshot'] = medir(lambda: app.load_and_process_data(fuente), repeticiones,
+                                         preparar=limpiar_caches)
+
+    datos = app.load_and_process_data(fuente)
+    almacen, periodos = datos['almacen'], datos['periodos']
+
+    # Derivados sobre la tabla tal como sale de la lectura (sin las columnas calculadas)
+    estado = app._estado_cache_datos()
+    huellas = tuple((ruta, *app.huella_archivo(ruta, estado)) for ruta in app.resolver_fuentes(fuente))
+    tabla, _ = app.ingerir_libros(huellas, app.HOJA_DATOS, estado)
+    calculadas = app.COLUMNAS_DERIVADAS + ['tipo_detectado', 'seguimiento']
+    tabla_base = tabla[[col for col in tabla.columns if col not in calculadas]]
+    resultados['derivados'] = medir(lambda: app.agregar_columnas_derivadas(tabla_base.copy()), repeticiones)
+    resultados['validacion'] = medir(lambda: app.validar_consistencia(tabla), repeticiones)
+    resultados['tendencias'] = medir(lambda: app.calcular_tendencias(almacen), repeticiones)
+
+    def figuras_tab1():
+        for indicador in almacen.fichas():
+            fig = app.create_progress_chart(indicador, almacen.serie(indicador.posicion, periodos))
+            if fig is not None:
+                fig.to_json()
+    resultados['figuras_tab1'] = medir(figuras_tab1, repeticiones)
+
+    # Filtro del sidebar: dos líneas y un tipo sobre los índices invertidos
+    dimensiones = datos['indices']['dimensiones']
+    filtros = (('linea_nombre', tuple(sorted(dimensiones['linea_nombre'])[:2])),
+               ('tipo', tuple(sorted(dimensiones['tipo'])[:1])))
+    resultados['filtro_sidebar'] = medir(lambda: app.seleccionar_indicadores(datos['indices'], filtros), repeticiones)
+
+    resultados['resumen_tab2'] = medir(
+        lambda: app.calcular_resumen_ejecutivo(almacen, datos['indices'], datos['version'], (), tuple(periodos)),
+        repeticiones, preparar=app.calcular_resumen_ejecutivo.clear)
+
+    def csv_tab3():
+        tabla_filtrada = app.filtrar_tabla(almacen, datos['indices'], (), periodos)
+        app.exportar_tabla(tabla_filtrada, "csv", io.BytesIO(), n_municipios > 1)
+    resultados['csv_tab3'] = medir(csv_tab3, repeticiones)
+
+    return {'indicadores': n_indicadores, 'periodos': n_periodos, 'municipios': n_municipios,
+            'filas': len(almacen) * len(periodos), 'etapas': resultados}
+
+def escenarios(ejes):
+    """
+    Combina los ejes variando uno a la vez; el primer valor de cada eje es la base
+    """
+    base = {eje: valores[0] for eje, valores in ejes.items()}
+    vistos = []
+    for eje, valores in ejes.items():
+        for valor in valores:
+            combinacion = dict(base, **{eje: valor})
+            if combinacion not in vistos:
+                vistos.append(combinacion)
+    return vistos
+
+def comparar(resultados, ruta_baseline, tolerancia):
+    """
+    Compara los tiempos con un baseline guardado; devuelve las etapas que empeoraron más que la tolerancia
+    """
+    with open(ruta_baseline, encoding='utf-8') as f:
+        baseline = {esc['nombre']: esc for esc in json.load(f)['escenarios']}
+
+    regresiones = []
+    for escenario in resultados:
+        anterior = baseline.get(escenario['nombre'])
+        if anterior is None:
+            continue
+        for etapa, medida in escenario['etapas'].items():
+            if etapa not in anterior['etapas']:
+                continue
+            referencia = anterior['etapas'][etapa]['ms']
+            razon = medida['ms'] / referencia if referencia else 1.0
+            marca = "⚠️" if razon > 1 + tolerancia else "  "
+            print(f"{marca} {escenario['nombre']:<18} {etapa:<15} {referencia:>10.1f} → {medida['ms']:>10.1f} ms ({razon:.2f}x)")
+            if razon > 1 + tolerancia:
+                regresiones.append((escenario['nombre'], etapa, razon))
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga, transformación, gráficos y exportación")
+    parser.add_argument("--indicadores", type=_lista_enteros, default=[17, 100, 400],
+                        help="Valores del eje de indicadores separados por coma (el primero es la base)")
+    parser.add_argument("--periodos", type=_lista_enteros, default=[9, 24, 48])
+    parser.add_argument("--municipios", type=_lista_enteros, default=[1, 10, 47])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--guardar", help="Guarda los resultados en este archivo JSON")
+    parser.add_argument("--comparar", help="Compara contra un baseline JSON y falla si hay regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Aumento relativo de tiempo tolerado al comparar (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    ejes = {'indicadores': args.indicadores, 'periodos': args.periodos, 'municipios': args.municipios}
+    for combinacion in escenarios(ejes):
+        nombre = f"{combinacion['indicadores']}i_{combinacion['periodos']}p_{combinacion['municipios']}m"
+        with tempfile.TemporaryDirectory() as directorio:
+            escenario = ejecutar_escenario(combinacion['indicadores'], combinacion['periodos'],
+                                           combinacion['municipios'], args.repeticiones, directorio)
+        escenario['nombre'] = nombre
+        resultados.append(escenario)
+
+        print(f"\n📊 {nombre} ({escenario['filas']} filas)")
+        for etapa, medida in escenario['etapas'].items():
+            print(f"   {etapa:<15} {medida['ms']:>10.1f} ms {medida['mb_pico']:>9.1f} MB")
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({
+                'entorno': {'python': platform.python_version(), 'pandas': app.pd.__version__,
+                            'plataforma': platform.platform(), 'cpus': os.cpu_count(),
+                            'repeticiones': args.repeticiones},
+                'escenarios': resultados
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados guardados en {args.guardar}")
+
+    if args.comparar:
+        print(f"\nComparación con {args.comparar}:")
+        regresiones = comparar(resultados, args.comparar, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} etapa(s) más lentas que el baseline")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Genera libros sintéticos de Ficha_indicadores con la misma estructura que indicadores.xlsx
+
+Escala en tres ejes (indicadores, períodos y municipios) y produce valores de
+ILE realistas: SI/NO, fracciones con decimales largos, porcentajes con coma
+decimal, conteos, "No aplica" y celdas pendientes.
+
+    python benchmarks/libros_sinteticos.py --indicadores 200 --periodos 24 --municipios 10 --salida /tmp/libros
+"""
+import argparse
+import os
+import numpy as np
+from openpyxl import Workbook
+
+LINEAS = [
+    "1. Gestión integral de la contingencia",
+    "2.\tIntensificación de la vigilancia en salud pública",
+    "3. Promoción de la salud y prevención primaria de la transmisión.",
+    "4. Atencion integral de casos",
+    "5. Comunicación del riesgo y comunicación asertiva para la salud"
+]
+TIPOS = ["Proceso-Trazador", "Resultado-Trazador"]
+MESES_COMPLETOS = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+                   "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+# Proporción de cada clase de indicador en los libros generados
+CLASES_INDICADOR = {"si_no": 0.3, "fraccion": 0.4, "porcentaje": 0.2, "conteo": 0.1}
+COLUMNAS_FICHA = 8  # No, línea, nombre, tipo, definición, numerador, denominador, periodicidad
+
+def etiqueta_corte(indice, mes_inicial=10, anio_inicial=2024):
+    """
+    Encabezado de un corte mensual, contado desde Octubre 2024 ("Avances \\ncorte 1: Octubre 2024")
+    """
+    mes = (mes_inicial - 1 + indice) % 12
+    anio = anio_inicial + (mes_inicial - 1 + indice) // 12
+    return f"Avances \ncorte {indice + 1}: {MESES_COMPLETOS[mes]} {anio}"
+
+def valores_indicador(rng, clase, n_periodos):
+    """
+    Genera las triplas (numerador, denominador, ILE) de un indicador en todos los períodos
+    """
+    # Los cortes recientes tienen más celdas pendientes; algunos indicadores nunca reportan
+    prob_pendiente = np.linspace(0.05, 0.4, n_periodos)
+    pendientes = rng.random(n_periodos) < prob_pendiente
+    if rng.random() < 0.05:
+        pendientes[:] = True
+
+    triplas = []
+    for pendiente in pendientes:
+        if pendiente:
+            triplas += [None, None, None]
+        elif clase == "si_no":
+            triplas += [None, None, "SI" if rng.random() < 0.8 else "NO"]
+        elif clase == "fraccion":
+            denominador = int(rng.integers(1, 200_000))
+            numerador = int(rng.binomial(denominador, rng.random()))
+            ile = numerador / denominador
+            # Algunos municipios digitan el ILE como texto con coma decimal
+            triplas += [numerador, denominador, f"{ile:.2f}".replace('.', ',') if rng.random() < 0.1 else ile]
+        elif clase == "porcentaje":
+            ile = round(float(rng.uniform(0, 100)), 1)
+            triplas += [None, None, f"{ile}".replace('.', ',') if rng.random() < 0.2 else ile]
+        else:
+            triplas += [None, None, "No aplica" if rng.random() < 0.1 else int(rng.integers(0, 50))]
+    return triplas
+
+def escribir_libro(ruta, n_indicadores, n_periodos, semilla=0):
+    """
+    Escribe un libro con la hoja Ficha_indicadores: título, encabezados, cortes y una fila por indicador
+    """
+    rng = np.random.default_rng(semilla)
+    clases = rng.choice(list(CLASES_INDICADOR), size=n_indicadores, p=list(CLASES_INDICADOR.values()))
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Ficha_indicadores")
+    ancho = COLUMNAS_FICHA + 3 * n_periodos
+
+    hoja.append([None, "PLAN DE CONTINGENCIA PARA ALERTAS Y EMERGENCIA POR FIEBRE AMARILLA EN COLOMBIA\nFICHA DE INDICADORES"])
+    hoja.append(["No", "Linea del Plan", "Nombre del indicador", "Tipo de indicador",
+                 "Definición operacional del indicador", "Cálculo"] + [None] * (ancho - 6))
+    cortes = [None] * ancho
+    for j in range(n_periodos):
+        cortes[COLUMNAS_FICHA + 3 * j] = etiqueta_corte(j)
+    hoja.append(cortes)
+    hoja.append([None] * 5 + ["Númerador", "Denominador", "Periodicidad"]
+                + ["numerador ILE", "Denominador ILE", "ILE"] * n_periodos)
+
+    for i, clase in enumerate(clases):
+        # Definiciones de longitud variable: algunas superan los 200 caracteres que se truncan en pantalla
+        definicion = "Proporción de acciones del plan ejecutadas en el territorio. " * int(rng.integers(1, 6))
+        hoja.append([i + 1, LINEAS[i * len(LINEAS) // n_indicadores], f"Indicador sintético {i + 1} ({clase})",
+                     TIPOS[i % 2], definicion.strip(),
+                     "SI/NO" if clase == "si_no" else "N° de acciones ejecutadas", None, "Mensual"]
+                    + valores_indicador(rng, clase, n_periodos))
+
+    # Notas al pie como en la ficha original (sin número de indicador)
+    hoja.append([None])
+    hoja.append([None, "Indicador de línea estratégica"])
+    hoja.append([None, "Registre: SI/NO o número, según corresponda"])
+    libro.save(ruta)
+
+def generar_libros(directorio, n_indicadores, n_periodos, n_municipios=1, semilla=0):
+    """
+    Escribe un libro por municipio en `directorio` y devuelve la fuente para load_and_process_data
+    """
+    os.makedirs(directorio, exist_ok=True)
+    if n_municipios == 1:
+        ruta = os.path.join(directorio, "indicadores.xlsx")
+        escribir_libro(ruta, n_indicadores, n_periodos, semilla)
+        return ruta
+
+    for k in range(n_municipios):
+        escribir_libro(os.path.join(directorio, f"indicadores_Municipio_{k + 1:02d}.xlsx"),
+                       n_indicadores, n_periodos, semilla + k)
+    return directorio
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera libros sintéticos de Ficha_indicadores")
+    parser.add_argument("--indicadores", type=int, default=17)
+    parser.add_argument("--periodos", type=int, default=9)
+    parser.add_argument("--municipios", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="libros_sinteticos")
+    args = parser.parse_args(argv)
+    fuente = generar_libros(args.salida, args.indicadores, args.periodos, args.municipios, args.semilla)
+    print(f"✅ Libros generados en {fuente}")
+
+if __name__ == "__main__":
+    main()
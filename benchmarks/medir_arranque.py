@@ -0,0 +1,83 @@
+"""
+Mide el arranque en frío del dashboard: importaciones y primer render en un proceso nuevo
+
+Cada repetición lanza un intérprete nuevo que ejecuta app.py con el AppTest de
+Streamlit y lee el reporte de arranque que la app agrega al archivo de perfil
+(INDICADORES_PERFIL_LOG). Se informa la mediana de cada medida.
+
+    python benchmarks/medir_arranque.py --repeticiones 5 --guardar arranque.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Código del proceso hijo: un solo rerun de la app, como la primera visita a una réplica nueva
+PRIMER_RERUN = """
+import sys
+from streamlit.logger import set_log_level
+set_log_level("error")
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+sys.exit(1 if at.exception else 0)
+"""
+
+def medir_arranque(fuentes=None):
+    """
+    Ejecuta la app en un proceso nuevo y devuelve su reporte de arranque más el tiempo total del proceso
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        archivo_perfil = os.path.join(directorio, "perfil.jsonl")
+        entorno = dict(os.environ, INDICADORES_PERFIL_LOG=archivo_perfil)
+        if fuentes:
+            entorno['INDICADORES_FUENTES'] = fuentes
+
+        inicio = time.perf_counter()
+        proceso = subprocess.run([sys.executable, "-c", PRIMER_RERUN, os.path.join(RAIZ, "app.py")],
+                                 cwd=RAIZ, env=entorno, capture_output=True, text=True)
+        proceso_ms = (time.perf_counter() - inicio) * 1000
+        if proceso.returncode != 0:
+            raise RuntimeError(f"La app falló al arrancar:\n{proceso.stderr[-2000:]}")
+
+        with open(archivo_perfil, encoding='utf-8') as f:
+            reportes = [json.loads(linea)['arranque'] for linea in f if '"arranque"' in linea]
+    if not reportes:
+        raise RuntimeError("La app no escribió el reporte de arranque")
+    return dict(reportes[0], proceso_ms=proceso_ms)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide importaciones y primer render del dashboard en frío")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--fuentes", help="Libros a cargar (por defecto INDICADORES_FUENTES o indicadores.xlsx)")
+    parser.add_argument("--guardar", help="Guarda las medianas en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        medidas = [medir_arranque(args.fuentes) for _ in range(args.repeticiones)]
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    medianas = {clave: round(statistics.median(medida[clave] for medida in medidas), 1)
+                for clave in ['importaciones_ms', 'primer_render_ms', 'proceso_ms']}
+    print(f"⏱️ Arranque en frío (mediana de {args.repeticiones}):")
+    print(f"   importaciones  {medianas['importaciones_ms']:>8.0f} ms")
+    print(f"   primer render  {medianas['primer_render_ms']:>8.0f} ms")
+    print(f"   proceso        {medianas['proceso_ms']:>8.0f} ms")
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump({'repeticiones': args.repeticiones, 'medianas': medianas, 'medidas': medidas},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados guardados en {args.guardar}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Genera el reporte mensual de indicadores sin abrir el dashboard
+
+Escribe un HTML autocontenido (una sección por línea estratégica, con el
+resumen ejecutivo al inicio) y la especificación JSON de Plotly de cada
+gráfico de progreso. Los gráficos se construyen y serializan en un pool de
+procesos.
+
+    python generar_reporte.py --fuentes "datos/municipios/*.xlsx" --salida reporte
+"""
+import argparse
+import html
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from plotly.offline import get_plotlyjs
+from streamlit.logger import set_log_level
+
+# Sin servidor de Streamlit las cachés avisan que corren en modo "bare"; no aplica aquí
+set_log_level("error")
+import app
+
+def construir_figura(argumentos):
+    """
+    Construye el gráfico de progreso de un indicador y lo devuelve serializado en JSON (o None)
+    """
+    indicador, serie = argumentos
+    fig = app.create_progress_chart(indicador, serie)
+    return fig.to_json() if fig is not None else None
+
+def construir_figuras(indicadores, series, procesos):
+    """
+    Serializa los gráficos de todos los indicadores, en paralelo cuando hay más de un proceso
+    
+    Cada tarea lleva solo la ficha y la serie del indicador, no el almacén completo.
+    """
+    tareas = list(zip(indicadores, series))
+    if procesos <= 1 or len(tareas) < 2:
+        return [construir_figura(tarea) for tarea in tareas]
+
+    # Tareas en bloques para no pagar un viaje entre procesos por cada indicador
+    procesos = min(procesos, len(tareas))
+    bloque = max(1, len(tareas) // (procesos * 4))
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(construir_figura, tareas, chunksize=bloque))
+
+def clave_indicador(indicador):
+    """
+    Identificador de un indicador apto para nombres de archivo e ids HTML (municipio_numero)
+    """
+    fuente = re.sub(r'[^\w-]+', '_', indicador.fuente).strip('_') or 'fuente'
+    return f"{fuente}_{indicador.numero}"
+
+def div_figura(spec, id_div):
+    """
+    Devuelve el div y el script que dibujan una figura a partir de su especificación JSON
+    """
+    # "</" dentro de un texto cerraría el <script> antes de tiempo
+    spec = spec.replace('</', '<\\/')
+    return (f'<div id="{id_div}" class="grafico"></div>\n'
+            f'<script>(function(){{var f={spec};'
+            f'Plotly.newPlot("{id_div}",f.data,f.layout,{{responsive:true,displaylogo:false}});}})();</script>')
+
+def tabla_html(df):
+    """
+    Convierte una tabla de pandas a HTML con el estilo del reporte
+    """
+    return df.to_html(index=False, classes="tabla", border=0, escape=True)
+
+def seccion_resumen(resumen):
+    """
+    Construye la sección del resumen ejecutivo (métricas, gráficos y tabla por línea)
+    """
+    metricas = [
+        ("Total Indicadores", resumen['total']),
+        ("Seguimiento Promedio", f"{resumen['seguimiento_promedio']:.1f}%"),
+        ("Indicadores Completos", resumen['completos']),
+        ("Último Período", resumen['ultimo_periodo'])
+    ]
+    partes = ['<section id="resumen"><h2>📊 Resumen Ejecutivo</h2><div class="metricas">']
+    partes += [f'<div class="metrica"><span>{html.escape(nombre)}</span><strong>{html.escape(str(valor))}</strong></div>'
+               for nombre, valor in metricas]
+    partes.append('</div>')
+
+    if not resumen['por_linea'].empty:
+        partes.append(div_figura(app.crear_grafico_lineas(resumen['por_linea']).to_json(), "resumen-lineas"))
+        partes.append('<h3>📋 Resumen por Línea</h3>')
+        partes.append(tabla_html(app.tabla_resumen_lineas(resumen['por_linea'])))
+    if not resumen['por_tipo'].empty:
+        partes.append(div_figura(app.crear_grafico_tipos(resumen['por_tipo']).to_json(), "resumen-tipos"))
+    if not resumen['por_periodo'].empty:
+        partes.append(div_figura(app.crear_grafico_periodos(resumen['por_periodo']).to_json(), "resumen-periodos"))
+    partes.append('</section>')
+    return '\n'.join(partes)
+
+def seccion_indicador(indicador, serie, spec, periodos, multiples_fuentes):
+    """
+    Construye el bloque de un indicador: ficha, gráfico de progreso y tabla por período
+    """
+    titulo = f"{indicador.numero}. {indicador.nombre_limpio}"
+    if multiples_fuentes:
+        titulo += f" — {indicador.fuente}"
+    seguimiento = app.calcular_seguimiento(serie, periodos)
+    tipo_detectado = app.detect_indicator_type(serie)
+
+    partes = [
+        '<article class="indicador">',
+        f'<h3>{html.escape(titulo)}</h3>',
+        f'<p><strong>Tipo:</strong> {html.escape(indicador.tipo)} · '
+        f'<strong>Seguimiento:</strong> {seguimiento:.0f}% · '
+        f'<strong>Detectado:</strong> {html.escape(tipo_detectado)}</p>',
+        f'<p class="definicion">{html.escape(indicador.definicion)}</p>'
+    ]
+    if spec is not None:
+        partes.append(div_figura(spec, f"indicador-{clave_indicador(indicador)}"))
+    else:
+        partes.append('<p class="aviso">No hay datos suficientes para generar el gráfico.</p>')
+
+    df_tabla = app.tabla_datos_periodo(serie)
+    if not df_tabla.empty:
+        partes.append(tabla_html(df_tabla))
+    partes.append('</article>')
+    return '\n'.join(partes)
+
+ESTILO_REPORTE = """
+body { font-family: "Segoe UI", Arial, sans-serif; margin: 2rem auto; max-width: 1100px; color: #262730; }
+h1 { margin-bottom: 0; } h2 { border-bottom: 2px solid #4ECDC4; padding-bottom: .3rem; margin-top: 2.5rem; }
+.subtitulo { color: #666; margin-top: .3rem; }
+.metricas { display: flex; gap: 1rem; flex-wrap: wrap; }
+.metrica { flex: 1; min-width: 180px; background: #f6f8fa; border-radius: 8px; padding: .8rem 1rem; }
+.metrica span { display: block; color: #666; font-size: .9rem; } .metrica strong { font-size: 1.6rem; }
+.indicador { border: 1px solid #e6e6e6; border-radius: 8px; padding: 1rem 1.2rem; margin: 1rem 0; }
+.definicion { background: #eef6fc; padding: .6rem .8rem; border-radius: 6px; font-size: .92rem; }
+.aviso { color: #8a6d3b; }
+.tabla { border-collapse: collapse; width: 100%; font-size: .9rem; margin-top: .5rem; }
+.tabla th, .tabla td { border-bottom: 1px solid #e6e6e6; padding: .3rem .5rem; text-align: left; }
+.grafico { width: 100%; }
+"""
+
+def generar_reporte(fuentes=None, salida="reporte", hoja=app.HOJA_DATOS, desde=None, hasta=None,
+                    procesos=app.MAX_PROCESOS):
+    """
+    Carga los datos, construye todos los gráficos y escribe el reporte HTML y las figuras JSON
+
+    Devuelve la ruta del HTML generado; lanza ValueError si no hay datos o el
+    rango de períodos no existe.
+    """
+    datos_cargados = app.load_and_process_data(fuentes, hoja)
+    for fuente, mensaje in datos_cargados['errores']:
+        print(f"⚠️ {fuente}: {mensaje}", file=sys.stderr)
+    almacen = datos_cargados['almacen']
+    if almacen is None or not len(almacen):
+        raise ValueError("No se pudieron cargar los datos de los indicadores")
+
+    # Rango de períodos (por defecto todo el histórico, como el dashboard)
+    periodos_disponibles = datos_cargados['periodos']
+    for periodo in (desde, hasta):
+        if periodo is not None and periodo not in periodos_disponibles:
+            raise ValueError(f"Período no encontrado: {periodo} (disponibles: {', '.join(periodos_disponibles)})")
+    inicio = periodos_disponibles.index(desde) if desde else 0
+    fin = periodos_disponibles.index(hasta) if hasta else len(periodos_disponibles) - 1
+    periodos = periodos_disponibles[inicio:fin + 1]
+    multiples_fuentes = len(datos_cargados['fuentes']) > 1
+
+    indicadores = almacen.fichas()
+    series = [almacen.serie(indicador.posicion, periodos) for indicador in indicadores]
+    figuras = construir_figuras(indicadores, series, procesos)
+
+    # Especificaciones JSON por indicador
+    directorio_figuras = os.path.join(salida, "figuras")
+    os.makedirs(directorio_figuras, exist_ok=True)
+    for indicador, spec in zip(indicadores, figuras):
+        if spec is not None:
+            with open(os.path.join(directorio_figuras, f"{clave_indicador(indicador)}.json"), 'w', encoding='utf-8') as f:
+                f.write(spec)
+
+    # Secciones por línea estratégica, en el mismo orden que la pestaña de progreso
+    por_linea = {}
+    for indicador, serie, spec in zip(indicadores, series, figuras):
+        por_linea.setdefault(indicador.linea_nombre, []).append((indicador, serie, spec))
+
+    resumen = app.calcular_resumen_ejecutivo(almacen, datos_cargados['indices'],
+                                             datos_cargados['version'], (), tuple(periodos))
+    rango = f"{periodos[0]} – {periodos[-1]}" if periodos else "Sin períodos"
+
+    partes = [
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">',
+        '<title>Indicadores - Plan Contingencia Fiebre Amarilla</title>',
+        f'<style>{ESTILO_REPORTE}</style>',
+        f'<script type="text/javascript">{get_plotlyjs()}</script>',
+        '</head><body>',
+        '<h1>🦟 Plan de Contingencia para Alertas y Emergencia por Fiebre Amarilla</h1>',
+        f'<p class="subtitulo"><strong>Secretaría de Salud del Tolima</strong> · Períodos: {html.escape(rango)} · '
+        f'Generado: {datetime.now():%Y-%m-%d %H:%M}</p>',
+        '<nav><ul>' + '<li><a href="#resumen">Resumen Ejecutivo</a></li>' + ''.join(
+            f'<li><a href="#linea-{i}">{html.escape(linea_nombre)}</a></li>'
+            for i, linea_nombre in enumerate(sorted(por_linea), 1)) + '</ul></nav>',
+        seccion_resumen(resumen)
+    ]
+    for i, linea_nombre in enumerate(sorted(por_linea), 1):
+        partes.append(f'<section id="linea-{i}"><h2>🎯 {html.escape(linea_nombre)}</h2>')
+        partes += [seccion_indicador(indicador, serie, spec, periodos, multiples_fuentes)
+                   for indicador, serie, spec in por_linea[linea_nombre]]
+        partes.append('</section>')
+    partes.append('</body></html>')
+
+    ruta_html = os.path.join(salida, "reporte_indicadores.html")
+    with open(ruta_html, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(partes))
+    return ruta_html
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera el reporte HTML de indicadores sin abrir el dashboard")
+    parser.add_argument("--fuentes", default=app.FUENTES_DATOS,
+                        help="Archivo, directorio o patrón glob de los libros (por defecto INDICADORES_FUENTES)")
+    parser.add_argument("--hoja", default=app.HOJA_DATOS, help="Hoja con la ficha de indicadores")
+    parser.add_argument("--salida", default="reporte", help="Directorio donde se escribe el reporte")
+    parser.add_argument("--desde", help="Primer período a incluir (p. ej. 'Oct 2024')")
+    parser.add_argument("--hasta", help="Último período a incluir")
+    parser.add_argument("--procesos", type=int, default=app.MAX_PROCESOS,
+                        help="Procesos para construir los gráficos (por defecto INDICADORES_MAX_PROCESOS)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    try:
+        ruta_html = generar_reporte(args.fuentes, args.salida, args.hoja, args.desde, args.hasta, args.procesos)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Reporte generado en {ruta_html} ({time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
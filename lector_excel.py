@@ -0,0 +1,135 @@
+"""
+Lectura en streaming de la hoja de indicadores (openpyxl en modo solo lectura y solo valores)
+
+pd.read_excel carga todas las columnas de la hoja, incluidos los bloques que el
+dashboard nunca usa. Este lector recorre las filas una a una y conserva solo
+las columnas de identificación (hasta el cálculo declarado) y las triplas (numerador, denominador, ILE) de
+cada período, con los mismos valores y tipos que pd.read_excel les daría, de
+modo que la memoria pico depende del tamaño de la tabla y no del ancho de la
+hoja. Si la hoja tiene una columna de metas (encabezado "Meta" entre la
+identificación y el primer período) también se conserva.
+
+Vive en su propio módulo, sin Streamlit, para que los procesos de la carga en
+paralelo lo importen sin cargar la app.
+"""
+import operator
+import re
+import numpy as np
+import pandas as pd
+
+COLUMNAS_IDENTIFICACION = 6  # No, línea, nombre, tipo, definición operacional y cálculo (numerador)
+FILAS_ENCABEZADO = 4  # Los datos empiezan en la fila 5
+# Errores de fórmula: openpyxl los devuelve como texto en modo solo valores y pd.read_excel los deja vacíos
+ERRORES_EXCEL = frozenset(['#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'])
+# Textos que pd.read_excel también lee como vacíos (na_values por defecto, documentados en pd.read_csv)
+TEXTOS_VACIOS = ERRORES_EXCEL | frozenset(['', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+                                           '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+def _valor_celda(valor):
+    """
+    Convierte el valor de una celda como pd.read_excel (NaN si está vacía, entero si no tiene decimales)
+    """
+    if valor is None:
+        return np.nan
+    if valor.__class__ is float:
+        return int(valor) if valor.is_integer() else valor
+    if valor.__class__ is str and valor in TEXTOS_VACIOS:
+        return np.nan
+    return valor
+
+def _columna_tipada(valores):
+    """
+    Infiere el tipo de una columna de valores ya convertidos como pd.read_excel: numérica si todos lo son
+    """
+    columna = pd.Series(valores, dtype=object)
+    try:
+        return pd.to_numeric(columna)
+    except (ValueError, TypeError):
+        return columna.infer_objects()
+
+def _ancho(fila):
+    """
+    Largo de la fila sin las celdas vacías del final (pd.read_excel recorta igual)
+    """
+    n = len(fila)
+    while n and (fila[n - 1] is None or fila[n - 1] == ""):
+        n -= 1
+    return n
+
+def _texto_encabezado(filas, col):
+    """
+    Texto de los encabezados de una columna en las filas dadas (las celdas vacías se omiten)
+    """
+    return " ".join(str(fila[col]) for fila in filas if col < len(fila) and fila[col] is not None)
+
+def leer_hoja_proyectada(ruta, hoja, patron_periodo, filas_encabezado=FILAS_ENCABEZADO, patron_meta=None):
+    """
+    Lee la hoja fila por fila conservando solo la identificación, las metas y las triplas de cada período
+
+    Devuelve un DataFrame sin encabezados como el de pd.read_excel(header=None)
+    restringido a esas columnas (renumeradas desde 0). Los encabezados solo se
+    conservan en la primera columna de cada período y en las columnas de metas
+    (las que antes del primer período coinciden con `patron_meta`), así
+    descubrir_periodos encuentra los mismos cortes. Las filas vacías en todas
+    las columnas conservadas se descartan: no cambian los tipos ni los
+    indicadores leídos.
+    """
+    from openpyxl import load_workbook
+    libro = load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+    try:
+        hoja_excel = libro[hoja]
+        hoja_excel.reset_dimensions()  # Las dimensiones declaradas en el archivo no siempre son correctas
+        filas = hoja_excel.iter_rows(values_only=True)
+        # Las filas sin celdas llegan como lista vacía en lugar de tupla
+        encabezados = [tuple(fila) for _, fila in zip(range(filas_encabezado), filas)]
+        ancho_encabezados = max(map(len, encabezados), default=0)
+
+        # Columnas candidatas a inicio de período: el encabezado (filas 2 y 3) nombra un mes y un año
+        inicios = [col for col in range(ancho_encabezados)
+                   if re.search(patron_periodo, _texto_encabezado(encabezados[1:3], col))]
+        # Metas: entre la identificación y el primer período, encabezado en las filas 2 a 4
+        metas = []
+        if patron_meta:
+            metas = [col for col in range(COLUMNAS_IDENTIFICACION, min(inicios, default=ancho_encabezados))
+                     if re.search(patron_meta, _texto_encabezado(encabezados[1:4], col))]
+
+        columnas = sorted(set(range(COLUMNAS_IDENTIFICACION)).union(
+            metas, (col + k for col in inicios for k in range(3))))
+        tomar = operator.itemgetter(*columnas)
+        relleno = (None,) * (columnas[-1] + 1)
+        ancho = max(map(_ancho, encabezados), default=0)
+
+        proyectadas = [tomar(fila + relleno[len(fila):]) for fila in encabezados]
+        for fila in filas:
+            fila = tuple(fila)
+            ancho = max(ancho, _ancho(fila))
+            valores = tomar(fila + relleno[len(fila):]) if len(fila) < len(relleno) else tomar(fila)
+            if any(valor is not None and valor != "" for valor in valores):
+                proyectadas.append(valores)
+    finally:
+        libro.close()
+
+    # Como pd.read_excel, un período necesita sus tres columnas dentro del ancho usado de la hoja
+    inicios = [col for col in inicios if col + 2 < ancho]
+    metas = [col for col in metas if col < ancho]
+    conservar = sorted(set(range(min(COLUMNAS_IDENTIFICACION, ancho))).union(
+        metas, (col + k for col in inicios for k in range(3))))
+    posiciones = [columnas.index(col) for col in conservar]
+
+    celdas = np.array(proyectadas, dtype=object).reshape(len(proyectadas), len(columnas))[:, posiciones]
+    celdas = np.frompyfunc(_valor_celda, 1, 1)(celdas)
+    # Misma inferencia de tipos por columna que pd.read_excel
+    df = pd.DataFrame({j: _columna_tipada(celdas[:, j]) for j in range(celdas.shape[1])})
+
+    # Encabezados solo en el inicio de cada período y en las metas (los demás no deben volver a detectarse)
+    con_encabezado = np.isin(conservar, inicios + metas)
+    df.iloc[:filas_encabezado, np.flatnonzero(~con_encabezado)] = np.nan
+    return df
+
+def leer_hoja(ruta, hoja, patron_periodo, proyectada=True, patron_meta=None):
+    """
+    Lee la hoja de indicadores en streaming (proyectada) o completa con pd.read_excel
+    """
+    if proyectada:
+        return leer_hoja_proyectada(ruta, hoja, patron_periodo, patron_meta=patron_meta)
+    return pd.read_excel(ruta, sheet_name=hoja, header=None)
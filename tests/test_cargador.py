@@ -0,0 +1,165 @@
+"""
+Regresión del cargador vectorizado contra el recorrido celda por celda original sobre indicadores.xlsx
+
+cargar_por_celda es el bucle de load_and_process_data antes de vectorizarlo
+(solo se le pasa la lista de períodos en lugar de tenerla fija, y el tope de
+25 filas se puede quitar). Los registros que arma la tabla larga deben ser los
+mismos que los de ese bucle, también en un libro sintético de más de 25
+indicadores.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+from streamlit.logger import set_log_level
+
+# Sin servidor de Streamlit las cachés avisan que corren en modo "bare"; no aplica aquí
+set_log_level("error")
+import app
+import libros_sinteticos
+
+RUTA_LIBRO = os.path.join(RAIZ, "indicadores.xlsx")
+
+# Períodos fijos del cargador original: Marzo, Abril y Mayo 2025 (columnas X a AF)
+PERIODOS_ORIGINALES = [
+    ("Mar 2025", [23, 24, 25]),
+    ("Abr 2025", [26, 27, 28]),
+    ("May 2025", [29, 30, 31]),
+]
+
+def cargar_por_celda(df, periodos, max_filas=25):
+    """
+    Cargador original: lee cada celda con df.iloc y arma un diccionario por indicador
+
+    El original solo recorría 25 filas; max_filas=None recorre la hoja completa.
+    """
+    data_start_row = 4  # Datos empiezan en fila 5 (índice 4)
+    indicadores_data = []
+    fin = len(df) if max_filas is None else min(data_start_row + max_filas, len(df))
+
+    for row_idx in range(data_start_row, fin):
+        try:
+            # Verificar si hay un número de indicador
+            if pd.isna(df.iloc[row_idx, 0]) or df.iloc[row_idx, 0] == '':
+                continue
+
+            numero = df.iloc[row_idx, 0]
+            linea = str(df.iloc[row_idx, 1]) if not pd.isna(df.iloc[row_idx, 1]) else ""
+            nombre = str(df.iloc[row_idx, 2]) if not pd.isna(df.iloc[row_idx, 2]) else ""
+            tipo = str(df.iloc[row_idx, 3]) if not pd.isna(df.iloc[row_idx, 3]) else ""
+            definicion = str(df.iloc[row_idx, 4]) if not pd.isna(df.iloc[row_idx, 4]) else ""
+
+            # Si el número no es numérico, continuar
+            try:
+                numero = int(float(numero))
+            except:
+                continue
+
+            # Extraer número de línea estratégica para ordenamiento
+            linea_numero = 999  # Valor por defecto
+            try:
+                if linea.strip():
+                    linea_numero = int(linea.split('.')[0])
+            except:
+                pass
+
+            # Extraer datos de cada período
+            datos_periodos = {}
+            for periodo_name, cols in periodos:
+                try:
+                    if len(cols) >= 3 and all(col < len(df.columns) for col in cols):
+                        numerador = df.iloc[row_idx, cols[0]]
+                        denominador = df.iloc[row_idx, cols[1]]
+                        ile = df.iloc[row_idx, cols[2]]
+
+                        # Limpiar datos
+                        numerador = str(numerador).strip() if not pd.isna(numerador) else ""
+                        denominador = str(denominador).strip() if not pd.isna(denominador) else ""
+                        ile = str(ile).strip() if not pd.isna(ile) else ""
+
+                        datos_periodos[periodo_name] = {
+                            'numerador': numerador,
+                            'denominador': denominador,
+                            'ile': ile
+                        }
+                except Exception as e:
+                    datos_periodos[periodo_name] = {
+                        'numerador': "",
+                        'denominador': "",
+                        'ile': ""
+                    }
+
+            indicadores_data.append({
+                'numero': numero,
+                'linea': linea,
+                'linea_numero': linea_numero,
+                'nombre': nombre,
+                'tipo': tipo,
+                'definicion': definicion,
+                'datos': datos_periodos
+            })
+
+        except Exception as e:
+            continue
+
+    # Ordenar por línea estratégica y luego por número de indicador
+    indicadores_data.sort(key=lambda x: (x['linea_numero'], x['numero']))
+    return indicadores_data
+
+def registros_tabla(tabla):
+    """
+    Registros con la forma del cargador original a partir de la tabla larga (indicador × período)
+    """
+    registros = []
+    for numero, filas in tabla.groupby('numero', sort=False):
+        primera = filas.iloc[0]
+        registros.append({
+            'numero': int(numero),
+            'linea': primera['linea'],
+            'linea_numero': int(primera['linea_numero']),
+            'nombre': primera['nombre'],
+            'tipo': primera['tipo'],
+            'definicion': primera['definicion'],
+            'datos': {str(fila.periodo): {'numerador': fila.numerador, 'denominador': fila.denominador,
+                                          'ile': fila.ile}
+                      for fila in filas.itertuples(index=False)}
+        })
+    return registros
+
+@pytest.fixture(scope="module")
+def hoja():
+    return pd.read_excel(RUTA_LIBRO, sheet_name=app.HOJA_DATOS, header=None)
+
+def test_periodos_originales(hoja):
+    tabla = app.construir_tabla_indicadores(hoja, PERIODOS_ORIGINALES)
+    esperados = cargar_por_celda(hoja, PERIODOS_ORIGINALES)
+    assert esperados
+    assert registros_tabla(tabla) == esperados
+
+def test_todos_los_periodos(hoja):
+    periodos = app.descubrir_periodos(hoja)
+    assert len(periodos) > len(PERIODOS_ORIGINALES)
+    assert registros_tabla(app.procesar_hoja(hoja)) == cargar_por_celda(hoja, periodos)
+
+def test_lector_proyectado(hoja):
+    # El lector en streaming renumera las columnas; los registros deben ser los mismos
+    tabla = app.procesar_hoja(app.leer_hoja(RUTA_LIBRO))
+    assert registros_tabla(tabla) == cargar_por_celda(hoja, app.descubrir_periodos(hoja))
+
+def test_libro_sin_tope(tmp_path):
+    # Más indicadores que el tope de 25 filas del cargador original: la tabla larga no debe perder ninguno
+    ruta = libros_sinteticos.generar_libros(str(tmp_path), 60, 12)
+    hoja = pd.read_excel(ruta, sheet_name=app.HOJA_DATOS, header=None)
+    periodos = app.descubrir_periodos(hoja)
+    esperados = cargar_por_celda(hoja, periodos, max_filas=None)
+    assert len(esperados) == 60
+    assert len(cargar_por_celda(hoja, periodos)) == 25
+    assert registros_tabla(app.procesar_hoja(hoja)) == esperados
+    assert registros_tabla(app.procesar_hoja(app.leer_hoja(ruta))) == esperados
@@ -0,0 +1,130 @@
+"""
+Almacén histórico en SQLite: migración del esquema, ingesta, consultas filtradas y reconstrucción de la tabla
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.logger import set_log_level
+
+set_log_level("error")
+import app
+
+RUTA_LIBRO = os.path.join(RAIZ, "indicadores.xlsx")
+
+# Tabla de indicadores de las bases creadas antes de guardar la meta y el cálculo declarado
+ESQUEMA_SIN_META = """
+CREATE TABLE indicadores (
+    fuente TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    linea TEXT NOT NULL,
+    linea_numero INTEGER NOT NULL,
+    linea_nombre TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    definicion TEXT NOT NULL,
+    PRIMARY KEY (fuente, numero)
+);
+"""
+
+@pytest.fixture(scope="module")
+def tabla_libro():
+    return app.procesar_hoja(app.leer_hoja(RUTA_LIBRO))
+
+def tabla_fuente(tabla, fuente):
+    return app.agregar_columnas_filtro(app.unir_tablas([(fuente, tabla)]))
+
+@pytest.fixture
+def historico(tmp_path):
+    return app.AlmacenHistorico(str(tmp_path / "historico.sqlite"), conexiones=2)
+
+def contar(historico, tabla_sql):
+    with historico.conexion() as conexion:
+        return conexion.execute(f"SELECT COUNT(*) FROM {tabla_sql}").fetchone()[0]
+
+def test_migracion_esquema(tmp_path, tabla_libro):
+    ruta = str(tmp_path / "historico.sqlite")
+    with sqlite3.connect(ruta) as conexion:
+        conexion.executescript(ESQUEMA_SIN_META)
+        conexion.execute("INSERT INTO indicadores VALUES ('Ibague', 1, '1.', 1, 'Línea 1', 'Indicador', 'Proceso', '')")
+    
+    historico = app.AlmacenHistorico(ruta)
+    with historico.conexion() as conexion:
+        columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(indicadores)")]
+        assert conexion.execute("SELECT meta, calculo FROM indicadores").fetchone() == (None, '')
+    assert {'meta', 'calculo'} <= set(columnas)
+    
+    # La ingesta completa las columnas nuevas de los indicadores ya guardados
+    historico.guardar_tabla(tabla_fuente(tabla_libro, "Ibague"), "v1")
+    filas = historico.consultar(app.get_periodos(tabla_libro))
+    assert filas.loc[filas['numero'] == 1, 'calculo'].iloc[0] == "SI/NO"
+    
+    # Abrir otra vez una base ya migrada no cambia nada
+    app.AlmacenHistorico(ruta)
+
+def test_reingesta_idempotente(historico, tabla_libro):
+    tabla = tabla_fuente(tabla_libro, "Ibague")
+    assert historico.guardar_tabla(tabla, "v1") == len(tabla)
+    marca = historico.marca()
+    
+    assert historico.guardar_tabla(tabla, "v1") == 0
+    assert historico.marca() == marca
+    assert contar(historico, "mediciones") == len(tabla)
+    assert contar(historico, "versiones") == 1
+    
+    # Otra versión con los mismos valores no reescribe mediciones; solo la celda que cambió
+    assert historico.guardar_tabla(tabla, "v2") == 0
+    cambiada = tabla.copy()
+    cambiada.loc[23, 'ile'] = "0.5"
+    assert historico.guardar_tabla(cambiada, "v3") == 1
+    assert contar(historico, "versiones") == 3
+
+def test_consultar_filtros(historico, tabla_libro):
+    tabla = tabla_fuente(tabla_libro, "Ibague")
+    historico.guardar_tabla(tabla, "v1")
+    historico.guardar_tabla(tabla_fuente(tabla_libro, "Honda"), "v2")
+    
+    rango = ["Feb 2025", "Mar 2025", "Abr 2025"]
+    filas = historico.consultar(rango)
+    assert sorted(filas['periodo'].unique()) == sorted(rango)
+    assert len(filas) == 2 * len(tabla_libro) // 9 * len(rango)
+    
+    linea = tabla['linea_nombre'].iloc[0]
+    filas = historico.consultar(rango, fuentes=("Honda",), lineas=(linea,))
+    esperadas = tabla[(tabla['linea_nombre'] == linea) & tabla['periodo'].isin(rango)]
+    assert set(filas['fuente']) == {"Honda"}
+    assert len(filas) == len(esperadas)
+    
+    filas = historico.consultar(rango, tipos=("Resultado-Trazador",))
+    numeros = set(tabla.loc[tabla['tipo'] == "Resultado-Trazador", 'numero'])
+    assert numeros and set(filas['numero']) == numeros
+
+def test_tabla_desde_historico_pendientes(historico, tabla_libro):
+    periodos = app.get_periodos(tabla_libro)
+    historico.guardar_tabla(tabla_fuente(tabla_libro, "Ibague"), "v1")
+    # Honda solo reportó los tres últimos cortes
+    ultimos = periodos[-3:]
+    recortada = tabla_libro[tabla_libro['periodo'].isin(ultimos)].reset_index(drop=True)
+    recortada['periodo'] = pd.Categorical(recortada['periodo'].astype(str), categories=ultimos, ordered=True)
+    historico.guardar_tabla(tabla_fuente(recortada, "Honda"), "v2")
+    
+    tabla = app.tabla_desde_historico(historico.consultar(periodos), periodos)
+    assert app.get_periodos(tabla) == periodos
+    columnas = app.COLUMNAS_IDENTIFICACION + ['periodo'] + app.COLUMNAS_PERIODO + ['pendiente']
+    
+    ibague = tabla[tabla['fuente'] == "Ibague"].reset_index(drop=True)
+    pd.testing.assert_frame_equal(ibague[columnas], tabla_libro[columnas], check_dtype=False)
+    
+    honda = tabla[tabla['fuente'] == "Honda"]
+    anteriores = ~honda['periodo'].isin(ultimos)
+    assert honda.loc[anteriores, 'pendiente'].all()
+    assert (honda.loc[anteriores, app.COLUMNAS_PERIODO] == "").all().all()
+    pd.testing.assert_frame_equal(honda.loc[~anteriores, columnas].reset_index(drop=True),
+                                  recortada[columnas], check_dtype=False, check_categorical=False)
@@ -0,0 +1,116 @@
+"""
+Lectura incremental: procesar_hoja_incremental debe dar la misma tabla que procesar_hoja
+
+Cada prueba procesa un libro sintético, lo modifica con openpyxl (celdas
+editadas, un corte nuevo, indicadores reordenados o insertados) y procesa la
+nueva versión con el estado de la anterior.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+from streamlit.logger import set_log_level
+
+set_log_level("error")
+import app
+import libros_sinteticos
+
+N_INDICADORES = 40
+N_PERIODOS = 12
+FILA_INICIAL = 5  # Primera fila de indicadores en la hoja (1-based)
+
+@pytest.fixture
+def libro(tmp_path):
+    ruta = str(tmp_path / "indicadores.xlsx")
+    libros_sinteticos.escribir_libro(ruta, N_INDICADORES, N_PERIODOS, semilla=3)
+    return ruta
+
+def procesar_version(ruta, anterior, snapshot):
+    """
+    Procesa la versión actual del libro con el estado de la anterior y guarda su snapshot
+    """
+    df = app.leer_hoja(ruta)
+    tabla, estado, recalculadas = app.procesar_hoja_incremental(df, anterior, str(snapshot))
+    app.escribir_snapshot(tabla, str(snapshot))
+    pd.testing.assert_frame_equal(tabla, app.procesar_hoja(df))
+    return estado, recalculadas
+
+def columna_corte(j, campo):
+    """
+    Columna (1-based) del numerador (0), denominador (1) o ILE (2) del corte j
+    """
+    return libros_sinteticos.COLUMNAS_FICHA + 3 * j + campo + 1
+
+def editar(ruta, cambio):
+    libro = load_workbook(ruta)
+    cambio(libro["Ficha_indicadores"])
+    libro.save(ruta)
+
+def test_celdas_editadas(libro, tmp_path):
+    estado, recalculadas = procesar_version(libro, None, tmp_path / "v1.feather")
+    assert recalculadas == N_INDICADORES * N_PERIODOS
+    
+    def cambio(hoja):
+        hoja.cell(FILA_INICIAL + 2, columna_corte(0, 2)).value = "NO"
+        hoja.cell(FILA_INICIAL + 9, columna_corte(5, 0)).value = 12345
+        hoja.cell(FILA_INICIAL + 9, columna_corte(5, 2)).value = 0.5
+        hoja.cell(FILA_INICIAL + 20, 3).value = "Nombre cambiado"  # Identificación, no cuenta como celda
+    editar(libro, cambio)
+    
+    _, recalculadas = procesar_version(libro, estado, tmp_path / "v2.feather")
+    assert recalculadas == 2
+
+def test_corte_agregado(libro, tmp_path):
+    estado, _ = procesar_version(libro, None, tmp_path / "v1.feather")
+    
+    def cambio(hoja):
+        j = N_PERIODOS
+        hoja.cell(3, columna_corte(j, 0)).value = libros_sinteticos.etiqueta_corte(j)
+        for campo, titulo in enumerate(["numerador ILE", "Denominador ILE", "ILE"]):
+            hoja.cell(4, columna_corte(j, campo)).value = titulo
+        for i in range(0, N_INDICADORES, 3):
+            hoja.cell(FILA_INICIAL + i, columna_corte(j, 2)).value = "SI"
+    editar(libro, cambio)
+    
+    _, recalculadas = procesar_version(libro, estado, tmp_path / "v2.feather")
+    assert recalculadas == N_INDICADORES
+
+def test_indicadores_reordenados_e_insertados(libro, tmp_path):
+    estado, _ = procesar_version(libro, None, tmp_path / "v1.feather")
+    
+    def cambio(hoja):
+        ancho = hoja.max_column
+        # Intercambia las filas de los indicadores 3 y 30
+        a, b = FILA_INICIAL + 2, FILA_INICIAL + 29
+        for columna in range(1, ancho + 1):
+            celda_a, celda_b = hoja.cell(a, columna), hoja.cell(b, columna)
+            celda_a.value, celda_b.value = celda_b.value, celda_a.value
+        # Indicador nuevo de la línea 1 en medio de la hoja: desplaza a los que siguen en la tabla
+        hoja.insert_rows(FILA_INICIAL + 15)
+        nuevo = [N_INDICADORES + 1, libros_sinteticos.LINEAS[0], "Indicador insertado", libros_sinteticos.TIPOS[0],
+                 "Definición", "SI/NO", None, "Mensual"]
+        for columna, valor in enumerate(nuevo, start=1):
+            hoja.cell(FILA_INICIAL + 15, columna).value = valor
+        for j in range(N_PERIODOS):
+            hoja.cell(FILA_INICIAL + 15, columna_corte(j, 2)).value = "SI" if j % 2 else "NO"
+    editar(libro, cambio)
+    
+    _, recalculadas = procesar_version(libro, estado, tmp_path / "v2.feather")
+    assert recalculadas == N_PERIODOS
+
+def test_snapshot_anterior_ilegible(libro, tmp_path):
+    estado, _ = procesar_version(libro, None, tmp_path / "v1.feather")
+    editar(libro, lambda hoja: setattr(hoja.cell(FILA_INICIAL, columna_corte(0, 2)), "value", "NO"))
+    (tmp_path / "v1.feather").write_bytes(b"no es un archivo feather")
+    
+    # Sin el snapshot anterior no hay de dónde tomar las celdas sin cambios: se procesa completa
+    _, recalculadas = procesar_version(libro, estado, tmp_path / "v2.feather")
+    assert recalculadas == N_INDICADORES * N_PERIODOS
@@ -0,0 +1,54 @@
+"""
+Carga de varios libros (uno por municipio) desde un directorio, con un archivo que no se puede leer
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.logger import set_log_level
+
+set_log_level("error")
+import app
+
+RUTA_LIBRO = os.path.join(RAIZ, "indicadores.xlsx")
+
+@pytest.fixture
+def directorio(tmp_path):
+    for municipio in ["Ibague", "Honda"]:
+        shutil.copy(RUTA_LIBRO, tmp_path / f"indicadores_{municipio}.xlsx")
+    (tmp_path / "indicadores_Roto.xlsx").write_bytes(b"no es un libro de Excel")
+    return str(tmp_path)
+
+# 1 proceso lee los libros en serie; 2 los reparte en procesos (forkserver o spawn)
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_varios_municipios(directorio, procesos, monkeypatch):
+    monkeypatch.setattr(app, "MAX_PROCESOS", procesos)
+    datos = app.load_and_process_data(directorio)
+    
+    assert datos['fuentes'] == ["Honda", "Ibague"]
+    assert datos['errores'] == [("Roto", "File is not a zip file")]
+    
+    # Cada indicador aparece una vez por municipio, ordenado por línea, número y municipio
+    identificacion = datos['almacen'].identificacion
+    n_indicadores = len(identificacion) // 2
+    assert list(identificacion['fuente']) == ["Honda", "Ibague"] * n_indicadores
+    assert (identificacion['numero'].iloc[::2].to_numpy() == identificacion['numero'].iloc[1::2].to_numpy()).all()
+    
+    # El filtro de municipio deja solo los indicadores de ese libro, con los mismos valores que cargado solo
+    seleccion = app.seleccionar_indicadores(datos['indices'], (('fuente', ("Ibague",)),))
+    posiciones = seleccion.nonzero()[0]
+    assert set(identificacion['fuente'].iloc[posiciones]) == {"Ibague"}
+    
+    solo = app.load_and_process_data(os.path.join(directorio, "indicadores_Ibague.xlsx"))
+    periodos = datos['periodos']
+    columnas = ['fuente', 'numero', 'linea', 'nombre', 'tipo', 'meta', 'periodo', 'numerador', 'denominador',
+                'ile_mostrar', 'ile_valor', 'pendiente']
+    filtrada = datos['almacen'].tabla_larga(posiciones, periodos)[columnas].reset_index(drop=True)
+    esperada = solo['almacen'].tabla_larga(range(len(solo['almacen'])), periodos)[columnas].reset_index(drop=True)
+    assert filtrada.astype(str).equals(esperada.astype(str))
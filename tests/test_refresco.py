@@ -0,0 +1,64 @@
+"""
+Refresco en segundo plano: huellas de los libros, carga de versiones nuevas desde el hilo y su detención
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.logger import set_log_level
+
+set_log_level("error")
+import app
+
+def copiar_libro(directorio):
+    ruta = os.path.join(directorio, "indicadores.xlsx")
+    shutil.copy(os.path.join(RAIZ, "indicadores.xlsx"), ruta)
+    return ruta
+
+def esperar(condicion, segundos=30):
+    limite = time.monotonic() + segundos
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.05)
+    return condicion()
+
+def test_huellas_solo_version_actual(tmp_path):
+    ruta = copiar_libro(tmp_path)
+    estado = {'lock': threading.Lock(), 'huellas': {}}
+    mtime, sha256 = app.huella_archivo(ruta, estado)
+    os.utime(ruta, ns=(mtime, mtime + 10**9))
+    assert app.huella_archivo(ruta, estado) == (mtime + 10**9, sha256)
+    # La huella de la versión anterior del archivo se descarta al calcular la nueva
+    assert list(estado['huellas']) == [(os.path.abspath(ruta), mtime + 10**9, os.path.getsize(ruta))]
+
+def test_detener(tmp_path):
+    ruta = copiar_libro(tmp_path)
+    refresco = app.RefrescoDatos(ruta, app.HOJA_DATOS, app._estado_cache_datos(), None, intervalo=0.05)
+    datos, _, _ = refresco.obtener()
+    assert datos['almacen'] is not None
+    assert refresco.resumen()['activo']
+    
+    # Una versión nueva del libro la carga el hilo, sin que nadie la pida
+    os.utime(ruta, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert esperar(lambda: refresco.resumen()['reemplazos'] == 2)
+    
+    refresco.detener(espera=30)
+    assert not refresco.resumen()['activo']
+    # Detenido, obtener sigue devolviendo la versión vigente sin volver a lanzar el hilo
+    assert refresco.obtener()[0]['almacen'] is not None
+    assert not refresco.resumen()['activo']
+
+def test_limpiar_cache_detiene_el_hilo(tmp_path):
+    refresco = app.get_refresco(copiar_libro(tmp_path), app.HOJA_DATOS)
+    refresco.intervalo = 0.05
+    refresco.obtener()
+    assert refresco.resumen()['activo']
+    
+    app.get_refresco.clear()
+    assert esperar(lambda: not refresco.resumen()['activo'])
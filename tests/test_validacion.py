@@ -0,0 +1,83 @@
+"""
+Reglas de validar_consistencia sobre celdas modificadas de indicadores.xlsx
+
+Cada prueba cambia una celda indicador × período de la tabla normalizada
+(recalculando sus derivados como en la carga) y revisa qué reglas se reportan.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.logger import set_log_level
+
+set_log_level("error")
+import app
+
+RUTA_LIBRO = os.path.join(RAIZ, "indicadores.xlsx")
+
+# Filas de la tabla larga (posición × 9 períodos + período) usadas en las pruebas
+CUALITATIVO_MAR = 5  # Indicador 1 (Cálculo SI/NO), Mar 2025: numerador "SI", denominador "No aplica"
+CUANTITATIVO_MAR = 23  # Indicador 3, Mar 2025: 7 / 7 = 1
+CUANTITATIVO_ABR = 24  # Indicador 3, Abr 2025: 12 / 14
+
+@pytest.fixture(scope="module")
+def tabla_libro():
+    return app.agregar_columnas_filtro(app.procesar_hoja(app.leer_hoja(RUTA_LIBRO)))
+
+@pytest.fixture
+def tabla(tabla_libro):
+    return tabla_libro.copy()
+
+def poner(tabla, fila, numerador, denominador, ile):
+    tabla.loc[fila, app.COLUMNAS_PERIODO] = [numerador, denominador, ile]
+    for columna, valores in app.derivados_ile(tabla['ile']).items():
+        tabla[columna] = valores
+
+def reportadas(tabla):
+    """
+    Pares (fila de la tabla, regla) reportados por validar_consistencia
+    """
+    anomalias = app.validar_consistencia(tabla)
+    n_periodos = len(tabla['periodo'].cat.categories)
+    filas = anomalias['posicion'] * n_periodos + anomalias['periodo'].cat.codes
+    return set(zip(filas.tolist(), anomalias['regla'].astype(str)))
+
+def test_libro_sin_anomalias(tabla):
+    # El "0" de la fórmula con numerador y denominador vacíos es un corte pendiente, no una anomalía
+    assert tabla.loc[0, ['numerador', 'denominador', 'ile']].tolist() == ["", "", "0"]
+    assert reportadas(tabla) == set()
+
+def test_ile_inconsistente(tabla):
+    poner(tabla, CUANTITATIVO_MAR, "7", "7", "0.9")
+    assert reportadas(tabla) == {(CUANTITATIVO_MAR, 'ile_inconsistente')}
+
+def test_escala_ile(tabla):
+    # 0.5% escrito como porcentaje: derivados_ile lo toma como fracción y muestra 50%
+    poner(tabla, CUANTITATIVO_ABR, "1", "200", "0.5")
+    assert reportadas(tabla) == {(CUANTITATIVO_ABR, 'escala_ile')}
+
+def test_denominador_cero(tabla):
+    poner(tabla, CUANTITATIVO_MAR, "5", "0", "")
+    assert reportadas(tabla) == {(CUANTITATIVO_MAR, 'denominador_cero')}
+
+def test_fuera_de_rango(tabla):
+    poner(tabla, CUANTITATIVO_MAR, "150", "100", "150")
+    assert reportadas(tabla) == {(CUANTITATIVO_MAR, 'fuera_de_rango')}
+
+def test_texto_cualitativo(tabla):
+    poner(tabla, CUALITATIVO_MAR, "SI", "No aplica", "En proceso")
+    assert reportadas(tabla) == {(CUALITATIVO_MAR, 'texto_cualitativo')}
+
+def test_ile_sin_datos(tabla):
+    poner(tabla, CUANTITATIVO_MAR, "7", "", "1")
+    poner(tabla, CUANTITATIVO_ABR, "", "", "0.5")
+    assert reportadas(tabla) == {(CUANTITATIVO_MAR, 'ile_sin_datos'), (CUANTITATIVO_ABR, 'ile_sin_datos')}
+
+def test_formula_vacia_pendiente(tabla):
+    poner(tabla, CUANTITATIVO_MAR, "", "", "0")
+    assert reportadas(tabla) == set()